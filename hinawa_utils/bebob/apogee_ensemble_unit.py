@@ -4,6 +4,8 @@
 from pathlib import Path
 from json import load, dump
 
+from hinawa_utils.misc.state_poller import StatePoller
+
 from hinawa_utils.bebob.bebob_unit import BebobUnit
 from hinawa_utils.bebob.extensions import BcoPlugInfo
 from hinawa_utils.ta1394.general import AvcConnection
@@ -264,6 +266,13 @@ class ApogeeEnsembleUnit(BebobUnit):
     def get_knob_states(self):
         return KnobCmd.get_states(self.fcp)
 
+    # The poller parses responses only when they change.
+    def create_state_poller(self, min_period=0.05, max_period=1.0):
+        poller = StatePoller(min_period, max_period)
+        poller.add('knob', lambda: KnobCmd.read_states(self.fcp),
+                   KnobCmd.parse_states)
+        return poller
+
     # Microphone configurations.
     def get_mic_labels(self):
         return MicCmd.get_mic_labels()
@@ -1,12 +1,12 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
+from __future__ import annotations
+
 from struct import pack
 from enum import Enum
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.ta1394.general import AvcGeneral
 
@@ -829,11 +829,17 @@ class KnobCmd():
         ApogeeProtocol.command_set(fcp, VendorCmd.KNOB_VALUE, args)
 
     @classmethod
-    def get_states(cls, fcp: Hinawa.FwFcp):
+    def read_states(cls, fcp: Hinawa.FwFcp):
         args = bytearray(1)
         args[0] = 0x01
-        resp = ApogeeProtocol.command_set(fcp, VendorCmd.HW_STATUS, args)
+        return ApogeeProtocol.command_set(fcp, VendorCmd.HW_STATUS, args)
+
+    @classmethod
+    def get_states(cls, fcp: Hinawa.FwFcp):
+        return cls.parse_states(cls.read_states(fcp))
 
+    @classmethod
+    def parse_states(cls, resp):
         status = {}
         for label, params in cls.__IN_KNOBS.items():
             val_pos, sel_val, peak_pos = params
@@ -4,13 +4,10 @@
 from threading import Thread
 from struct import unpack
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
 
 from hinawa_utils.ta1394.general import AvcGeneral, AvcConnection
+from hinawa_utils.ta1394.general import AvcResponseCache
 from hinawa_utils.ta1394.ccm import AvcCcm
 
 from hinawa_utils.bebob.config_rom_parser import BebobConfigRomParser
@@ -53,9 +50,13 @@ class BebobUnit(Hitaki.SndUnit):
 
         self.fcp = Hinawa.FwFcp()
         _ = self.fcp.bind(self.get_node())
+        self.__bus_handler = AvcResponseCache.watch_bus_reset(self.get_node(),
+                                                              self.fcp)
         self.firmware_info = self._get_firmware_info()
 
     def release(self):
+        self.get_node().disconnect(self.__bus_handler)
+        AvcResponseCache.invalidate(self.fcp)
         self.fcp.unbind()
         self.__unit_dispatcher.quit()
         self.__node_dispatcher.quit()
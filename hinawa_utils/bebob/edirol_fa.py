@@ -30,6 +30,7 @@ class EdirolFaUnit(BebobUnit):
         if (self.vendor_id, self.model_id) not in self._FBS:
             raise OSError('Not supported.')
         self._fbs = self._FBS[(self.vendor_id, self.model_id)]
+        self._unsupported = set()
 
     def get_mixer_input_labels(self):
         return self._fbs
@@ -49,6 +50,23 @@ class EdirolFaUnit(BebobUnit):
             self.fcp, 0, 'current', fb, ch)
         return AvcAudio.parse_data_to_db(data)
 
+    # Read gain and balance of all inputs at once.
+    def get_mixer_input_states(self):
+        targets = []
+        for i in range(len(self._fbs)):
+            for ch in (1, 2):
+                targets.append((i + 1, ch, 'volume'))
+                targets.append((i + 1, ch, 'lr-balance'))
+        states = AvcAudio.get_feature_states(self.fcp, 0, 'current', targets,
+                                             self._unsupported)
+        results = {}
+        for (fb, ch, ctl), data in states.items():
+            key = (self._fbs[fb - 1], ch)
+            if key not in results:
+                results[key] = {}
+            results[key][ctl] = AvcAudio.parse_data_to_db(data)
+        return results
+
     def set_mixer_input_balance(self, target, ch, balance):
         if target not in self._fbs:
             raise ValueError('Invalid argument for input.')
@@ -532,33 +532,55 @@ class BcoStreamFormatInfo():
                   'reserved')       # the others
 
     @classmethod
-    def get_entry_list(cls, fcp, addr):
-        fmts = []
+    def iterate_entries(cls, fcp, addr):
+        args = bytearray()
+        args.append(0x01)
+        args.append(addr[5])
+        args.append(0x2f)   # Bco stream format support
+        args.append(0xc1)   # List request
+        args.append(addr[0])
+        args.append(addr[1])
+        args.append(addr[2])
+        args.append(addr[3])
+        args.append(addr[4])
+        args.append(0xff)
+        args.append(0x00)
+        args.append(0xff)
         for i in range(0xff):
             # DM1500 tends to cause timeout.
             time.sleep(0.1)
+            args[10] = i
             try:
-                args = bytearray()
-                args.append(0x01)
-                args.append(addr[5])
-                args.append(0x2f)   # Bco stream format support
-                args.append(0xc1)   # List request
-                args.append(addr[0])
-                args.append(addr[1])
-                args.append(addr[2])
-                args.append(addr[3])
-                args.append(addr[4])
-                args.append(0xff)
-                args.append(i)
-                args.append(0xff)
                 params = AvcGeneral.command_status(fcp, args)
-                fmts.append(cls._parse_format(params[11:]))
             except OSError as e:
                 if str(e) != 'Rejected':
                     raise
-                else:
-                    break
-        return fmts
+                return
+            yield cls._parse_format(params[11:])
+
+    @classmethod
+    def get_entry_list(cls, fcp, addr):
+        return list(cls.iterate_entries(fcp, addr))
+
+    @classmethod
+    def seek_entry(cls, fcp, addr, rate):
+        if rate not in AvcStreamFormatInfo.SAMPLING_RATES:
+            raise ValueError('Invalid argument for sampling rate')
+        for fmt in cls.iterate_entries(fcp, addr):
+            if fmt['sampling-rate'] == rate:
+                return fmt
+        return None
+
+    @classmethod
+    def _parse_type(cls, code):
+        if code <= 0x0f:
+            return cls.data_types[code]
+        elif code == 0x40:
+            return 'sync-stream'
+        elif code == 0xff:
+            return 'do-not-care'
+        else:
+            return 'reserved'
 
     # Two types of sync stream: 0x90/0x00/0x40 and 0x90/0x40 with 'sync-stream'
     @classmethod
@@ -571,7 +593,7 @@ class BcoStreamFormatInfo():
             fmt['type'] = 'Sync'
             fmt['rate-control'] = AvcStreamFormatInfo.RATE_CONTROLS[ctl]
             fmt['sampling-rate'] = AvcStreamFormatInfo.SAMPLING_RATES[rate]
-            fmt['formation'] = ['multi-bit-linear-audio-raw']
+            fmt['formation'] = [(1, 'multi-bit-linear-audio-raw')]
             return fmt
         if params[0] != 0x90 or params[1] != 0x40:
             raise RuntimeError('Unsupported format')
@@ -579,17 +601,11 @@ class BcoStreamFormatInfo():
         fmt['sampling-rate'] = AvcStreamFormatInfo.SAMPLING_RATES[params[2]]
         ctl = params[3] & 0x3
         fmt['rate-control'] = AvcStreamFormatInfo.RATE_CONTROLS[ctl]
+        # The same run-length form as AvcStreamFormatInfo.
         formation = []
         for i in range(params[4]):
-            for c in range(params[5 + i * 2]):
-                type = params[5 + i * 2 + 1]
-                if type <= 0x0f:
-                    formation.append(cls.data_types[type])
-                elif type == 0x40:
-                    formation.append('sync-stream')
-                elif type == 0xff:
-                    formation.append('do-not-care')
-                else:
-                    formation.append('reserved')
+            count = params[5 + i * 2]
+            type = cls._parse_type(params[5 + i * 2 + 1])
+            formation.append((count, type))
         fmt['formation'] = formation
         return fmt
@@ -3,9 +3,7 @@
 
 from struct import pack, unpack
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.bebob.bebob_unit import BebobUnit
 from hinawa_utils.ta1394.audio import AvcAudio
@@ -1,12 +1,11 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
+from array import array
 from re import match
-from struct import unpack
+from struct import Struct
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.bebob.maudio_protocol_abstract import MaudioProtocolAbstract
 
@@ -156,6 +155,10 @@ class MaudioProtocolNormal(MaudioProtocolAbstract):
         76,
     )
 
+    # The last quadlet of metering has the state of hardware, when available.
+    __HW_STATE_LABELS = ('rotery-0', 'rotery-1', 'rotery-2',
+                         'switch-0', 'switch-1', 'rate', 'sync')
+
     __CLOCKS = (
         {},
         {'Internal':    AvcCcm.get_subunit_signal_addr('music', 0, 1),
@@ -187,6 +190,18 @@ class MaudioProtocolNormal(MaudioProtocolAbstract):
         self.__meters = self.__METERS[index]
         self.__clocks = self.__CLOCKS[index]
 
+        # Reused for metering in each period.
+        self.__meter_req = Hinawa.FwReq.new()
+        self.__meter_frames = bytearray(self.__meters)
+        count = len(self.labels['meters'])
+        self.__meter_struct = Struct('>{0}I'.format(count))
+        self.__meter_labels = self.labels['meters']
+        if self.__meters > self.__meter_struct.size:
+            self.__meter_labels += self.__HW_STATE_LABELS
+
+        # Feature controls which the unit doesn't implement.
+        self.__unsupported = set()
+
     def _refer_fb_data(self, targets, index, ch):
         if index >= len(targets):
             raise ValueError('Invalid argument for function block index')
@@ -208,6 +223,29 @@ class MaudioProtocolNormal(MaudioProtocolAbstract):
                                                  fb, ch)
         return AvcAudio.parse_data_to_db(data)
 
+    # Read the volumes of all inputs and outputs at once. The key of returned
+    # dictionary is a tuple of kind, target and channel, as the same as the
+    # arguments of each getter.
+    def get_volumes(self):
+        entries = {}
+        for kind, labels, targets in (
+                ('input-gain', self.labels['inputs'], self.__inputs),
+                ('aux-input', self.get_aux_input_labels(), self.__aux_inputs),
+                ('output-volume', self.get_output_labels(), self.__outputs),
+                ('headphone-volume', self.get_headphone_labels(),
+                 self.__hp_outs)):
+            for target, (fb, chs) in zip(labels, targets):
+                for ch, fb_ch in enumerate(chs):
+                    entries[(kind, target, ch)] = (fb, fb_ch, 'volume')
+        states = AvcAudio.get_feature_states(self.unit.fcp, 0, 'current',
+                                             entries.values(),
+                                             self.__unsupported)
+        volumes = {}
+        for key, entry in entries.items():
+            if entry in states:
+                volumes[key] = AvcAudio.parse_data_to_db(states[entry])
+        return volumes
+
     def get_input_labels(self):
         return self.labels['inputs']
 
@@ -430,27 +468,32 @@ class MaudioProtocolNormal(MaudioProtocolAbstract):
     # db = 20 * log10(vol / 0x80000000)
     # vol = 0, then db = -144.0
     # may differs analog-in and the others.
-    def get_meters(self):
-        labels = self.labels['meters']
-        meters = {}
-        req = Hinawa.FwReq.new()
-        frames = [0] * 256
+    def get_meter_labels(self):
+        return self.__meter_labels
+
+    def _read_meter_frames(self):
+        req = self.__meter_req
         _, data = req.transaction(self.unit.get_node(),
                                   Hinawa.FwTcode.READ_BLOCK_REQUEST,
                                   self._ADDR_FOR_METERING, self.__meters,
-                                  frames, 100)
-        for i, name in enumerate(labels):
-            meters[name] = unpack('>I', data[i * 4:(i + 1) * 4])[0]
-        if len(data) > len(labels) * 4:
-            meters['rotery-0'] = data[-3] & 0x0f
-            meters['rotery-1'] = (data[-3] & 0xf0) >> 4
-            meters['rotery-2'] = 0
-            meters['switch-0'] = (data[-4] & 0xf0) >> 4
-            meters['switch-1'] = data[-4] & 0x0f
-            meters['rate'] = AvcConnection.SAMPLING_RATES[data[-2]]
-            meters['sync'] = data[-1] & 0x0f
+                                  self.__meter_frames, 100)
+        return data
+
+    # The array is aligned to the labels of meters.
+    def get_meter_array(self):
+        data = self._read_meter_frames()
+        meters = array('I', self.__meter_struct.unpack_from(data))
+        if len(data) > self.__meter_struct.size:
+            # In the order of __HW_STATE_LABELS.
+            meters.extend((data[-3] & 0x0f, (data[-3] & 0xf0) >> 4, 0,
+                           (data[-4] & 0xf0) >> 4, data[-4] & 0x0f,
+                           AvcConnection.SAMPLING_RATES[data[-2]],
+                           data[-1] & 0x0f))
         return meters
 
+    def get_meters(self):
+        return dict(zip(self.__meter_labels, self.get_meter_array()))
+
     def get_clock_source_labels(self):
         return self.__clocks.keys()
 
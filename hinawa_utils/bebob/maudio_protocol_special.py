@@ -4,9 +4,7 @@
 from struct import unpack, pack
 from pathlib import Path
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.bebob.maudio_protocol_abstract import MaudioProtocolAbstract
 
@@ -39,6 +39,7 @@ class PhaseGoProtocolAbstract(metaclass=ABCMeta):
         self.__company_ids = unit_info['company-id']
         self.__mixer_output_fb = mixer_output_fb
         self.__output_labels = output_labels
+        self.__unsupported = set()
 
     # For mixer inputs.
     def get_mixer_input_labels(self):
@@ -70,6 +71,25 @@ class PhaseGoProtocolAbstract(metaclass=ABCMeta):
         fb, ch = self.__check_mixer_input_channel(target, ch)
         return AvcAudio.get_feature_mute_state(self.fcp, 0, 'current', fb, ch)
 
+    # Read volume and mute of all mixer inputs at once.
+    def get_mixer_input_states(self):
+        targets = []
+        for fb in self.__MIXER_INPUTS.values():
+            for ch in (1, 2):
+                targets.append((fb, ch, 'volume'))
+                targets.append((fb, ch, 'mute'))
+        states = AvcAudio.get_feature_states(self.fcp, 0, 'current', targets,
+                                             self.__unsupported)
+        results = {}
+        for target, fb in self.__MIXER_INPUTS.items():
+            for ch in (1, 2):
+                data = states.get((fb, ch, 'volume'))
+                if data is not None:
+                    data = AvcAudio.parse_data_to_db(data)
+                mute = states.get((fb, ch, 'mute'))
+                results[(target, ch)] = (data, mute)
+        return results
+
     # For mixer output.
     def __check_mixer_output_channel(self, ch):
         if ch not in (1, 2):
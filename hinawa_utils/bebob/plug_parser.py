@@ -5,7 +5,6 @@ from hinawa_utils.ta1394.general import AvcGeneral
 from hinawa_utils.ta1394.general import AvcConnection
 from hinawa_utils.ta1394.ccm import AvcCcm
 
-from hinawa_utils.bebob.bebob_unit import BebobUnit
 from hinawa_utils.bebob.extensions import BcoPlugInfo
 from hinawa_utils.bebob.extensions import BcoSubunitInfo
 from hinawa_utils.bebob.extensions import BcoStreamFormatInfo
@@ -2,7 +2,8 @@
 # Copyright (C) 2018 Takashi Sakamoto
 
 from struct import pack, unpack
-from math import pow, log10
+
+from hinawa_utils.misc.gain import LogCoeffGain
 
 from hinawa_utils.dg00x.dg00x_unit import Dg00xUnit
 
@@ -12,6 +13,7 @@ __all__ = ['Dg003Unit']
 class Dg003Unit(Dg00xUnit):
     __OFFSET_MIXER_SRC = 0x0300
     __MAX_COEFF = 0x1fffffff
+    __GAIN = LogCoeffGain(__MAX_COEFF)
 
     def __init__(self, path):
         super().__init__(path)
@@ -35,6 +37,11 @@ class Dg003Unit(Dg00xUnit):
             labels.append('ADAT-{0}/{1}'.format(ch, ch + 1))
         return labels
 
+    # Read the coefficients of all sources by one block transaction.
+    def prefetch_mixer_srcs(self):
+        self.prefetch_registers(self.__OFFSET_MIXER_SRC,
+                                len(self.get_mixer_src_labels()) * 0x10)
+
     def __write_src_pair(self, pair):
         for elem in pair:
             offset = elem[0]
@@ -56,14 +63,10 @@ class Dg003Unit(Dg00xUnit):
         return pair
 
     def __parse_val_to_db(self, val):
-        if val == 0:
-            return float('-inf')
-        return 20 * log10(val / self.__MAX_COEFF)
+        return self.__GAIN.parse_val_to_db(val)
 
     def __build_val_from_db(self, db):
-        if db == float('-inf'):
-            return 0
-        return int(self.__MAX_COEFF * pow(10, db / 20))
+        return self.__GAIN.build_val_from_db(db)
 
     def set_mixer_src_balance(self, src, ch, balance):
         pair = self.__read_src_pair(src, ch)
@@ -3,11 +3,7 @@
 
 from threading import Thread
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
 
 from hinawa_utils.dg00x.config_rom_parser import Dg00xConfigRomParser
 
@@ -23,6 +19,8 @@ class Dg00xUnit(Hitaki.SndDigi00x):
 
     def __init__(self, path):
         super().__init__()
+        # The offset and the content of registers read in advance.
+        self.__snapshot = None
         self.open(path, 0)
         if self.get_property('unit-type') != 5:
             raise ValueError('The character device is not for Dg00x unit')
@@ -64,7 +62,31 @@ class Dg00xUnit(Hitaki.SndDigi00x):
     def get_node(self):
         return self.__node
 
+    # Read the range of registers by one block transaction, to serve the
+    # following reads in the range till clear_prefetched() is called. The
+    # writes in the range are applied to the content as well.
+    def prefetch_registers(self, offset, size):
+        self.__snapshot = None
+        data = self._read_transaction(offset, size)
+        self.__snapshot = (offset, bytearray(data))
+
+    def clear_prefetched(self):
+        self.__snapshot = None
+
+    def __find_snapshot(self, offset, size):
+        if self.__snapshot is None:
+            return None
+        begin, content = self.__snapshot
+        if offset < begin or offset + size > begin + len(content):
+            return None
+        return content, offset - begin
+
     def _read_transaction(self, offset, size):
+        found = self.__find_snapshot(offset, size)
+        if found is not None:
+            content, pos = found
+            return bytearray(content[pos:pos + size])
+
         req = Hinawa.FwReq.new()
         addr = self.__BASE_ADDR + offset
         if size == 4:
@@ -84,6 +106,11 @@ class Dg00xUnit(Hitaki.SndDigi00x):
             tcode = Hinawa.FwTcode.WRITE_BLOCK_REQUEST
         _, _ = req.transaction(self.get_node(), tcode, addr, len(data), data, 100)
 
+        found = self.__find_snapshot(offset, len(data))
+        if found is not None:
+            content, pos = found
+            content[pos:pos + len(data)] = data
+
     def set_clock_source(self, source):
         if source not in self.SUPPORTED_CLOCK_SOURCES:
             raise ValueError('Invalid argument for clock source.')
@@ -1,11 +1,12 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-from struct import pack, unpack
+from array import array
+from struct import Struct, pack, unpack
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
+
+from hinawa_utils.misc.gain import LinearGain
 
 from hinawa_utils.dice.dice_unit import DiceUnit
 
@@ -64,6 +65,7 @@ class AlesisIoUnit(DiceUnit):
         'Mixer-7/8': 0x0458,
     }
     __METER_OFFSET = 0x4c0
+    __METER_STRUCT = Struct('>40I')
     __MIXER_OUT_LEVEL_OFFSET = 0x0564
     __MIXER_23_24_SWITCH = 0x0568
     __SPDIF_OUT_SRC_OFFSET = 0x056c
@@ -72,6 +74,8 @@ class AlesisIoUnit(DiceUnit):
     __MAIN_LEVEL_OFFSET = 0x0578    # 0x0000 - 0x0100
 
     __MAX_COEFF = 0x007fffff
+    # -60..0dB
+    __GAIN = LinearGain(-60.0, 0.0, __MAX_COEFF)
 
     __MIXER_SRC_LABELS = (
         'Analog-1/2',
@@ -123,6 +127,36 @@ class AlesisIoUnit(DiceUnit):
             data = bytearray(4)
             self.__write_data(self.__MIXER_23_24_SWITCH, data)
 
+        # The quadlets in meter block for the unit.
+        indexes = list(range(0, 24))
+        if self.__specs['has_adat_b']:
+            indexes.extend(range(25, 30))
+        indexes.extend(range(30, 40))
+        self.__meter_indexes = tuple(indexes)
+
+        # The switch for 23/24 ports of mixer source is cached, and invalidated
+        # by notification since the other programs can change it.
+        self.__mixer_23_24_switch = None
+        self.__meter_labels = None
+        self.register_notification_handler(None, self.__invalidate_switch)
+
+    def __invalidate_switch(self, events):
+        self.__mixer_23_24_switch = None
+        self.__meter_labels = None
+
+    def __read_mixer_23_24_switch(self):
+        data = self.__read_data(self.__MIXER_23_24_SWITCH, 4)
+        val = unpack('>I', data)[0]
+        if val != self.__mixer_23_24_switch:
+            self.__meter_labels = None
+        self.__mixer_23_24_switch = val
+        return val
+
+    def __get_mixer_23_24_switch(self):
+        if self.__mixer_23_24_switch is None:
+            return self.__read_mixer_23_24_switch()
+        return self.__mixer_23_24_switch
+
     def __write_data(self, offset, data):
         req = Hinawa.FwReq.new()
         offset += self.__BASE_OFFSET
@@ -153,8 +187,7 @@ class AlesisIoUnit(DiceUnit):
                 labels.append('ADAT-A-{0}/{1}'.format(ch, ch + 1))
             for ch in range(1, 6, 2):
                 labels.append('ADAT-B-{0}/{1}'.format(ch, ch + 1))
-            data = self.__read_data(self.__MIXER_23_24_SWITCH, 4)
-            val = unpack('>I', data)[0]
+            val = self.__get_mixer_23_24_switch()
             if val > 0:
                 labels.append('ADAT-B-7/8')
             else:
@@ -206,14 +239,11 @@ class AlesisIoUnit(DiceUnit):
             vals[1] = vals[1] * self.__MAX_COEFF // total
         return vals
 
-    # -60..0dB
     def __parse_val_to_db(self, val):
-        return float(-60.0 + val * 60 / self.__MAX_COEFF)
+        return self.__GAIN.parse_val_to_db(val)
 
     def __build_val_from_db(self, db):
-        if db > 0:
-            raise ValueError('Invalid argument for dB value.')
-        return int((db + 60.0) * self.__MAX_COEFF / 60)
+        return self.__GAIN.build_val_from_db(db)
 
     def set_mixer_src_gain(self, dst, src, src_ch, db):
         if src_ch not in (0, 1):
@@ -319,10 +349,10 @@ class AlesisIoUnit(DiceUnit):
             val = 1
         data = pack('>I', val)
         self.__write_data(self.__MIXER_23_24_SWITCH, data)
+        self.__invalidate_switch(())
 
     def get_mixer_spdif_src(self):
-        data = self.__read_data(self.__MIXER_23_24_SWITCH, 4)
-        val = unpack('>I', data)[0]
+        val = self.__read_mixer_23_24_switch()
         return bool(val == 0)
 
     def get_level_labels(self):
@@ -462,6 +492,9 @@ class AlesisIoUnit(DiceUnit):
         return srcs[val]
 
     def get_meter_labels(self):
+        if self.__meter_labels is not None:
+            return list(self.__meter_labels)
+
         labels = []
         for ch in range(1, 9):
             labels.append('Analog-{0}'.format(ch))
@@ -477,27 +510,25 @@ class AlesisIoUnit(DiceUnit):
                 labels.append('ADAT-A-{0}'.format(ch))
             for ch in range(1, 7):
                 labels.append('ADAT-B-{0}'.format(ch))
-            data = self.__read_data(self.__MIXER_23_24_SWITCH, 4)
-            val = unpack('>I', data)[0]
+            val = self.__get_mixer_23_24_switch()
             if val:
                 labels.append('ADAT-B-7/8')
             else:
                 labels.append('S/PDIF-1/2')
         for ch in range(1, 9):
             labels.append('Mixer-{0}'.format(ch))
+        self.__meter_labels = tuple(labels)
         return labels
 
+    # The array of dB aligned to the labels of meters.
+    def get_meter_array(self):
+        data = self.__read_data(self.__METER_OFFSET, self.__METER_STRUCT.size)
+        vals = self.__METER_STRUCT.unpack(data)
+        return array('d', map(self.__GAIN.parse_val_to_db,
+                              map(vals.__getitem__, self.__meter_indexes)))
+
     def get_meters(self):
-        meters = []
-        data = self.__read_data(self.__METER_OFFSET, 160)
-        vals = unpack('>40I', data)
-        meters.extend(vals[0:24])
-        if self.__specs['has_adat_b']:
-            meters.extend(vals[25:30])
-        meters.extend(vals[30:])
-        for i, meter in enumerate(meters):
-            meters[i] = self.__parse_val_to_db(meter)
-        return meters
+        return list(self.get_meter_array())
 
     def get_mix_blend_ratio(self):
         data = self.__read_data(self.__MIX_BLEND_OFFSET, 4)
@@ -1,13 +1,14 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-from threading import Timer
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, RLock
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.dice.dice_unit import DiceUnit
+from hinawa_utils.dice.router_state import DiceRouterState
 
 from hinawa_utils.dice.tcat_protocol_extension import ExtCtlSpace, ExtCapsSpace, ExtCmdSpace, ExtMixerSpace, ExtNewRouterSpace, ExtPeakSpace, ExtCurrentConfigSpace, ExtStandaloneSpace
 
@@ -26,6 +27,11 @@ class DiceExtendedUnit(DiceUnit):
         'high':     (176400, 192000),
     }
 
+    # The available ports and the mode of rate depend on stream configuration
+    # and sampling clock.
+    _ROUTER_NOTIFICATIONS = ('rx-config', 'tx-config', 'clock-accepted',
+                             'vendor')
+
     _SPECS = (
         MaudioProfireSpec,
         FocusriteSaffireproSpec,
@@ -49,9 +55,26 @@ class DiceExtendedUnit(DiceUnit):
             index = 0
         self._spec = spec(index)
 
+        # The state of router is guarded by the lock and replaced at once. The
+        # handler of notification just marks it stale, then it's cached again
+        # in the thread of caller at next access.
+        self.__lock = RLock()
+        self.__state = None
+        self.__stale = True
+
+        # The unit executes one command at a time. The write of parameters, the
+        # initiation and the wait of completion are done with the lock in the
+        # thread of executor, in the order of call. The events wake the
+        # waiters at notification.
+        self.__cmd_executor = ThreadPoolExecutor(max_workers=1)
+        self.__cmd_lock = Lock()
+        self.__cmd_events = []
+        self.__events_lock = Lock()
+
         # Cache current format of packets in data stream.
-        self._cache_router_nodes()
-        self.connect('notified', self._handle_notification)
+        with self.__lock:
+            self._cache_router_nodes()
+        self.register_notification_handler(None, self._handle_notification)
 
     def _get_rate_mode(self, rate):
         for mode, rates in self._RATE_MODES.items():
@@ -60,11 +83,69 @@ class DiceExtendedUnit(DiceUnit):
         else:
             raise ValueError('Invalid argument for sampling rate.')
 
-    def _handle_notification(self, obj, message):
-        # MEMO: don't stop event loop.
-        Timer(0, self._cache_router_nodes)
+    def _handle_notification(self, events):
+        # MEMO: this runs in the thread of dispatcher, thus no transaction is
+        # executed here. A burst of notifications results in one re-read.
+        with self.__events_lock:
+            for event in self.__cmd_events:
+                event.set()
+        for event in events:
+            if event.kind in self._ROUTER_NOTIFICATIONS:
+                self.__stale = True
+                break
 
+    def __get_state(self):
+        with self.__lock:
+            if self.__stale:
+                self._cache_router_nodes()
+            return self.__state
+
+    @property
+    def _srcs(self):
+        return self.__get_state()[0]
+
+    @property
+    def _dsts(self):
+        return self.__get_state()[1]
+
+    @property
+    def _router(self):
+        return self.__get_state()[2]
+
+    @property
+    def _meter_layout(self):
+        return self.__get_state()[3]
+
+    def release(self):
+        self.__cmd_executor.shutdown()
+        super().release()
+
+    def __execute_cmd(self, req, cmd, mode, write):
+        event = Event()
+        with self.__cmd_lock:
+            with self.__events_lock:
+                self.__cmd_events.append(event)
+            try:
+                if write is not None:
+                    write(req)
+                ExtCmdSpace.initiate(self._protocol, req, cmd, mode, event)
+            finally:
+                with self.__events_lock:
+                    self.__cmd_events.remove(event)
+
+    # Return Future resolved with the result when the unit completes the
+    # command. The write is called with the request before initiating the
+    # command. The request should not be used till the future is done.
+    def _initiate_async(self, req, cmd, mode, result=None, write=None):
+        def execute():
+            self.__execute_cmd(req, cmd, mode, write)
+            return result
+        return self.__cmd_executor.submit(execute)
+
+    # The lock should be held.
     def _cache_router_nodes(self):
+        # The notification during the re-read marks it stale again.
+        self.__stale = False
         req = Hinawa.FwReq.new()
 
         rate = self._protocol.read_sampling_rate(req)
@@ -77,16 +158,49 @@ class DiceExtendedUnit(DiceUnit):
         routes = self._spec.normalize_router_entries(self._protocol, entries,
                                                      srcs, dsts)
 
+        # The router is kept for the same ports when it has staged changes or
+        # the same routes, typically after the load command of this module.
+        prev = self.__state
+        if prev is not None and prev[0] == srcs and prev[1] == dsts and \
+                (prev[2].has_staged() or len(prev[2].diff(routes)) == 0):
+            router = prev[2]
+            committed = router.get_committed()
+            if committed is not None and \
+                    list(map(router.get_key, committed)) != \
+                    list(map(router.get_key, routes)):
+                # The section can be written by the other programs.
+                router.forget_committed()
+        else:
+            router = DiceRouterState(srcs, dsts, routes)
+
         # MEMO: if registered entries are not generated by this module, update
         # them. Not friendly to the other programs while these entries are
         # valid for the programs.
-        if entries != routes:
-            ExtNewRouterSpace.set_entries(self._protocol, req, routes)
-            ExtCmdSpace.initiate(self._protocol, req, 'load-from-router', mode)
+        if not router.has_staged() and len(router.diff(entries)) > 0:
+            self._commit_router_async(router, req, mode).result()
+
+        self.__state = (srcs, dsts, router,
+                        self._build_meter_layout(srcs, dsts))
 
-        self._srcs = srcs
-        self._dsts = dsts
-        self._routes = routes
+    # The byte of router entry, (blk, ch), to the position in the ports, with
+    # the pair of label and index of channel in the port.
+    @staticmethod
+    def _index_ports(ports, blk_ids):
+        labels = []
+        table = array('i', [-1] * 256)
+        for label, blk, chs in ports:
+            blk_id = blk_ids.index(blk)
+            for index, ch in enumerate(chs):
+                table[(blk_id << 4) | ch] = len(labels)
+                labels.append((label, index))
+        return tuple(labels), table
+
+    def _build_meter_layout(self, srcs, dsts):
+        src_labels, src_table = self._index_ports(
+                                    srcs, ExtNewRouterSpace._SRC_BLK_IDS)
+        dst_labels, dst_table = self._index_ports(
+                                    dsts, ExtNewRouterSpace._DST_BLK_IDS)
+        return src_labels, dst_labels, src_table, dst_table
 
     def get_caps(self, category):
         if category not in self._protocol._ext_caps:
@@ -108,25 +222,20 @@ class DiceExtendedUnit(DiceUnit):
         req = Hinawa.FwReq.new()
         routes = ExtCurrentConfigSpace.read_router_config(self._protocol, req,
                                                           mode)
+        router = self._router
         for route in routes:
-            for src in self._srcs:
-                if route['src-blk'] == src[1] and route['src-ch'] in src[2]:
-                    break
-            else:
-                continue
-            for dst in self._dsts:
-                if route['dst-blk'] == dst[1] and route['dst-ch'] in dst[2]:
-                    break
-            else:
+            src = router.lookup_src(route['src-blk'], route['src-ch'])
+            dst = router.lookup_dst(route['dst-blk'], route['dst-ch'])
+            if src is None or dst is None:
                 continue
             entry = {
-                'src': '{0}:{1}'.format(src[0], src[2].index(route['src-ch'])),
-                'dst': '{0}:{1}'.format(dst[0], dst[2].index(route['dst-ch'])),
+                'src': '{0}:{1}'.format(*src),
+                'dst': '{0}:{1}'.format(*dst),
             }
             entries.append(entry)
         return entries
 
-    def store_to_storage(self):
+    def __get_storage_categories(self, msg):
         if not self._protocol._ext_caps['general']['storage-available']:
             raise RuntimeError('This feature is not supported.')
 
@@ -138,101 +247,72 @@ class DiceExtendedUnit(DiceUnit):
         if self._protocol._ext_caps['router']['is-storable']:
             categories.append('router')
         if len(categories) == 0:
-            raise RuntimeError('Nothing can be stored.')
+            raise RuntimeError(msg)
+        return categories
+
+    # Return Future resolved with the categories.
+    def store_to_storage_async(self):
+        categories = self.__get_storage_categories('Nothing can be stored.')
 
         req = Hinawa.FwReq.new()
         rate = self._protocol.read_sampling_rate(req)
         mode = self._get_rate_mode(rate)
-        ExtCmdSpace(self._protocol, req, 'load-to-storage', mode)
-
         # MEMO: however, in most models, configuration of router is stored by
         # 'load-from-router' command.
-        return categories
+        return self._initiate_async(req, 'load-to-storage', mode, categories)
 
-    def load_from_storage(self):
-        if not self._protocol._ext_caps['general']['storage-available']:
-            raise RuntimeError('This feature is not supported.')
+    def store_to_storage(self):
+        return self.store_to_storage_async().result()
 
-        categories = []
-        if self._protocol._ext_caps['general']['storable-stream-conf']:
-            categories.append('stream-config')
-        if self._protocol._ext_caps['mixer']['is-storable']:
-            categories.append('mixer')
-        if self._protocol._ext_caps['router']['is-storable']:
-            categories.append('router')
-        if len(categories) == 0:
-            raise RuntimeError('Nothing can be loaded.')
+    # Return Future resolved with the categories.
+    def load_from_storage_async(self):
+        categories = self.__get_storage_categories('Nothing can be loaded.')
 
         req = Hinawa.FwReq.new()
         rate = self._protocol.read_sampling_rate(req)
         mode = self._get_rate_mode(rate)
-        ExtCmdSpace.initiate(self._protocol, req, 'load-from-storage', mode)
         # MEMO: I expect notification here.
-        return categories
+        return self._initiate_async(req, 'load-from-storage', mode,
+                                    categories)
 
-    def _find_route_pairs(self, target):
-        for dst in self._dsts:
-            if target == dst[0]:
-                break
-        else:
-            raise ValueError('Invalid argument for destination.')
-
-        pairs = []
-        for route in self._routes:
-            if route['dst-blk'] == dst[1] and route['dst-ch'] in dst[2]:
-                pairs.append(route)
-
-        return sorted(pairs, key=lambda pair: (pair['src-ch'], pair['dst-ch']))
+    def load_from_storage(self):
+        return self.load_from_storage_async().result()
+
+    # Write the entries which differ from the ones in the section of unit, then
+    # load them by one command. The section is read once if not known. At
+    # failure, the router is read from the unit again.
+    def _commit_router_async(self, router, req, mode, result=None):
+        routes = router.take_routes()
+
+        def write(req):
+            committed = router.get_committed()
+            if committed is None:
+                committed = ExtNewRouterSpace.get_entries(self._protocol, req)
+            router.forget_committed()
+            ExtNewRouterSpace.update_entries(self._protocol, req, routes,
+                                             committed)
+            router.set_committed(routes)
+
+        def done(future):
+            if future.exception() is not None:
+                self.__stale = True
+
+        future = self._initiate_async(req, 'load-from-router', mode, result,
+                                      write)
+        future.add_done_callback(done)
+        return future
+
+    # Apply the list of (target, source) at once.
+    def _set_target_sources(self, changes):
+        with self.__lock:
+            self._router.set_sources(changes)
+            self.commit_router_sources()
 
     def _set_target_source(self, target, source):
-        pairs = self._find_route_pairs(target)
-
-        if source == 'None':
-            indices = []
-            for pair in pairs:
-                indices.append(self._routes.index(pair))
-            # Pop backwards.
-            indices.sort(reverse=True)
-            for index in indices:
-                self._routes.pop(index)
-        else:
-            for dst in self._dsts:
-                if target == dst[0]:
-                    break
-            for src in self._srcs:
-                if source == src[0]:
-                    break
-
-            if len(pairs) > 0:
-                # Left->Left, Right->Right.
-                for i, pair in enumerate(pairs):
-                    pair['src-blk'] = src[1]
-                    pair['src-ch'] = src[2][i]
-            else:
-                for i in range(2):
-                    pair = {
-                        'src-blk':  src[1],
-                        'src-ch':   src[2][i],
-                        'dst-blk':  dst[1],
-                        'dst-ch':   dst[2][i],
-                        'peak':     0,
-                    }
-                    self._routes.append(pair)
-
-        req = Hinawa.FwReq.new()
-        rate = self._protocol.read_sampling_rate(req)
-        mode = self._get_rate_mode(rate)
-        ExtNewRouterSpace.set_entries(self._protocol, req, self._routes)
-        ExtCmdSpace.initiate(self._protocol, req, 'load-from-router', mode)
+        self._set_target_sources(((target, source), ))
 
     def _get_target_source(self, target):
-        pairs = self._find_route_pairs(target)
-
-        for pair in pairs:
-            for src in self._srcs:
-                if pair['src-blk'] == src[1] and pair['src-ch'] in src[2]:
-                    return src[0]
-        return 'None'
+        return self._router.get_source(target)
 
     def get_output_labels(self):
         labels = []
@@ -317,6 +397,46 @@ class DiceExtendedUnit(DiceUnit):
             raise ValueError('Invalid argument for mixer pair.')
         return self._get_target_source(target)
 
+    # Stage the list of (target, source) for outputs, tx streams and inputs of
+    # mixer. The changes are written by commit_router_sources().
+    def stage_router_sources(self, changes):
+        changes = list(changes)
+        for target, source in changes:
+            if target in self.get_mixer_input_labels():
+                if source not in self.get_mixer_source_labels():
+                    raise ValueError('Invalid argument for mixer source pair.')
+            elif target in self.get_output_labels() or \
+                    target in self.get_tx_stream_labels():
+                if source not in self.get_output_source_labels():
+                    raise ValueError('Invalid argument for source pair.')
+            else:
+                raise ValueError('Invalid argument for destination pair.')
+        with self.__lock:
+            self._router.set_sources(changes)
+
+    # Write the staged changes by one write of changed entries and one load
+    # command. The staged changes are lost when notification of the unit
+    # updates the router. Return Future resolved with whether anything is
+    # written.
+    def commit_router_sources_async(self):
+        with self.__lock:
+            router = self._router
+            if not router.has_staged():
+                future = Future()
+                future.set_result(False)
+                return future
+            req = Hinawa.FwReq.new()
+            rate = self._protocol.read_sampling_rate(req)
+            mode = self._get_rate_mode(rate)
+            return self._commit_router_async(router, req, mode, True)
+
+    def commit_router_sources(self):
+        return self.commit_router_sources_async().result()
+
+    def set_router_sources(self, changes):
+        self.stage_router_sources(changes)
+        self.commit_router_sources()
+
     def _get_mixer_gains(self, req, output, input, ch):
         if self.get_mixer_source(input) == 'None':
             raise ValueError('This input to mixer has no source.')
@@ -362,8 +482,8 @@ class DiceExtendedUnit(DiceUnit):
         total = gains[0]['val'] + gains[1]['val']
         val = ExtMixerSpace.build_val_from_db(db)
         if total == 0:
-            gains[ch] = val
-            gains[(ch + 1) % 2] = 0
+            gains[ch]['val'] = val
+            gains[(ch + 1) % 2]['val'] = 0
         else:
             gains[0]['val'] = gains[0]['val'] * val // total
             gains[1]['val'] = gains[1]['val'] * val // total
@@ -397,6 +517,19 @@ class DiceExtendedUnit(DiceUnit):
             balance = float(100 * gains[1]['val'] // total)
         return balance
 
+    # The coefficients of mixer as the list of rows for output channels, each
+    # of which is the list for input channels.
+    def get_mixer_matrix(self):
+        req = Hinawa.FwReq.new()
+        return ExtMixerSpace.read_matrix(self._protocol, req)
+
+    # Write the coefficients which differ from the ones in the unit. The mixer
+    # is read once to compare.
+    def set_mixer_matrix(self, matrix):
+        req = Hinawa.FwReq.new()
+        prev = ExtMixerSpace.read_matrix(self._protocol, req)
+        ExtMixerSpace.write_matrix(self._protocol, req, matrix, prev)
+
     def get_mixer_saturations(self):
         outputs = self.get_mixer_output_labels()
 
@@ -414,30 +547,46 @@ class DiceExtendedUnit(DiceUnit):
             mixer_saturations[label][i % 2] = saturation
         return mixer_saturations
 
+    def _read_peaks(self):
+        req = Hinawa.FwReq.new()
+        data = ExtPeakSpace.read_data(self._protocol, req)
+        return ExtPeakSpace.parse_data(data)
+
+    # Return the labels of rows and columns, and the matrix of peaks in row
+    # major order. Each label is the pair of port label and channel index.
+    def get_metering_matrix(self):
+        # The layout can be replaced by the handler of notification.
+        srcs, dsts, src_table, dst_table = self._meter_layout
+        width = len(dsts)
+        matrix = array('H', bytes(2 * len(srcs) * width))
+
+        peaks, routes = self._read_peaks()
+        for peak, route in zip(peaks, routes):
+            row = src_table[route >> 8]
+            col = dst_table[route & 0xff]
+            if row >= 0 and col >= 0:
+                matrix[row * width + col] = peak
+
+        return srcs, dsts, matrix
+
     def get_metering(self):
         meters = {}
 
-        req = Hinawa.FwReq.new()
-        for peak in ExtPeakSpace.get(self._protocol, req):
-            for src in self._srcs:
-                if peak['src-blk'] == src[1] and peak['src-ch'] in src[2]:
-                    break
-            else:
-                continue
-            for dst in self._dsts:
-                if peak['dst-blk'] == dst[1] and peak['dst-ch'] in dst[2]:
-                    break
-            else:
+        srcs, dsts, src_table, dst_table = self._meter_layout
+        peaks, routes = self._read_peaks()
+        for peak, route in zip(peaks, routes):
+            row = src_table[route >> 8]
+            col = dst_table[route & 0xff]
+            if row < 0 or col < 0:
                 continue
 
-            src_index = src[2].index(peak['src-ch'])
-            dst_index = dst[2].index(peak['dst-ch'])
+            src_label, src_index = srcs[row]
+            dst_label, dst_index = dsts[col]
 
-            if src[0] not in meters:
-                meters[src[0]] = {0: {}, 1: {}}
-            if dst[0] not in meters[src[0]][src_index]:
-                meters[src[0]][src_index][dst[0]] = {0: 0, 1: 0}
-            meters[src[0]][src_index][dst[0]][dst_index] = peak['peak']
+            src_chs = meters.setdefault(src_label, {0: {}, 1: {}})
+            dst_blks = src_chs.setdefault(src_index, {})
+            dst_chs = dst_blks.setdefault(dst_label, {0: 0, 1: 0})
+            dst_chs[dst_index] = peak
 
         return meters
 
@@ -3,11 +3,9 @@
 
 from threading import Thread
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
+
+from hinawa_utils.misc.notification import NotificationDispatcher
 
 from hinawa_utils.dice.tcat_protocol_general import TcatProtocolGeneral
 from hinawa_utils.ta1394.config_rom_parser import Ta1394ConfigRomParser
@@ -48,7 +46,14 @@ class DiceUnit(Hitaki.SndDice):
         req = Hinawa.FwReq.new()
         self._protocol = TcatProtocolGeneral(self, req)
 
+        self.__notification_dispatcher = NotificationDispatcher(
+                                        TcatProtocolGeneral.parse_notification)
+        self.__notification_dispatcher.attach(self)
+        self.__notification_dispatcher.start()
+
     def release(self):
+        self.__notification_dispatcher.detach()
+        self.__notification_dispatcher.stop()
         self.__unit_dispatcher.quit()
         self.__node_dispatcher.quit()
         self.__unit_th.join()
@@ -63,6 +68,15 @@ class DiceUnit(Hitaki.SndDice):
     def get_node(self):
         return self.__node
 
+    # The handler is called with NotificationEvent in the thread of dispatcher,
+    # once for a burst of notifications. The handler for the kind of None is
+    # called with the list of events.
+    def register_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.register(kind, handler)
+
+    def unregister_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.unregister(kind, handler)
+
     def get_owner_addr(self):
         req = Hinawa.FwReq.new()
         return self._protocol.read_owner_addr(req)
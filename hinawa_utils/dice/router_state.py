@@ -0,0 +1,181 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+__all__ = ['DiceRouterState']
+
+
+# The entries of router with indexes. The ports are the list of (label, block,
+# channels) for sources and destinations. The routes are the entries of router
+# in the order to be registered, including the entries in fixed positions for
+# physical meters, thus one destination can appear several times. Each entry
+# is a dictionary, shared with the list given to ExtNewRouterSpace.
+class DiceRouterState():
+    def __init__(self, srcs, dsts, routes):
+        self.__src_ports, self.__src_chs = self.__index_ports(srcs)
+        self.__dst_ports, self.__dst_chs = self.__index_ports(dsts)
+        self.__routes = list(routes)
+        self.__by_dst = {}
+        for route in self.__routes:
+            self.__by_dst.setdefault(self.__get_dst(route), []).append(route)
+        # Built at first use after mutation.
+        self.__by_src = None
+        # The copy of entries in the section of unit, if known.
+        self.__committed = None
+        self.__staged = False
+
+    # Return the maps of label to (block, channels), and (block, channel) to
+    # (label, index of channel in the port).
+    @staticmethod
+    def __index_ports(ports):
+        blks = {}
+        chs = {}
+        for label, blk, port_chs in ports:
+            blks[label] = (blk, tuple(port_chs))
+            for index, ch in enumerate(port_chs):
+                chs.setdefault((blk, ch), (label, index))
+        return blks, chs
+
+    @staticmethod
+    def __get_src(route):
+        return (route['src-blk'], route['src-ch'])
+
+    @staticmethod
+    def __get_dst(route):
+        return (route['dst-blk'], route['dst-ch'])
+
+    @classmethod
+    def get_key(cls, route):
+        return cls.__get_src(route) + cls.__get_dst(route)
+
+    def __len__(self):
+        return len(self.__routes)
+
+    def get_routes(self):
+        return list(self.__routes)
+
+    def get_src_port(self, label):
+        if label not in self.__src_ports:
+            raise ValueError('Invalid argument for source.')
+        return self.__src_ports[label]
+
+    def get_dst_port(self, label):
+        if label not in self.__dst_ports:
+            raise ValueError('Invalid argument for destination.')
+        return self.__dst_ports[label]
+
+    # Return the pair of label and index of channel, or None.
+    def lookup_src(self, blk, ch):
+        return self.__src_chs.get((blk, ch))
+
+    def lookup_dst(self, blk, ch):
+        return self.__dst_chs.get((blk, ch))
+
+    # Return the routes to the destination in the order of channels.
+    def find_routes(self, dst_label):
+        blk, chs = self.get_dst_port(dst_label)
+        routes = []
+        for ch in chs:
+            routes.extend(self.__by_dst.get((blk, ch), ()))
+        return sorted(routes, key=lambda route: (route['src-ch'],
+                                                 route['dst-ch']))
+
+    # Return the routes from the source.
+    def find_dst_routes(self, src_label):
+        if self.__by_src is None:
+            self.__by_src = {}
+            for route in self.__routes:
+                self.__by_src.setdefault(self.__get_src(route),
+                                         []).append(route)
+        blk, chs = self.get_src_port(src_label)
+        routes = []
+        for ch in chs:
+            routes.extend(self.__by_src.get((blk, ch), ()))
+        return routes
+
+    def get_source(self, dst_label):
+        for route in self.find_routes(dst_label):
+            src = self.lookup_src(route['src-blk'], route['src-ch'])
+            if src is not None:
+                return src[0]
+        return 'None'
+
+    # Apply the list of (destination label, source label) at once. The source
+    # 'None' removes the routes to the destination. The routes of stereo pair
+    # are left to left and right to right. Return whether any route changes.
+    def set_sources(self, changes):
+        removed = set()
+        changed = False
+        for dst_label, src_label in changes:
+            routes = self.find_routes(dst_label)
+            if src_label == 'None':
+                for route in routes:
+                    removed.add(id(route))
+                    self.__by_dst[self.__get_dst(route)].remove(route)
+                changed |= len(routes) > 0
+                continue
+
+            src_blk, src_chs = self.get_src_port(src_label)
+            if len(routes) > 0:
+                for i, route in enumerate(routes):
+                    src = (src_blk, src_chs[i])
+                    if self.__get_src(route) != src:
+                        route['src-blk'], route['src-ch'] = src
+                        changed = True
+            else:
+                dst_blk, dst_chs = self.get_dst_port(dst_label)
+                for i in range(2):
+                    route = {
+                        'src-blk':  src_blk,
+                        'src-ch':   src_chs[i],
+                        'dst-blk':  dst_blk,
+                        'dst-ch':   dst_chs[i],
+                        'peak':     0,
+                    }
+                    self.__routes.append(route)
+                    self.__by_dst.setdefault(self.__get_dst(route),
+                                             []).append(route)
+                changed = True
+
+        if len(removed) > 0:
+            self.__routes = [route for route in self.__routes
+                             if id(route) not in removed]
+        if changed:
+            self.__by_src = None
+            self.__staged = True
+        return changed
+
+    def set_source(self, dst_label, src_label):
+        return self.set_sources(((dst_label, src_label), ))
+
+    # Return the positions of entries which differ from the given entries, as
+    # read from the unit. The peak is not compared.
+    def diff(self, entries):
+        positions = []
+        for i in range(max(len(self.__routes), len(entries))):
+            if i >= len(self.__routes) or i >= len(entries) or \
+                    self.get_key(self.__routes[i]) != self.get_key(entries[i]):
+                positions.append(i)
+        return positions
+
+    # Whether any change is applied since the last commit.
+    def has_staged(self):
+        return self.__staged
+
+    # Return the entries in the section of unit, or None if unknown.
+    def get_committed(self):
+        if self.__committed is None:
+            return None
+        return [dict(route) for route in self.__committed]
+
+    def forget_committed(self):
+        self.__committed = None
+
+    # Record the entries written to the section of unit.
+    def set_committed(self, entries):
+        self.__committed = [dict(entry) for entry in entries]
+
+    # Return the copy of routes to be written to the unit, and clear the flag
+    # of staged changes.
+    def take_routes(self):
+        self.__staged = False
+        return [dict(route) for route in self.__routes]
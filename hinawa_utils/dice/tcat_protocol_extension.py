@@ -1,9 +1,12 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
+from array import array
 from struct import unpack, pack
-from time import sleep
-from math import log10, pow
+from sys import byteorder
+from time import monotonic, sleep
+
+from hinawa_utils.misc.gain import LogCoeffGain
 
 __all__ = ['ExtCtlSpace', 'ExtCapsSpace', 'ExtCmdSpace', 'ExtMixerSpace',
            'ExtNewRouterSpace', 'ExtPeakSpace', 'ExtNewStreamConfigSpace',
@@ -159,8 +162,13 @@ class ExtCmdSpace():
         'high':     0x04,
     }
 
+    # The register is polled in the interval, doubled till the maximum.
+    _POLL_INTERVAL = 0.01
+    _POLL_INTERVAL_MAX = 0.2
+    TIMEOUT = 2.0
+
     @classmethod
-    def initiate(cls, protocol, req, cmd, mode):
+    def _start(cls, protocol, req, cmd, mode):
         if cmd not in cls._OP_CODES:
             raise ValueError('Invalid argument for command')
         if mode not in cls._RATE_MODES:
@@ -183,23 +191,39 @@ class ExtCmdSpace():
         ExtCtlSpace.write_section(
             protocol, req, 'cmd', cls._OFFSET_OPCODE, data)
 
-        # Completion is notified as clearing of bit flags in the register.
-        count = 10
-        while count > 0:
+    # Completion is notified as clearing of bit flags in the register. The
+    # event is set by the handler of notification to read the register at
+    # once, else the register is read with exponential backoff.
+    @classmethod
+    def _wait(cls, protocol, req, event, timeout):
+        deadline = monotonic() + timeout
+        interval = cls._POLL_INTERVAL
+        while True:
+            if event is not None:
+                event.clear()
             data = ExtCtlSpace.read_section(protocol, req, 'cmd',
                                             cls._OFFSET_OPCODE, 4)
             if not (data[0] & cls._EXECUTE_FLAG):
                 break
-            count -= 1
-            sleep(0.2)
-        else:
-            raise IOError('Timeout of command initiation.')
+            remain = deadline - monotonic()
+            if remain <= 0:
+                raise IOError('Timeout of command initiation.')
+            if event is not None:
+                event.wait(min(interval, remain))
+            else:
+                sleep(min(interval, remain))
+            interval = min(interval * 2, cls._POLL_INTERVAL_MAX)
 
         data = ExtCtlSpace.read_section(protocol, req, 'cmd',
                                         cls._OFFSET_RETURN, 4)
         if data[3] != cls._RETURN_SUCCESS:
             raise IOError('Fail to execute requested operation.')
 
+    @classmethod
+    def initiate(cls, protocol, req, cmd, mode, event=None, timeout=TIMEOUT):
+        cls._start(protocol, req, cmd, mode)
+        cls._wait(protocol, req, event, timeout)
+
 # '3.4 Mixer space'
 
 
@@ -217,19 +241,17 @@ class ExtMixerSpace():
     MAX_COEFF = 0x3fff
 
     # '5.11 Audio Mixer' in 'TCD22xx Users Guide'.
+    GAIN = LogCoeffGain(MAX_COEFF)
+
     @classmethod
     def parse_val_to_db(cls, val):
-        if val == 0:
-            return float('-inf')
-        return 20 * log10(val / cls.MAX_COEFF)
+        return cls.GAIN.parse_val_to_db(val)
 
     @classmethod
     def build_val_from_db(cls, db):
         if db > 4:
             raise ValueError('Invalid argument for dB value.')
-        if db == float('-inf'):
-            return 0
-        return int(cls.MAX_COEFF * pow(10, db / 20))
+        return cls.GAIN.build_val_from_db(db)
 
     @classmethod
     def _calcurate_offset(cls, protocol, out_ch, in_ch):
@@ -283,6 +305,77 @@ class ExtMixerSpace():
 
         return unpack('>H', data[2:4])[0]
 
+    # The unchanged coefficients between changed ones are written again when
+    # the gap is within the count, to save transactions.
+    _COALESCE_GAP = 4
+
+    @classmethod
+    def _get_matrix_size(cls, protocol):
+        if not protocol._ext_caps['mixer']['is-exposed']:
+            raise IOError('This feature is not available.')
+        outputs = protocol._ext_caps['mixer']['output-channels']
+        inputs = protocol._ext_caps['mixer']['input-channels']
+        if 4 + outputs * inputs * 4 > protocol._ext_layout['mixer']['length']:
+            raise OSError('Inconsistency between channels and length of space')
+        return outputs, inputs
+
+    # Return the list of coefficients to input channels for each output
+    # channel, by one read of the space.
+    @classmethod
+    def read_matrix(cls, protocol, req):
+        outputs, inputs = cls._get_matrix_size(protocol)
+        data = ExtCtlSpace.read_section(protocol, req, 'mixer', 4,
+                                        outputs * inputs * 4)
+        matrix = []
+        for out_ch in range(outputs):
+            row = []
+            for in_ch in range(inputs):
+                pos = (out_ch * inputs + in_ch) * 4
+                row.append(unpack('>H', data[pos + 2:pos + 4])[0])
+            matrix.append(row)
+        return matrix
+
+    # Write the coefficients which differ from the previous matrix, by block
+    # writes for the runs of them. All of coefficients are written when the
+    # previous matrix is not given. Return the number of writes.
+    @classmethod
+    def write_matrix(cls, protocol, req, matrix, prev=None):
+        outputs, inputs = cls._get_matrix_size(protocol)
+        if len(matrix) != outputs:
+            raise ValueError('Invalid argument for rows of matrix.')
+        vals = []
+        for row in matrix:
+            if len(row) != inputs:
+                raise ValueError('Invalid argument for columns of matrix.')
+            for val in row:
+                if val < 0 or val > cls.MAX_COEFF:
+                    raise ValueError('Invalid argument for coefficient.')
+                vals.append(int(val))
+
+        if prev is None:
+            changed = list(range(len(vals)))
+        else:
+            prev_vals = [val for row in prev for val in row]
+            if len(prev_vals) != len(vals):
+                raise ValueError('Invalid argument for previous matrix.')
+            changed = [i for i, val in enumerate(vals) if val != prev_vals[i]]
+
+        runs = []
+        for i in changed:
+            if len(runs) > 0 and i - runs[-1][1] <= cls._COALESCE_GAP:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+
+        for begin, end in runs:
+            data = bytearray()
+            for val in vals[begin:end]:
+                data.extend(pack('>I', val))
+            ExtCtlSpace.write_section(protocol, req, 'mixer', 4 + begin * 4,
+                                      data)
+
+        return len(runs)
+
 # '3.6 New router space'
 
 
@@ -334,10 +427,9 @@ class ExtNewRouterSpace():
                                         count * 4)
         if count > 0:
             for i in range(0, 4 * count, 4):
-                entry = cls.parse_entry_data(data[2:4])
-                entry['peak'] = unpack('>H', data[0:2])[0]
+                entry = cls.parse_entry_data(data[i + 2:i + 4])
+                entry['peak'] = unpack('>H', data[i:i + 2])[0]
                 entries.append(entry)
-                data = data[4:]
 
         return entries
 
@@ -373,7 +465,7 @@ class ExtNewRouterSpace():
         return data
 
     @classmethod
-    def set_entries(cls, protocol, req, entries):
+    def _check_entries(cls, protocol, entries):
         if (not protocol._ext_caps['router']['is-exposed'] or
                 protocol._ext_caps['router']['is-readonly']):
             raise IOError('This feature is not available.')
@@ -381,9 +473,43 @@ class ExtNewRouterSpace():
         if (len(entries) >= protocol._ext_caps['router']['maximum-routes'] or
                 len(entries) >= length // 4):
             raise ValueError('Too much entries.')
+        return length
+
+    @classmethod
+    def set_entries(cls, protocol, req, entries):
+        length = cls._check_entries(protocol, entries)
         data = cls._build_data(length, entries)
         ExtCtlSpace.write_section(protocol, req, 'new-router', 0, data)
 
+    # Write the count and the range of entries which differ from the entries
+    # in the section. The peak is not compared. Return whether any data is
+    # written.
+    @classmethod
+    def update_entries(cls, protocol, req, entries, prev_entries):
+        cls._check_entries(protocol, entries)
+        curr = cls._build_data(0, entries)
+        prev = cls._build_data(0, [dict(entry, peak=0)
+                                   for entry in prev_entries])
+
+        written = False
+        if curr[0:4] != prev[0:4]:
+            ExtCtlSpace.write_section(protocol, req, 'new-router', 0,
+                                      curr[0:4])
+            written = True
+
+        begin = None
+        for offset in range(4, len(curr), 4):
+            if curr[offset:offset + 4] != prev[offset:offset + 4]:
+                if begin is None:
+                    begin = offset
+                end = offset + 4
+        if begin is not None:
+            ExtCtlSpace.write_section(protocol, req, 'new-router', begin,
+                                      curr[begin:end])
+            written = True
+
+        return written
+
     @classmethod
     def get_entries(cls, protocol, req):
         if not protocol._ext_caps['router']['is-exposed']:
@@ -395,19 +521,33 @@ class ExtNewRouterSpace():
 
 
 class ExtPeakSpace():
+    # Each entry consists of 16 bit peak and 16 bit route in big endian. The
+    # upper byte of route is source, the lower byte is destination, in the
+    # same format as router entry.
     @classmethod
-    def get(cls, protocol, req):
+    def parse_data(cls, data):
+        vals = array('H', bytes(data))
+        if byteorder == 'little':
+            vals.byteswap()
+        return vals[0::2], vals[1::2]
+
+    @classmethod
+    def read_data(cls, protocol, req):
         if not protocol._ext_caps['general']['peak-available']:
             raise IOError('This feature is not available.')
 
-        entries = []
         length = protocol._ext_layout['peak']['length']
-        data = ExtCtlSpace.read_section(protocol, req, 'peak', 0, length)
-        for i in range(0, len(data), 4):
-            entry = ExtNewRouterSpace.parse_entry_data(data[2:4])
-            entry['peak'] = unpack('>H', data[0:2])[0]
+        return ExtCtlSpace.read_section(protocol, req, 'peak', 0, length)
+
+    @classmethod
+    def get(cls, protocol, req):
+        entries = []
+        peaks, routes = cls.parse_data(cls.read_data(protocol, req))
+        for peak, route in zip(peaks, routes):
+            entry = ExtNewRouterSpace.parse_entry_data((route >> 8,
+                                                        route & 0xff))
+            entry['peak'] = peak
             entries.append(entry)
-            data = data[4:]
         return entries
 
 # '3.7 New stream config space'
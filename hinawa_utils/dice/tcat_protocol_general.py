@@ -3,9 +3,7 @@
 
 from struct import unpack
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 __all__ = ['TcatProtocolGeneral']
 
@@ -42,6 +40,17 @@ class TcatProtocolGeneral():
         0x0b:   'arx4',
         0x0c:   'internal',
     }
+    # The bits in GLOBAL_NOTIFICATION. The upper 16 bits are defined by
+    # vendors.
+    NOTIFICATION_BITS = {
+        0x00000001: 'rx-config',
+        0x00000002: 'tx-config',
+        0x00000004: 'duplicated-iso-channel',
+        0x00000008: 'bandwidth-error',
+        0x00000010: 'lock',
+        0x00000020: 'clock-accepted',
+        0x00000040: 'interface',
+    }
 
     def __init__(self, unit, req):
         self._unit = unit
@@ -76,7 +85,7 @@ class TcatProtocolGeneral():
         addr = self._BASE_ADDR + offset
 
         while len(data) < length:
-            count = length
+            count = length - len(data)
             if count > self._MAXIMUM_TRX_LENGTH:
                 count = self._MAXIMUM_TRX_LENGTH
             if count == 4:
@@ -86,8 +95,10 @@ class TcatProtocolGeneral():
             frames = bytearray(count)
             _, frames = req.transaction(self._unit.get_node(), tcode, addr, count,
                                         frames, 100)
+            if len(frames) != count:
+                raise OSError('Unexpected length of response: {0}'.format(
+                    len(frames)))
             data.extend(frames)
-            length -= count
             addr += count
 
         return data
@@ -141,6 +152,16 @@ class TcatProtocolGeneral():
         data = self._read_section_offset(req, 'global', 0x08, 4)
         return unpack('>I', data)[0]
 
+    @classmethod
+    def parse_notification(cls, message):
+        kinds = []
+        for bit, kind in cls.NOTIFICATION_BITS.items():
+            if message & bit:
+                kinds.append((kind, True))
+        if message & 0xffff0000:
+            kinds.append(('vendor', message & 0xffff0000))
+        return kinds
+
     # GLOBAL_NICKNAME: global:0x0c
     def write_nickname(self, req, name):
         letters = bytearray(name.encode('utf-8'))
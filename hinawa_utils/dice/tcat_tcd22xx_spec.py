@@ -2,6 +2,7 @@
 # Copyright (C) 2018 Takashi Sakamoto
 
 from hinawa_utils.dice.tcat_protocol_extension import ExtMixerSpace, ExtCurrentConfigSpace
+from hinawa_utils.dice.router_state import DiceRouterState
 
 
 class TcatTcd22xxSpec():
@@ -253,6 +254,7 @@ class TcatTcd22xxSpec():
 
     def _refine_entries(self, entries, srcs, dsts):
         routes = []
+        keys = set()
 
         for entry in entries:
             # Skip mixer-to-mixer entries.
@@ -288,7 +290,9 @@ class TcatTcd22xxSpec():
                     'dst-ch':   dst[2][i],
                     'peak':     0,
                 }
-                if route not in routes:
+                key = DiceRouterState.get_key(route)
+                if key not in keys:
+                    keys.add(key)
                     routes.append(route)
 
         return routes
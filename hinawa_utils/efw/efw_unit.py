@@ -1,13 +1,10 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
 
 from hinawa_utils.efw.transactions import EftInfo
 from hinawa_utils.efw.transactions import EftHwctl
@@ -16,14 +13,23 @@ from hinawa_utils.efw.transactions import EftPhysInput
 from hinawa_utils.efw.transactions import EftPlayback
 from hinawa_utils.efw.transactions import EftMonitor
 from hinawa_utils.efw.transactions import EftIoconf
-from math import log10
+from hinawa_utils.misc.gain import LogCoeffGain
 
 __all__ = ['EfwUnit']
 
 
 class EfwUnit(Hitaki.SndEfw):
+    # The volume is linear coefficient against 0x01000000.
+    _VOL_GAIN = LogCoeffGain(0x01000000, floor=-144.0)
+
     def __init__(self, path):
         super().__init__()
+        # The parameters read in advance, keyed by category, command and
+        # arguments of transaction.
+        self.__prefetched = {}
+        self.__prefetched_lock = Lock()
+        self.prefetch_errors = 0
+        self.last_prefetch_error = None
         self.open(path, 0)
 
         ctx = GLib.MainContext.new()
@@ -61,6 +67,66 @@ class EfwUnit(Hitaki.SndEfw):
     def get_node(self):
         return self.__node
 
+    # The transaction is served by the parameters read in advance, just once.
+    def transaction(self, category, command, args, params, timeout_ms):
+        key = (category, command, tuple(args or ()))
+        with self.__prefetched_lock:
+            prefetched = self.__prefetched.pop(key, None)
+        if prefetched is not None:
+            return True, list(prefetched)
+        return super().transaction(category, command, args, params,
+                                   timeout_ms)
+
+    # Fireworks protocol has no command to read several parameters at once.
+    # Instead, the transactions for the list of (category, command, arguments)
+    # are kept in flight together, up to the number of workers (4 by default)
+    # at once, then the parameters are kept for the following transactions
+    # with the same command and arguments. Give 1 to the workers to execute
+    # them one by one.
+    #
+    # Hitaki.SndEfw allows the transactions in several threads. It assigns
+    # sequence number to each command under its lock, and the response is
+    # matched to the waiting transaction by the number, as ALSA fireworks
+    # driver does for hwdep. The unit processes the commands one by one.
+    #
+    # The failed transaction is executed again without the parameters read in
+    # advance, therefore it is just counted. Return the number of failures.
+    def prefetch(self, commands, workers=4):
+        def execute(command):
+            category, cmd, args = command
+            params = [0] * 256
+            try:
+                _, params = super(EfwUnit, self).transaction(category, cmd,
+                                                             args, params, 100)
+            except Exception as e:
+                with self.__prefetched_lock:
+                    self.prefetch_errors += 1
+                    self.last_prefetch_error = e
+                return False
+            with self.__prefetched_lock:
+                self.__prefetched[(category, cmd, tuple(args or ()))] = params
+            return True
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(execute, commands)).count(False)
+
+    def clear_prefetched(self):
+        with self.__prefetched_lock:
+            self.__prefetched.clear()
+
+    def prefetch_phys_out_params(self, operation, channels):
+        return self.prefetch([EftPhysOutput.build_get_command(operation, ch)
+                              for ch in channels])
+
+    def prefetch_playback_params(self, operation, channels):
+        return self.prefetch([EftPlayback.build_get_command(operation, ch)
+                              for ch in channels])
+
+    def prefetch_monitor_params(self, operation, pairs):
+        cmds = [EftMonitor.build_get_command(operation, in_ch, out_ch)
+                for in_ch, out_ch in pairs]
+        return self.prefetch(cmds)
+
     def _fixup_info(self):
         # Mapping for channels on tx stream is supported by Onyx1200F only.
         if self.info['model'] == 'Onyx1200F':
@@ -77,23 +143,26 @@ class EfwUnit(Hitaki.SndEfw):
             self.info['features']['nominal-input'] = True
             self.info['features']['nominal-output'] = True
 
-    @staticmethod
-    def _calcurate_vol_from_db(db):
-        if db <= -144.0:
-            return 0x00000000
-        else:
-            return int(0x01000000 * pow(10, db / 20))
+    @classmethod
+    def _calcurate_vol_from_db(cls, db):
+        return cls._VOL_GAIN.build_val_from_db(db)
 
-    @staticmethod
-    def _calcurate_vol_to_db(vol):
-        if vol == 0:
-            return -144.0
-        else:
-            return 20 * log10(vol / 0x01000000)
+    @classmethod
+    def _calcurate_vol_to_db(cls, vol):
+        return cls._VOL_GAIN.parse_val_to_db(vol)
 
     def get_metering(self):
         return EftInfo.get_metering(self)
 
+    def read_metering(self, levels):
+        return EftInfo.read_metering(self, levels)
+
+    def parse_metering_flags(self, flags, category):
+        return EftInfo.parse_metering_flags(flags, category)
+
+    def parse_metering_levels(self, levels):
+        return EftInfo.parse_metering_levels(levels)
+
     def set_clock_state(self, rate, src):
         EftHwctl.set_clock(self, rate, src, 0)
 
@@ -1,12 +1,10 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-import gi
-gi.require_version('Hitaki', '0.0')
-from gi.repository import Hitaki
-
 from array import array
-from math import log10
+
+from hinawa_utils.misc.gi_repository import Hitaki
+from hinawa_utils.misc.gain import LogCoeffGain
 
 __all__ = ['EftInfo', 'EftFlash', 'EftTransmit', 'EftHwctl', 'EftPhysOutput',
            'EftPhysInput', 'EftPlayback', 'EftCapture', 'EftMonitor',
@@ -144,6 +142,16 @@ class EftInfo():
         'hex-signal':       0x80000000,
     }
 
+    # The level of meter is linear coefficient against 0x80000000.
+    _METER_GAIN = LogCoeffGain(0x80000000, floor=-144.0, ndigits=1)
+
+    # Masks of flags in metering, precomputed for each category.
+    METERING_FLAGS = {
+        'clocks':   tuple(__CLOCK_FLAGS.items()),
+        'midi':     tuple(__MIDI_FLAGS.items()),
+        'robot':    tuple(__ROBOT_FLAGS.items()),
+    }
+
     @staticmethod
     def _execute_command(unit, cmd, args):
         if not isinstance(unit, Hitaki.SndEfw):
@@ -171,46 +179,44 @@ class EftInfo():
         info['firmware-versions'] = cls._parse_firmware_versions(params)
         return info
 
+    # The levels of outputs and inputs are written to the given buffer of
+    # 32 bit unsigned integer, such as array('I'), in the order. Return a
+    # tuple of flags, S/PDIF and ADAT status, and the number of outputs and
+    # inputs.
     @classmethod
-    def get_metering(cls, unit):
+    def read_metering(cls, unit, levels):
         params = cls._execute_command(unit, 1, None)
+        outputs = params[5]
+        inputs = params[6]
+        count = outputs + inputs
+        if len(levels) < count:
+            raise ValueError('Invalid length of buffer for levels')
+        memoryview(levels)[:count] = array('I', params[9:9 + count])
+        return (params[0], params[1], params[2], outputs, inputs)
+
+    @classmethod
+    def parse_metering_flags(cls, flags, category):
+        if category not in cls.METERING_FLAGS:
+            raise ValueError('Invalid argument for category of flags')
+        return {name: bool(flags & mask)
+                for name, mask in cls.METERING_FLAGS[category]}
+
+    @classmethod
+    def parse_metering_levels(cls, levels):
+        return cls._METER_GAIN.parse_vals_to_db(levels)
+
+    @classmethod
+    def get_metering(cls, unit):
+        levels = array('I', bytes(4 * 256))
+        flags, spdif, adat, outputs, inputs = cls.read_metering(unit, levels)
         metering = {}
-        metering['clocks'] = {}
-        for name, flag in cls.__CLOCK_FLAGS.items():
-            if params[0] & flag:
-                metering['clocks'][name] = True
-            else:
-                metering['clocks'][name] = False
-        metering['midi'] = {}
-        for name, flag in cls.__MIDI_FLAGS.items():
-            if params[0] & flag:
-                metering['midi'][name] = True
-            else:
-                metering['midi'][name] = False
-        metering['robot'] = {}
-        for name, flag in cls.__ROBOT_FLAGS.items():
-            if params[0] & flag:
-                metering['robot'][name] = True
-            else:
-                metering['robot'][name] = False
-        metering['spdif'] = params[1]
-        metering['adat'] = params[2]
-        metering['outputs'] = []
-        for i in range(params[5]):
-            index = 9 + i
-            if params[index] == 0:
-                db = -144.0
-            else:
-                db = round(20 * log10(params[index] / 0x80000000), 1)
-            metering['outputs'].append(db)
-        metering['inputs'] = []
-        for i in range(params[6]):
-            index = 9 + params[5] + i
-            if params[index] == 0:
-                db = -144.0
-            else:
-                db = round(20 * log10(params[index] / 0x80000000), 1)
-            metering['inputs'].append(db)
+        for category in cls.METERING_FLAGS:
+            metering[category] = cls.parse_metering_flags(flags, category)
+        metering['spdif'] = spdif
+        metering['adat'] = adat
+        levels = cls.parse_metering_levels(levels[:outputs + inputs])
+        metering['outputs'] = list(levels[:outputs])
+        metering['inputs'] = list(levels[outputs:])
         return metering
 
     @classmethod
@@ -579,19 +585,29 @@ class EftPhysOutput():
         args.append(value)
         cls._execute_command(unit, cmd, args)
 
+    # Return the command and the arguments to get the parameter, for the
+    # transaction in advance.
     @classmethod
-    def get_param(cls, unit, operation, channel):
+    def build_get_command(cls, operation, channel):
         if operation == 'gain':
             cmd = 1
         elif operation == 'mute':
             cmd = 3
-        elif operation == 'nominal':
-            print('Unfortunately, this doesn\'t work well...')
-            cmd = 9
         else:
             raise ValueError('Invalid argument for operation.')
         args = array('I')
         args.append(channel)
+        return 4, cmd, args
+
+    @classmethod
+    def get_param(cls, unit, operation, channel):
+        if operation == 'nominal':
+            print('Unfortunately, this doesn\'t work well...')
+            args = array('I')
+            args.append(channel)
+            cmd = 9
+        else:
+            _, cmd, args = cls.build_get_command(operation, channel)
         params = cls._execute_command(unit, cmd, args)
         if operation == 'nominal':
             if params[1] == 2:
@@ -675,8 +691,10 @@ class EftPlayback():
         args.append(value)
         cls._execute_command(unit, cmd, args)
 
+    # Return the command and the arguments to get the parameter, for the
+    # transaction in advance.
     @classmethod
-    def get_param(cls, unit, operation, channel):
+    def build_get_command(cls, operation, channel):
         if operation == 'gain':
             cmd = 1
         elif operation == 'mute':
@@ -687,6 +705,11 @@ class EftPlayback():
             raise ValueError('Invalid argument for operation.')
         args = array('I')
         args.append(channel)
+        return 6, cmd, args
+
+    @classmethod
+    def get_param(cls, unit, operation, channel):
+        _, cmd, args = cls.build_get_command(operation, channel)
         params = cls._execute_command(unit, cmd, args)
         return params[1]
 
@@ -742,8 +765,10 @@ class EftMonitor():
         args.append(value)
         cls._execute_command(unit, cmd, args)
 
+    # Return the command and the arguments to get the parameter, for the
+    # transaction in advance.
     @classmethod
-    def get_param(cls, unit, operation, in_ch, out_ch):
+    def build_get_command(cls, operation, in_ch, out_ch):
         if operation == 'gain':
             cmd = 1
         elif operation == 'mute':
@@ -757,6 +782,11 @@ class EftMonitor():
         args = array('I')
         args.append(in_ch)
         args.append(out_ch)
+        return 8, cmd, args
+
+    @classmethod
+    def get_param(cls, unit, operation, in_ch, out_ch):
+        _, cmd, args = cls.build_get_command(operation, in_ch, out_ch)
         params = cls._execute_command(unit, cmd, args)
         return params[2]
 
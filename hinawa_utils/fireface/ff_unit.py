@@ -2,15 +2,12 @@
 # Copyright (C) 2018 Takashi Sakamoto
 
 from threading import Thread
-from math import log10
 from struct import pack, unpack
 from pathlib import Path
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
+
+from hinawa_utils.misc.gain import LogCoeffGain
 
 from hinawa_utils.fireface.ff_config_rom_parser import FFConfigRomParser
 from hinawa_utils.fireface.ff_option_reg import FFOptionReg
@@ -52,6 +49,7 @@ class FFUnit(Hitaki.SndUnit):
     __ZERO_VAL = 0x00008000
     __MIN_VAL = 0x00000001
     __MAX_VAL = 0x00010000
+    __GAIN = LogCoeffGain(__ZERO_VAL)
 
     def __init__(self, path):
         super().__init__()
@@ -343,15 +341,13 @@ class FFUnit(Hitaki.SndUnit):
     #
     # Helper methods.
     #
-    @staticmethod
-    def __build_val_from_db(db: float):
-        return int(0x8000 * pow(10, db / 20))
-
-    @staticmethod
-    def __parse_val_to_db(val: int):
-        if val == 0:
-            return float('-inf')
-        return 20 * log10(val / 0x8000)
+    @classmethod
+    def __build_val_from_db(cls, db: float):
+        return cls.__GAIN.build_val_from_db(db)
+
+    @classmethod
+    def __parse_val_to_db(cls, val: int):
+        return cls.__GAIN.parse_val_to_db(val)
 
     @classmethod
     def get_db_mute(cls):
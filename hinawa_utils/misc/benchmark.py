@@ -0,0 +1,260 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+import os
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dump, load
+from pathlib import Path
+from runpy import run_path
+from signal import SIGINT, getsignal, signal
+from subprocess import DEVNULL, PIPE, run
+from time import perf_counter
+
+from hinawa_utils.misc.control_client import ControlClient
+from hinawa_utils.misc.transport import TransportBackend
+from hinawa_utils.misc.transport_trace import ReplayTransport
+from hinawa_utils.misc.sim_profiles import SimulatedProfiles
+
+__all__ = ['BenchmarkRunner']
+
+
+# Run the files of command list through the command table of CLI tool in the
+# process, against the simulated node or the replayed trace, and measure wall
+# time, transactions, bytes and latency of each command. The startup of each
+# CLI tool is measured in a new process as well. The result is saved as JSON
+# to be compared with the one of previous run.
+class BenchmarkRunner():
+    VERSION = 1
+
+    # The CLI tool for each file of command list in test directory.
+    WORKLOADS = {
+        'alesis-io14':                  'hinawa-alesis-io-cli',
+        'apogee-duet-firewire':         'hinawa-apogee-duet-cli',
+        'apogee-ensemble':              'hinawa-apogee-ensemble-cli',
+        'digidesign-digi002-rack':      'hinawa-dg00x-common-cli',
+        'digidesign-digi003-rack':      'hinawa-dg003-cli',
+        'echo-audiofire2':              'hinawa-fireworks-cli',
+        'echo-audiofire4':              'hinawa-fireworks-cli',
+        'echo-audiofirepre8':           'hinawa-fireworks-cli',
+        'focusrite-saffirepro-26':      'hinawa-dice-extension-cli',
+        'griffin-firewave':             'hinawa-griffin-firewave-cli',
+        'mackie-onyx400f':              'hinawa-fireworks-cli',
+        'maudio-audiophile':            'hinawa-maudio-bebob-cli',
+        'maudio-fw1814':                'hinawa-maudio-bebob-cli',
+        'maudio-fw410':                 'hinawa-maudio-bebob-cli',
+        'maudio-profire-610':           'hinawa-dice-extension-cli',
+        'maudio-solo':                  'hinawa-maudio-bebob-cli',
+        'presonus-firestudio-mobile':   'hinawa-dice-extension-cli',
+        'rme-fireface800':              'hinawa-fireface-cli',
+        'tascam-fireone':               'hinawa-tascam-fireone-cli',
+        'tascam-fw1082':                'hinawa-tascam-fw-console-cli',
+        'tascam-fw1804':                'hinawa-tascam-fw-rack-cli',
+        'tascam-fw1884':                'hinawa-tascam-fw-console-cli',
+        'yamaha-go44_terratec-phase24': 'hinawa-yamaha-terratec-cli',
+        'yamaha-go46_terratec-phasex24': 'hinawa-yamaha-terratec-cli',
+    }
+
+    PERCENTILES = (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))
+
+    def __init__(self, cli_dir, test_dir, trace_dir=None, timed=False,
+                 repeat=1, latency=0.0, jitter=0.0):
+        if repeat < 1:
+            raise ValueError('Invalid argument for count of repeat')
+        self.cli_dir = Path(cli_dir)
+        self.test_dir = Path(test_dir)
+        self.trace_dir = None if trace_dir is None else Path(trace_dir)
+        self.timed = timed
+        self.repeat = repeat
+        self.latency = latency
+        self.jitter = jitter
+        self.__backend = TransportBackend()
+
+    # Return the description of backend and the transport, or the reason to
+    # skip the workload, and None.
+    def create_transport(self, name):
+        if self.trace_dir is not None:
+            path = self.trace_dir.joinpath('{0}.trace'.format(name))
+            if path.is_file():
+                return 'replay', ReplayTransport(str(path), self.timed)
+        if name in SimulatedProfiles.get_names():
+            return 'simulated', SimulatedProfiles.create(name, self.latency,
+                                                         self.jitter)
+        return 'no trace nor simulated profile', None
+
+    @classmethod
+    def get_percentile(cls, samples, ratio):
+        pos = int(round(ratio * (len(samples) - 1)))
+        return samples[min(pos, len(samples) - 1)]
+
+    def __execute(self, cli, script, transport):
+        self.__backend.add(0, transport)
+        self.__backend.install()
+        # The command lists are executed in this process.
+        os.environ[ControlClient.DIRECT_ENV] = '1'
+        # The namespace of gi is resolved at first import after installation.
+        from hinawa_utils.misc.cli_kit import CliKit
+
+        latencies = {}
+        failures = []
+
+        def observe(cmd, args, result, elapsed):
+            latencies.setdefault(cmd, []).append(elapsed)
+            if not result:
+                failures.append(cmd)
+
+        argv = list(sys.argv)
+        handler = getsignal(SIGINT)
+        CliKit.add_observer(observe)
+        error = None
+        begin = perf_counter()
+        try:
+            for i in range(self.repeat):
+                if isinstance(transport, ReplayTransport):
+                    transport.rewind()
+                sys.argv[:] = [cli, '0', script]
+                output = StringIO()
+                with redirect_stdout(output):
+                    run_path(cli, run_name='__main__')
+                # CliKit reports the line which aborts the command list.
+                for line in output.getvalue().splitlines():
+                    if line.startswith('Invalid command in ') or \
+                            line.startswith('Invalid arguments in '):
+                        raise ValueError(line)
+        except (Exception, SystemExit) as e:
+            error = '{0}: {1}'.format(type(e).__name__, e)
+        finally:
+            wall = perf_counter() - begin
+            CliKit.remove_observer(observe)
+            signal(SIGINT, handler)
+            sys.argv[:] = argv
+            self.__backend.remove(transport)
+
+        return wall, latencies, len(failures), error
+
+    def run(self, name):
+        if name not in self.WORKLOADS:
+            raise ValueError('Invalid argument for name of workload')
+        cli = str(self.cli_dir.joinpath(self.WORKLOADS[name]))
+        script = str(self.test_dir.joinpath('{0}.cmds'.format(name)))
+        backend, transport = self.create_transport(name)
+        result = {
+            'cli':      self.WORKLOADS[name],
+            'backend':  backend,
+        }
+        if transport is None:
+            result['error'] = 'skipped'
+            return result
+
+        wall, latencies, failures, error = self.__execute(cli, script,
+                                                          transport)
+        commands = {}
+        for cmd, samples in sorted(latencies.items()):
+            samples.sort()
+            stats = {'count': len(samples), 'max': samples[-1]}
+            for label, ratio in self.PERCENTILES:
+                stats[label] = self.get_percentile(samples, ratio)
+            commands[cmd] = stats
+
+        result.update({
+            'repeat':       self.repeat,
+            'wall':         wall,
+            'transactions': transport.transactions,
+            'bytes':        transport.bytes,
+            'transport-time': transport.elapsed,
+            'failures':     failures,
+            'error':        error,
+            'commands':     commands,
+        })
+        return result
+
+    def run_all(self, names=None):
+        if names is None or len(names) == 0:
+            names = self.WORKLOADS.keys()
+        return {name: self.run(name) for name in names}
+
+    def get_cli_names(self):
+        return sorted(path.name for path in self.cli_dir.glob('hinawa-*-cli'))
+
+    # Return the wall time and the time of imports to start the CLI tool
+    # without arguments, and whether GObject introspection is loaded. The
+    # median of repeats is used.
+    def measure_startup(self, cli):
+        env = dict(os.environ)
+        env[ControlClient.DIRECT_ENV] = '1'
+        cmdline = [sys.executable, '-X', 'importtime',
+                   str(self.cli_dir.joinpath(cli))]
+        samples = []
+        for i in range(self.repeat):
+            begin = perf_counter()
+            proc = run(cmdline, stdout=DEVNULL, stderr=PIPE, env=env)
+            wall = perf_counter() - begin
+
+            # import time: self [us] | cumulative | imported package
+            imports = 0
+            gi = False
+            for line in proc.stderr.decode('utf-8', 'replace').splitlines():
+                fields = line[len('import time:'):].split('|')
+                if not line.startswith('import time:') or len(fields) != 3 or \
+                        not fields[1].strip().isdigit():
+                    continue
+                name = fields[2]
+                if name.strip() == 'gi':
+                    gi = True
+                # The nested imports are indented.
+                if not name.startswith('  '):
+                    imports += int(fields[1]) / 1e6
+            samples.append((wall, imports, gi))
+
+        samples.sort()
+        wall, imports, gi = samples[len(samples) // 2]
+        return {
+            'samples':  len(samples),
+            'wall':     wall,
+            'imports':  imports,
+            'gi':       gi,
+        }
+
+    def measure_startup_all(self, names=None):
+        if names is None or len(names) == 0:
+            names = self.get_cli_names()
+        return {name: self.measure_startup(name) for name in names}
+
+    @classmethod
+    def save(cls, path, results):
+        with open(path, 'w') as f:
+            dump({'version': cls.VERSION, 'workloads': results}, f, indent=2,
+                 sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            baseline = load(f)
+        if baseline.get('version') != cls.VERSION:
+            raise ValueError('Invalid version of baseline')
+        return baseline['workloads']
+
+    # Return the list of (name, metric, baseline, current) for regression. The
+    # values are per repeat. The times are compared with the tolerance in
+    # ratio, while the counts are compared exactly.
+    @classmethod
+    def compare(cls, baseline, results, tolerance=0.1):
+        regressions = []
+        for name, result in sorted(results.items()):
+            prev = baseline.get(name)
+            if prev is None or 'wall' not in prev or 'wall' not in result:
+                continue
+            for metric in ('wall', 'imports', 'transactions', 'bytes',
+                           'failures'):
+                if metric not in prev or metric not in result:
+                    continue
+                before = prev[metric] / prev.get('repeat', 1)
+                after = result[metric] / result.get('repeat', 1)
+                if metric in ('wall', 'imports'):
+                    limit = before * (1 + tolerance)
+                else:
+                    limit = before
+                if after > limit:
+                    regressions.append((name, metric, before, after))
+        return regressions
@@ -5,16 +5,52 @@ import sys
 import string
 from pathlib import Path
 from signal import SIGINT
+from threading import local
+from time import perf_counter
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hitaki
+
+from hinawa_utils.misc.control_client import ControlClient
 
 __all__ = ['CliKit']
 
 
 class CliKit():
+    # The observers are called with the name of command, the arguments, the
+    # result and the time to execute it.
+    __observers = []
+
+    # The session of control daemon for the thread to load the CLI tool. The
+    # unit and the table of commands are passed to it instead of dispatching.
+    __sessions = local()
+
+    @classmethod
+    def _set_session(cls, session):
+        cls.__sessions.current = session
+
+    @classmethod
+    def _get_session(cls):
+        return getattr(cls.__sessions, 'current', None)
+
+    @classmethod
+    def add_observer(cls, observer):
+        cls.__observers.append(observer)
+
+    @classmethod
+    def remove_observer(cls, observer):
+        cls.__observers.remove(observer)
+
+    @classmethod
+    def _execute_command(cls, cmds, cmd, unit, args):
+        if len(cls.__observers) == 0:
+            return cmds[cmd](unit, args)
+        begin = perf_counter()
+        result = cmds[cmd](unit, args)
+        elapsed = perf_counter() - begin
+        for observer in cls.__observers:
+            observer(cmd, args, result, elapsed)
+        return result
+
     @staticmethod
     def _seek_snd_unit_from_guid(guid):
         for fullpath in Path('/dev/snd').glob('hw*'):
@@ -71,6 +107,11 @@ class CliKit():
     @classmethod
     def seek_snd_unit_path(cls):
         args = sys.argv
+        # The control daemon executes the command if it runs.
+        if len(args) > 2 and cls._get_session() is None:
+            code = ControlClient.forward(args)
+            if code is not None:
+                sys.exit(code)
         if len(args) > 1:
             identity = args[1]
             # Assume as sound card number if it's digit literal.
@@ -86,39 +127,84 @@ class CliKit():
     def handle_unix_signal(cls, unit):
         del unit
 
+    # Return the list of line number, command and arguments in the file.
+    @staticmethod
+    def _parse_command_file(path):
+        entries = []
+        with path.open(mode='r') as fh:
+            for i, line in enumerate(fh):
+                args = line.rstrip().split(' ')
+                cmd = args[0]
+                if len(cmd) == 0:
+                    continue
+                if cmd[0] == '#':
+                    continue
+                entries.append((i, cmd, args[1:]))
+        return entries
+
+    # The consecutive lines of the same command are executed as a group. The
+    # prefetcher for the command is called with the list of arguments in the
+    # group in advance, to read the state in bulk. The prefetched state is
+    # dropped by clear_prefetched() of the unit after the group. The failure
+    # of transactions in the prefetcher is ignored, since the handlers read
+    # the state by themselves.
     @classmethod
-    def dispatch_command(cls, unit, cmds):
+    def _execute_command_file(cls, unit, cmds, path, prefetchers):
+        entries = cls._parse_command_file(path)
+        pos = 0
+        while pos < len(entries):
+            cmd = entries[pos][1]
+            end = pos + 1
+            while end < len(entries) and entries[end][1] == cmd:
+                end += 1
+            if cmd not in cmds:
+                print('Invalid command in {0}: {1}: {2}'.format(
+                    str(path), entries[pos][0], cmd))
+                return False
+
+            prefetcher = prefetchers.get(cmd)
+            if prefetcher is not None and end - pos > 1:
+                try:
+                    prefetcher(unit, [entry[2] for entry in entries[pos:end]])
+                except (OSError, GLib.Error):
+                    pass
+            try:
+                for i, cmd, args in entries[pos:end]:
+                    if not cls._execute_command(cmds, cmd, unit, args):
+                        print('Invalid arguments in {0}:{1}: {2}'.format(
+                            str(path), i, cmd))
+                        return False
+            finally:
+                if prefetcher is not None and \
+                        hasattr(unit, 'clear_prefetched'):
+                    unit.clear_prefetched()
+            pos = end
+        return True
+
+    # The path of file is relative to the given directory if any.
+    @classmethod
+    def _dispatch_args(cls, unit, cmds, prefetchers, args, cwd=None):
+        if len(args) > 0:
+            if args[0] in cmds:
+                return cls._execute_command(cmds, args[0], unit, args[1:])
+            path = Path(args[0]) if cwd is None else Path(cwd, args[0])
+            if path.is_file():
+                if prefetchers is None:
+                    prefetchers = {}
+                return cls._execute_command_file(unit, cmds, path,
+                                                 prefetchers)
+        cls._dump_commands(cmds)
+        return False
+
+    @classmethod
+    def dispatch_command(cls, unit, cmds, prefetchers=None):
+        session = cls._get_session()
+        if session is not None:
+            return session.attach(unit, cmds, prefetchers)
+
         args = sys.argv
         if len(args) > 2:
             # Install signal handler to cancel event dispatcher.
             GLib.unix_signal_add(GLib.PRIORITY_HIGH, SIGINT,
                                  cls.handle_unix_signal, unit)
-
-            if args[2] in cmds:
-                cmd = args[2]
-                return cmds[cmd](unit, args[3:])
-            path = Path(args[2])
-            if path.is_file():
-                with path.open(mode='r') as fh:
-                    for i, line in enumerate(fh):
-                        args = line.rstrip().split(' ')
-                        if len(args) == 0:
-                            continue
-
-                        cmd = args[0]
-                        if len(cmd) == 0:
-                            continue
-                        if cmd[0] == '#':
-                            continue
-                        if cmd not in cmds:
-                            print('Invalid command in {0}: {1}: {2}'.format(
-                                str(path), i, cmd))
-                            return False
-
-                        if not cmds[cmd](unit, args[1:]):
-                            print('Invalid arguments in {0}:{1}: {2}'.format(
-                                str(path), i, cmd))
-                            return False
-                return True
-        cls._dump_commands(cmds)
-        return False
+        return cls._dispatch_args(unit, cmds, prefetchers, args[2:])
@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+import os
+import sys
+from json import dumps, loads
+from pathlib import Path
+from socket import AF_UNIX, SO_PEERCRED, SOCK_STREAM, SOL_SOCKET, socket
+from socket import timeout as socket_timeout
+from struct import Struct
+
+__all__ = ['ControlClient']
+
+
+# Forward the command line of CLI tool to the control daemon on Unix socket.
+# The request and the response are JSON in a line. The request has the name of
+# CLI tool, the arguments and the working directory. The response has the
+# status, one of 'done', 'error' and 'fallback', and the output of command.
+# This module doesn't depend on GObject introspection.
+class ControlClient():
+    ENCODING = 'utf-8'
+
+    # Set to execute commands without control daemon.
+    DIRECT_ENV = 'HINAWA_UTILS_DIRECT'
+    SOCKET_ENV = 'HINAWA_UTILS_SOCKET'
+
+    # The pid, uid and gid of peer process.
+    _UCRED = Struct('3i')
+
+    # The command is executed directly when the daemon doesn't respond in the
+    # seconds.
+    TIMEOUT = 10.0
+
+    @classmethod
+    def get_default_path(cls):
+        path = os.environ.get(cls.SOCKET_ENV)
+        if path:
+            return path
+        runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+        if runtime_dir:
+            return str(Path(runtime_dir, 'hinawa-utils.sock'))
+        return '/tmp/hinawa-utils-{0}.sock'.format(os.getuid())
+
+    @classmethod
+    def send(cls, fh, msg):
+        fh.write(dumps(msg).encode(cls.ENCODING) + b'\n')
+        fh.flush()
+
+    @classmethod
+    def receive(cls, fh):
+        line = fh.readline()
+        if len(line) == 0:
+            raise OSError('Connection closed by peer')
+        return loads(line.decode(cls.ENCODING))
+
+    def __init__(self, path=None, timeout=TIMEOUT):
+        if path is None:
+            path = self.get_default_path()
+        self.path = path
+        self.timeout = timeout
+
+    # The socket in the predictable path can be bound by the other user.
+    @classmethod
+    def _is_owned(cls, sock):
+        data = sock.getsockopt(SOL_SOCKET, SO_PEERCRED, cls._UCRED.size)
+        _, uid, _ = cls._UCRED.unpack(data)
+        return uid == os.getuid()
+
+    # Return the response, or None when no daemon of the user listens to the
+    # socket or the daemon doesn't respond in time.
+    def request(self, cli, args, cwd):
+        sock = socket(AF_UNIX, SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            return None
+        if not self._is_owned(sock):
+            sock.close()
+            return None
+        with sock, sock.makefile('rwb') as fh:
+            try:
+                self.send(fh, {'cli': cli, 'args': list(args), 'cwd': cwd})
+                return self.receive(fh)
+            except socket_timeout:
+                return None
+
+    # Return the code to exit when the control daemon executes the command
+    # line, else None to execute it directly.
+    @classmethod
+    def forward(cls, argv):
+        if os.environ.get(cls.DIRECT_ENV):
+            return None
+        path = cls.get_default_path()
+        if not Path(path).is_socket():
+            return None
+        resp = cls(path).request(Path(argv[0]).name, argv[1:], os.getcwd())
+        if resp is None or resp['status'] == 'fallback':
+            return None
+        sys.stdout.write(resp['output'])
+        sys.stdout.flush()
+        if resp['status'] == 'error':
+            sys.stderr.write(resp['error'])
+            return 1
+        return 0
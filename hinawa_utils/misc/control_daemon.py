@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+import os
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from runpy import run_path
+from socketserver import StreamRequestHandler, UnixStreamServer
+from threading import Event, Thread
+from traceback import format_exc
+
+from hinawa_utils.misc.cli_kit import CliKit
+from hinawa_utils.misc.control_client import ControlClient
+
+__all__ = ['ControlDaemon']
+
+
+# The CLI tool loaded in a thread. The script runs as usual till it dispatches
+# commands, then the unit and the table of commands are kept in the session
+# and the thread waits for closing, to release the unit by the script itself.
+class _ControlSession():
+    def __init__(self, cli, identity):
+        self.cli = cli
+        self.identity = identity
+        self.unit = None
+        self.cmds = None
+        self.prefetchers = None
+        self.error = None
+        self.__ready = Event()
+        self.__closed = Event()
+        self.__thread = None
+
+    def attach(self, unit, cmds, prefetchers):
+        self.unit = unit
+        self.cmds = cmds
+        self.prefetchers = prefetchers
+        self.__ready.set()
+        self.__closed.wait()
+        return True
+
+    def __load(self):
+        CliKit._set_session(self)
+        try:
+            run_path(self.cli, run_name='__main__')
+        except (Exception, SystemExit):
+            self.error = format_exc()
+        finally:
+            self.__ready.set()
+
+    # Return whether the unit is available, and the output of script. The
+    # script reads arguments in sys.argv, thus it's not thread-safe.
+    def open(self):
+        argv = list(sys.argv)
+        sys.argv[:] = [self.cli, self.identity]
+        output = StringIO()
+        try:
+            with redirect_stdout(output):
+                self.__thread = Thread(target=self.__load)
+                self.__thread.start()
+                self.__ready.wait()
+        finally:
+            sys.argv[:] = argv
+        return self.unit is not None, output.getvalue()
+
+    def close(self):
+        self.__closed.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+
+class _ControlRequestHandler(StreamRequestHandler):
+    def handle(self):
+        try:
+            request = ControlClient.receive(self.rfile)
+        except (OSError, ValueError):
+            return
+        ControlClient.send(self.wfile, self.server.control.execute(request))
+
+
+# Keep units opened by CLI tools and execute commands from ControlClient. The
+# unit is opened at the first request for the pair of CLI tool and the card,
+# then kept with the state cached by the unit till the daemon stops. Requests
+# are executed one by one in the order of arrival.
+class ControlDaemon():
+    def __init__(self, cli_dir, path=None):
+        if path is None:
+            path = ControlClient.get_default_path()
+        self.cli_dir = Path(cli_dir)
+        self.path = path
+        self.__sessions = {}
+
+    # The commands to listen events wait for signal from terminal, thus they
+    # should run in the process of client. They are detected before opening
+    # the unit, thus by the prefix of name.
+    @staticmethod
+    def is_interactive(args, cwd):
+        if len(args) == 0:
+            return False
+        if args[0].find('listen-') == 0:
+            return True
+        path = Path(cwd, args[0])
+        if path.is_file():
+            for _, cmd, _ in CliKit._parse_command_file(path):
+                if cmd.find('listen-') == 0:
+                    return True
+        return False
+
+    def __find_cli(self, name):
+        if not isinstance(name, str) or name.find('hinawa-') != 0 or \
+                name.rfind('-cli') != len(name) - 4 or name.find('/') >= 0:
+            return None
+        path = self.cli_dir.joinpath(name)
+        if not path.is_file():
+            return None
+        return str(path)
+
+    # Return the session and the output of loading, or the message of error.
+    def open_session(self, name, identity):
+        key = (name, identity)
+        if key in self.__sessions:
+            return self.__sessions[key], ''
+        cli = self.__find_cli(name)
+        if cli is None:
+            raise ValueError('Invalid argument for CLI tool: {0}'.format(name))
+        session = _ControlSession(cli, identity)
+        loaded, output = session.open()
+        if not loaded:
+            session.close()
+            return None, output
+        self.__sessions[key] = session
+        return session, output
+
+    def close_session(self, name, identity):
+        session = self.__sessions.pop((name, identity), None)
+        if session is not None:
+            session.close()
+
+    def execute(self, request):
+        name = request.get('cli')
+        args = request.get('args', [])
+        cwd = request.get('cwd', '/')
+        # The help is printed by CLI tool itself.
+        if len(args) < 2:
+            return {'status': 'fallback'}
+        identity, args = args[0], args[1:]
+        if self.is_interactive(args, cwd):
+            return {'status': 'fallback'}
+
+        try:
+            session, output = self.open_session(name, identity)
+        except ValueError as e:
+            return {'status': 'error', 'output': '', 'error': str(e) + '\n'}
+        if session is None:
+            return {'status': 'fallback'}
+
+        buf = StringIO()
+        try:
+            with redirect_stdout(buf):
+                result = CliKit._dispatch_args(session.unit, session.cmds,
+                                               session.prefetchers, args, cwd)
+        except Exception:
+            # The state of unit is unknown. It's opened again at next request.
+            self.close_session(name, identity)
+            return {'status': 'error', 'output': output + buf.getvalue(),
+                    'error': format_exc()}
+        return {'status': 'done', 'result': bool(result),
+                'output': output + buf.getvalue()}
+
+    def close(self):
+        for name, identity in list(self.__sessions.keys()):
+            self.close_session(name, identity)
+
+    # Serve requests till KeyboardInterrupt. The socket is created under the
+    # mask of file mode, thus accessible by the owner only since binding.
+    def serve(self):
+        if Path(self.path).is_socket():
+            if ControlClient(self.path).request('', [], '/') is not None:
+                raise OSError('Control daemon already runs: {0}'.format(
+                    self.path))
+            os.unlink(self.path)
+        mask = os.umask(0o077)
+        try:
+            server = UnixStreamServer(self.path, _ControlRequestHandler)
+        finally:
+            os.umask(mask)
+        server.control = self
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(self.path)
+            self.close()
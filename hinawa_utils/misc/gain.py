@@ -0,0 +1,135 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from array import array
+from math import log10, pow
+from sys import byteorder
+
+__all__ = ['LogCoeffGain', 'LinearGain', 'AvcGain']
+
+
+# The register has linear coefficient against reference value, thus
+# db = 20 * log10(val / ref). Zero is expressed by the floor value.
+class LogCoeffGain():
+    def __init__(self, ref, floor=float('-inf'), bits=32, ndigits=None):
+        if bits not in (16, 32):
+            raise ValueError('Invalid argument for width of register')
+        self.ref = ref
+        self.floor = floor
+        self.bits = bits
+        self.ndigits = ndigits
+        self.__table = None
+
+    def parse_val_to_db(self, val):
+        if val == 0:
+            return self.floor
+        db = 20 * log10(val / self.ref)
+        if self.ndigits is not None:
+            db = round(db, self.ndigits)
+        return db
+
+    def build_val_from_db(self, db):
+        if db <= self.floor:
+            return 0
+        return int(self.ref * pow(10, db / 20))
+
+    # Lookup table for all of 16 bit values, built at first use.
+    def _get_table(self):
+        if self.__table is None:
+            self.__table = array('d', map(self.parse_val_to_db,
+                                          range(1 << self.bits)))
+        return self.__table
+
+    def parse_vals_to_db(self, vals):
+        if self.bits == 16:
+            return array('d', map(self._get_table().__getitem__, vals))
+        return array('d', map(self.parse_val_to_db, vals))
+
+    def build_vals_from_db(self, dbs):
+        code = 'H' if self.bits == 16 else 'I'
+        return array(code, map(self.build_val_from_db, dbs))
+
+
+# The register has linear value in the range of dB.
+class LinearGain():
+    def __init__(self, min_db, max_db, max_val):
+        self.min_db = min_db
+        self.max_db = max_db
+        self.max_val = max_val
+
+    def parse_val_to_db(self, val):
+        return float(self.min_db + val * (self.max_db - self.min_db) /
+                     self.max_val)
+
+    def build_val_from_db(self, db):
+        if db > self.max_db:
+            raise ValueError('Invalid argument for dB value.')
+        return int((db - self.min_db) * self.max_val /
+                   (self.max_db - self.min_db))
+
+    def parse_vals_to_db(self, vals):
+        return array('d', map(self.parse_val_to_db, vals))
+
+    def build_vals_from_db(self, dbs):
+        return array('I', map(self.build_val_from_db, dbs))
+
+
+# AV/C Audio Subunit Specification 1.0, the volume and LR balance control.
+# The data is 16 bit signed integer in big endian, by 1/256 dB step.
+class AvcGain():
+    # MEMO: 0x8000 represents negative infinite. 0x7fff is invalid. However,
+    # they're used to represent minimum/maximum value.
+    __table = None
+
+    @classmethod
+    def parse_val_to_db(cls, val):
+        if val == 0x8000:
+            return -128.0
+        elif val == 0x7fff:
+            return 128.0
+        if val & 0x8000:
+            val -= 0x10000
+        return val * 128 / 0x7fff
+
+    @classmethod
+    def build_val_from_db(cls, db):
+        if db == 128.0:
+            return 0x7fff
+        elif db == -128.0:
+            return 0x8000
+        val = int(0x7fff * db / 128)
+        if val < -0x8000 or val > 0x7fff:
+            raise ValueError('Invalid argument for dB value.')
+        return val & 0xffff
+
+    @classmethod
+    def parse_data_to_db(cls, data):
+        return cls.parse_val_to_db((data[0] << 8) | data[1])
+
+    @classmethod
+    def build_data_from_db(cls, db):
+        val = cls.build_val_from_db(db)
+        return bytes((val >> 8, val & 0xff))
+
+    @classmethod
+    def _get_table(cls):
+        if cls.__table is None:
+            cls.__table = array('d', map(cls.parse_val_to_db, range(0x10000)))
+        return cls.__table
+
+    # The data is a series of big endian values.
+    @classmethod
+    def parse_frames_to_db(cls, frames):
+        if len(frames) % 2:
+            raise ValueError('Invalid length of frames')
+        vals = array('H', bytes(frames))
+        if byteorder == 'little':
+            vals.byteswap()
+        return array('d', map(cls._get_table().__getitem__, vals))
+
+    @classmethod
+    def build_frames_from_db(cls, dbs):
+        vals = array('H', map(cls.build_val_from_db, dbs))
+        if byteorder == 'little':
+            vals.byteswap()
+        return vals.tobytes()
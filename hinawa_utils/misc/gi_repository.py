@@ -0,0 +1,53 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from importlib import import_module
+from threading import Lock
+
+__all__ = ['GiNamespace', 'GLib', 'Hinawa', 'Hitaki']
+
+
+# The namespace of GObject introspection, resolved at the first access to its
+# attribute. Modules can refer to it without the cost to load GObject
+# introspection till the unit is actually opened. The namespace installed by
+# TransportBackend is resolved as well when installed in advance.
+class GiNamespace():
+    VERSIONS = {
+        'GLib':     '2.0',
+        'Hinawa':   '4.0',
+        'Hitaki':   '0.0',
+    }
+
+    __lock = Lock()
+
+    def __init__(self, name):
+        if name not in self.VERSIONS:
+            raise ValueError('Invalid argument for namespace: {0}'.format(
+                name))
+        self.__name = name
+        self.__module = None
+
+    # Return the module of namespace if already resolved, else None.
+    def get_loaded(self):
+        return self.__module
+
+    def load(self):
+        if self.__module is None:
+            with self.__lock:
+                if self.__module is None:
+                    gi = import_module('gi')
+                    gi.require_version(self.__name, self.VERSIONS[self.__name])
+                    self.__module = import_module(
+                        'gi.repository.{0}'.format(self.__name))
+        return self.__module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return '<GiNamespace {0}>'.format(self.__name)
+
+
+GLib = GiNamespace('GLib')
+Hinawa = GiNamespace('Hinawa')
+Hitaki = GiNamespace('Hitaki')
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from collections import deque
+from threading import Event, Thread
+from time import monotonic
+
+__all__ = ['ControlEvent', 'ControlMessageDecoder', 'ControlMessageStream']
+
+
+class ControlEvent():
+    KINDS = ('fader', 'knob', 'button', 'meter', 'message')
+
+    def __init__(self, kind, name, value, timestamp):
+        self.kind = kind
+        self.name = name
+        self.value = value
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return 'ControlEvent({0}, {1}, {2}, {3:.6f})'.format(
+            self.kind, self.name, self.value, self.timestamp)
+
+
+# Decode the change of quadlet in the state image, or the quadlet of message,
+# according to the table of fields. Each field is (kind, name, index, mask).
+# The value of button is boolean, the others are shifted value in the mask.
+# The change of bits out of fields is decoded as message with the index,
+# except for ignored bits given by the dictionary of index and mask.
+class ControlMessageDecoder():
+    def __init__(self, fields=(), ignored={}):
+        self.__fields = {}
+        for kind, name, index, mask in fields:
+            if kind not in ControlEvent.KINDS:
+                raise ValueError('Invalid kind of field: {0}'.format(kind))
+            if mask == 0:
+                raise ValueError('Invalid mask of field: {0}'.format(name))
+            shift = (mask & -mask).bit_length() - 1
+            self.__fields.setdefault(index, []).append(
+                                                    (kind, name, mask, shift))
+        self.__masks = dict(ignored)
+        for index, fields in self.__fields.items():
+            self.__masks.setdefault(index, 0)
+            for kind, name, mask, shift in fields:
+                self.__masks[index] |= mask
+
+    # Return the list of (kind, name, value).
+    def decode_change(self, index, before, after):
+        changes = []
+        diff = before ^ after
+        for kind, name, mask, shift in self.__fields.get(index, ()):
+            if diff & mask:
+                val = (after & mask) >> shift
+                if kind == 'button':
+                    val = bool(val)
+                changes.append((kind, name, val))
+        if diff & ~self.__masks.get(index, 0):
+            changes.append(('message', index, after))
+        return changes
+
+    # For the unit which transmits messages without state image.
+    def decode_message(self, message):
+        return self.decode_change(0, 0, message)
+
+
+# Receive messages from the signal into the queue without lock, since the
+# append and popleft of deque are atomic. A thread decodes the queued messages
+# in the batch per period, then deduplicates the intermediate values of fader,
+# knob and meter. The events of button and message are delivered in order.
+class ControlMessageStream():
+    DEDUPLICATED_KINDS = ('fader', 'knob', 'meter')
+
+    def __init__(self, decode, period=0.02):
+        if period <= 0:
+            raise ValueError('Invalid argument for period of batch')
+        self.decode = decode
+        self.period = period
+        self.received = 0
+        self.deduplicated = 0
+        self.__queue = deque()
+        self.__callbacks = []
+        self.__signals = []
+        self.__stop = Event()
+        self.__thread = None
+
+    # The decode is called with the arguments of signal except for the
+    # emitter.
+    def attach(self, obj, signal):
+        handler = obj.connect(signal, self._queue_message)
+        self.__signals.append((obj, handler))
+
+    def detach(self):
+        for obj, handler in self.__signals:
+            obj.disconnect(handler)
+        self.__signals = []
+
+    def _queue_message(self, obj, *args):
+        self.__queue.append((monotonic(), args))
+
+    # The callback is called with the list of events in the batch.
+    def subscribe(self, callback):
+        self.__callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__callbacks.remove(callback)
+
+    def decode_batch(self):
+        events = []
+        latest = {}
+        while True:
+            try:
+                timestamp, args = self.__queue.popleft()
+            except IndexError:
+                break
+            self.received += 1
+            for kind, name, value in self.decode(*args):
+                key = (kind, name)
+                if kind in self.DEDUPLICATED_KINDS and key in latest:
+                    # Keep the position of the first event in the batch.
+                    event = events[latest[key]]
+                    event.value = value
+                    event.timestamp = timestamp
+                    self.deduplicated += 1
+                    continue
+                latest[key] = len(events)
+                events.append(ControlEvent(kind, name, value, timestamp))
+        return events
+
+    def run(self):
+        self.__stop.clear()
+        while not self.__stop.wait(self.period):
+            events = self.decode_batch()
+            if len(events) > 0:
+                for callback in self.__callbacks:
+                    callback(events)
+
+    def start(self):
+        if self.__thread is not None:
+            raise RuntimeError('The stream is already running')
+        self.__thread = Thread(target=self.run)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
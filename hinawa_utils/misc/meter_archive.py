@@ -0,0 +1,223 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from json import dumps, loads
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from sys import byteorder
+from zlib import compress, decompress
+
+__all__ = ['MeterRecorder', 'MeterArchive']
+
+
+# The layout of file:
+#  - file header, then labels in JSON
+#  - chunks, each of which has header and payload compressed by zlib
+# The payload of chunk is columnar; timestamps in double, then the column of
+# each channel. The column of uint32 is encoded as the difference from the
+# previous row. The values are in little endian.
+class _MeterArchiveLayout():
+    MAGIC = b'HNMA'
+    VERSION = 1
+    TYPECODES = ('I', 'd')
+    HEADER = Struct('<4sHcxII')
+    CHUNK_MAGIC = b'CHNK'
+    CHUNK_HEADER = Struct('<4sIddI')
+    MASK = 0xffffffff
+
+    @staticmethod
+    def to_little_endian(vals):
+        if byteorder != 'little':
+            vals.byteswap()
+        return vals
+
+    @classmethod
+    def encode_column(cls, typecode, vals):
+        if typecode == 'I':
+            prev = 0
+            deltas = array('I')
+            for val in vals:
+                deltas.append((val - prev) & cls.MASK)
+                prev = val
+            vals = deltas
+        return cls.to_little_endian(vals).tobytes()
+
+    @classmethod
+    def decode_column(cls, typecode, data):
+        vals = cls.to_little_endian(array(typecode, data))
+        if typecode == 'I':
+            vals = array('I', accumulate(vals,
+                                         lambda a, b: (a + b) & cls.MASK))
+        return vals
+
+
+# Append frames of meter to the file in the unit of chunk. The record method
+# is for the callback of history.
+class MeterRecorder():
+    def __init__(self, path, labels, typecode='I', chunk_rows=1024, level=6):
+        if typecode not in _MeterArchiveLayout.TYPECODES:
+            raise ValueError('Invalid argument for type of value')
+        if chunk_rows < 1:
+            raise ValueError('Invalid argument for rows in chunk')
+        self.labels = tuple(labels)
+        self.channels = len(self.labels)
+        self.typecode = typecode
+        self.chunk_rows = chunk_rows
+        self.level = level
+        self.rows = 0
+
+        literal = dumps(self.labels).encode('utf-8')
+        self.__file = open(path, 'wb')
+        self.__file.write(_MeterArchiveLayout.HEADER.pack(
+            _MeterArchiveLayout.MAGIC, _MeterArchiveLayout.VERSION,
+            typecode.encode('ascii'), self.channels, len(literal)))
+        self.__file.write(literal)
+        self.__clear()
+
+    def __clear(self):
+        self.__timestamps = array('d')
+        self.__columns = [array(self.typecode) for i in range(self.channels)]
+
+    def append(self, timestamp, frame):
+        if len(frame) != self.channels:
+            raise ValueError('Invalid length of frame')
+        self.__timestamps.append(timestamp)
+        if self.typecode == 'I':
+            frame = map(int, frame)
+        for column, val in zip(self.__columns, frame):
+            column.append(val)
+        self.rows += 1
+        if len(self.__timestamps) >= self.chunk_rows:
+            self.flush()
+
+    def record(self, history, timestamp, frame):
+        self.append(timestamp, frame)
+
+    def flush(self):
+        rows = len(self.__timestamps)
+        if rows == 0:
+            return
+        first = self.__timestamps[0]
+        last = self.__timestamps[-1]
+        payload = bytearray(
+            _MeterArchiveLayout.to_little_endian(self.__timestamps).tobytes())
+        for column in self.__columns:
+            payload.extend(_MeterArchiveLayout.encode_column(self.typecode,
+                                                             column))
+        data = compress(payload, self.level)
+        self.__file.write(_MeterArchiveLayout.CHUNK_HEADER.pack(
+            _MeterArchiveLayout.CHUNK_MAGIC, rows, first, last, len(data)))
+        self.__file.write(data)
+        self.__file.flush()
+        self.__clear()
+
+    def close(self):
+        if self.__file is not None:
+            self.flush()
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.close()
+
+
+# Read the file written by MeterRecorder. The file is mapped to memory, and
+# the chunk is decompressed only when it has frames in the range of time.
+class MeterArchive():
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.__map = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+        layout = _MeterArchiveLayout
+        magic, version, typecode, channels, length = \
+            layout.HEADER.unpack_from(self.__map, 0)
+        if magic != layout.MAGIC or version != layout.VERSION:
+            self.__map.close()
+            raise ValueError('Invalid content of file for meter archive')
+        offset = layout.HEADER.size
+        literal = self.__map[offset:offset + length].decode('utf-8')
+        self.labels = tuple(tuple(label) if isinstance(label, list) else label
+                            for label in loads(literal))
+        self.channels = channels
+        self.typecode = typecode.decode('ascii')
+        offset += length
+
+        # The list of (rows, first timestamp, last timestamp, offset, length).
+        self.__chunks = []
+        while offset + layout.CHUNK_HEADER.size <= len(self.__map):
+            magic, rows, first, last, length = \
+                layout.CHUNK_HEADER.unpack_from(self.__map, offset)
+            offset += layout.CHUNK_HEADER.size
+            # The last chunk can be truncated by abort of recorder.
+            if magic != layout.CHUNK_MAGIC or \
+                    offset + length > len(self.__map):
+                break
+            self.__chunks.append((rows, first, last, offset, length))
+            offset += length
+        self.__lasts = [chunk[2] for chunk in self.__chunks]
+
+    def __len__(self):
+        return sum(chunk[0] for chunk in self.__chunks)
+
+    def get_time_range(self):
+        if len(self.__chunks) == 0:
+            return None
+        return self.__chunks[0][1], self.__chunks[-1][2]
+
+    def _read_chunk(self, chunk):
+        rows, first, last, offset, length = chunk
+        payload = decompress(self.__map[offset:offset + length])
+        width = 8 if self.typecode == 'd' else 4
+        timestamps = _MeterArchiveLayout.to_little_endian(
+                                            array('d', payload[:8 * rows]))
+        columns = []
+        pos = 8 * rows
+        for i in range(self.channels):
+            data = payload[pos:pos + width * rows]
+            columns.append(_MeterArchiveLayout.decode_column(self.typecode,
+                                                             data))
+            pos += width * rows
+        return timestamps, columns
+
+    # Return timestamps and columns aligned to labels, for the frames between
+    # the start and the end of time, inclusive.
+    def read(self, start=None, end=None):
+        timestamps = array('d')
+        columns = [array(self.typecode) for i in range(self.channels)]
+        begin = 0 if start is None else bisect_left(self.__lasts, start)
+        for chunk in self.__chunks[begin:]:
+            if end is not None and chunk[1] > end:
+                break
+            chunk_timestamps, chunk_columns = self._read_chunk(chunk)
+            head = 0
+            tail = len(chunk_timestamps)
+            if start is not None:
+                head = bisect_left(chunk_timestamps, start)
+            if end is not None:
+                tail = bisect_right(chunk_timestamps, end)
+            timestamps.extend(chunk_timestamps[head:tail])
+            for column, chunk_column in zip(columns, chunk_columns):
+                column.extend(chunk_column[head:tail])
+        return timestamps, columns
+
+    def iterate_frames(self, start=None, end=None):
+        timestamps, columns = self.read(start, end)
+        for i, timestamp in enumerate(timestamps):
+            yield timestamp, tuple(column[i] for column in columns)
+
+    def close(self):
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.close()
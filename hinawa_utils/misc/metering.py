@@ -0,0 +1,551 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from array import array
+from itertools import repeat
+from json import dumps, loads
+from operator import sub
+from os import getpid, kill
+from struct import Struct
+from threading import Event, Thread
+from time import monotonic, sleep
+
+from hinawa_utils.misc.meter_archive import MeterRecorder
+
+__all__ = ['MeterSource', 'MeterHistory', 'MeterEngine', 'MeterPublisher',
+           'MeterSubscriber']
+
+
+# A source of meter frames. The reader fills given array with the value of
+# each channel, in the order of labels.
+class MeterSource():
+    def __init__(self, labels, reader):
+        self.labels = tuple(labels)
+        self.reader = reader
+
+    def read(self, values):
+        self.reader(values)
+
+    # The first channels are the flags, S/PDIF and ADAT status, followed by
+    # the levels in dB, or the raw value of uint32 when raw is True.
+    @classmethod
+    def for_efw(cls, unit, raw=False):
+        levels = array('I', bytes(4 * 256))
+        _, _, _, outputs, inputs = unit.read_metering(levels)
+        labels = ['flags', 'spdif', 'adat']
+        labels += ['output-{0}'.format(i) for i in range(outputs)]
+        labels += ['input-{0}'.format(i) for i in range(inputs)]
+        view = memoryview(levels)[:outputs + inputs]
+
+        def reader(values):
+            values[:3] = array('d', unit.read_metering(levels)[:3])
+            if raw:
+                values[3:] = array('d', view)
+            else:
+                values[3:] = unit.parse_metering_levels(view)
+        return cls(labels, reader)
+
+    @classmethod
+    def for_dice_extended(cls, unit):
+        labels = []
+        for src_blk, src_params in unit.get_metering().items():
+            for src_ch, dst_params in src_params.items():
+                for dst_blk, dst_blk_params in dst_params.items():
+                    for dst_ch in dst_blk_params:
+                        labels.append((src_blk, src_ch, dst_blk, dst_ch))
+        layout = [None, None]
+
+        def locate(srcs, dsts):
+            # The route removed after the source is created is left as zero.
+            src_rows = {label: i for i, label in enumerate(srcs)}
+            dst_cols = {label: i for i, label in enumerate(dsts)}
+            cells = []
+            for src_blk, src_ch, dst_blk, dst_ch in labels:
+                row = src_rows.get((src_blk, src_ch))
+                col = dst_cols.get((dst_blk, dst_ch))
+                if row is None or col is None:
+                    cells.append(None)
+                else:
+                    cells.append(row * len(dsts) + col)
+            layout[:] = [srcs, cells]
+
+        def reader(values):
+            srcs, dsts, matrix = unit.get_metering_matrix()
+            # The layout is rebuilt when the router is changed.
+            if layout[0] is not srcs:
+                locate(srcs, dsts)
+            for i, cell in enumerate(layout[1]):
+                values[i] = matrix[cell] if cell is not None else 0
+        return cls(labels, reader)
+
+    @classmethod
+    def for_maudio(cls, protocol):
+        if hasattr(protocol, 'get_meter_array'):
+            def read_array(values):
+                values[:] = array('d', protocol.get_meter_array())
+            return cls(protocol.get_meter_labels(), read_array)
+
+        labels = sorted(protocol.get_meters())
+
+        def reader(values):
+            meters = protocol.get_meters()
+            for i, label in enumerate(labels):
+                values[i] = meters[label]
+        return cls(labels, reader)
+
+    @classmethod
+    def for_alesis_io(cls, unit):
+        def reader(values):
+            values[:] = unit.get_meter_array()
+        return cls(unit.get_meter_labels(), reader)
+
+
+# Ring buffer for the history of meter frames, with peak hold.
+class MeterHistory():
+    def __init__(self, labels, depth, decay=0.0):
+        if depth < 1:
+            raise ValueError('Invalid argument for depth of history')
+        self.labels = tuple(labels)
+        self.depth = depth
+        self.decay = decay
+        self.channels = len(self.labels)
+        self.frames = array('d', bytes(8 * self.channels * depth))
+        self.timestamps = array('d', bytes(8 * depth))
+        self.peaks = array('d', bytes(8 * self.channels))
+        self.count = 0
+        self.errors = 0
+        self.last_error = None
+        self.__subscribers = []
+        self.__pos = 0
+
+    def _get_slot(self, pos):
+        begin = pos * self.channels
+        return memoryview(self.frames)[begin:begin + self.channels]
+
+    # The slot to be filled by the source at next tick.
+    def _get_next_slot(self):
+        return self._get_slot(self.__pos)
+
+    def _commit(self, timestamp):
+        slot = self._get_slot(self.__pos)
+        self.timestamps[self.__pos] = timestamp
+
+        if self.count > 0:
+            interval = timestamp - self.timestamps[self.__pos - 1]
+            decayed = map(sub, self.peaks, repeat(self.decay * interval))
+            self.peaks = array('d', map(max, slot, decayed))
+        else:
+            self.peaks = array('d', slot)
+
+        self.__pos = (self.__pos + 1) % self.depth
+        self.count += 1
+
+        for callback in self.__subscribers:
+            callback(self, timestamp, slot)
+
+    def subscribe(self, callback):
+        self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__subscribers.remove(callback)
+
+    def get_latest(self):
+        if self.count == 0:
+            return None
+        return self._get_slot((self.__pos - 1) % self.depth)
+
+    # Return frames in the order of time, as a list of (timestamp, frame).
+    def get_frames(self, count=None):
+        available = min(self.count, self.depth)
+        if count is None or count > available:
+            count = available
+        frames = []
+        for i in range(count):
+            pos = (self.__pos - count + i) % self.depth
+            frames.append((self.timestamps[pos], self._get_slot(pos)))
+        return frames
+
+
+# Poll all of registered sources by the period, in a schedule of deadlines
+# computed from monotonic clock, thus no drift due to the time of polling.
+class MeterEngine():
+    def __init__(self, rate, depth=256):
+        if rate <= 0:
+            raise ValueError('Invalid argument for rate of polling')
+        self.period = 1.0 / rate
+        self.depth = depth
+        self.overruns = 0
+        self.__sources = {}
+        self.__stop = Event()
+        self.__thread = None
+
+    def add_source(self, name, source, decay=0.0):
+        if name in self.__sources:
+            raise ValueError('Invalid argument for name of source')
+        history = MeterHistory(source.labels, self.depth, decay)
+        self.__sources[name] = (source, history)
+        return history
+
+    # The factory of MeterSource reads the unit to detect the channels. As well
+    # as polling, the failure of transaction skips the tick, then the factory
+    # is called again at next tick till the number of retries.
+    def open_source(self, name, factory, *args, decay=0.0, retries=10):
+        for i in range(retries):
+            try:
+                source = factory(*args)
+            except Exception:
+                if i == retries - 1 or self.__stop.wait(self.period):
+                    raise
+                continue
+            return self.add_source(name, source, decay)
+
+    def remove_source(self, name):
+        del self.__sources[name]
+
+    def get_history(self, name):
+        return self.__sources[name][1]
+
+    def subscribe(self, name, callback):
+        self.get_history(name).subscribe(callback)
+
+    def poll(self):
+        timestamp = monotonic()
+        for source, history in list(self.__sources.values()):
+            slot = history._get_next_slot()
+            try:
+                source.read(slot)
+            except Exception as e:
+                # At higher sampling rate, some units fail transactions
+                # frequently. Skip this tick.
+                history.errors += 1
+                history.last_error = e
+                continue
+            history._commit(timestamp)
+
+    # The stop is cleared by start() before the thread starts, thus stop()
+    # just after start() is not lost.
+    def run(self):
+        deadline = monotonic()
+        while not self.__stop.is_set():
+            self.poll()
+            deadline += self.period
+            now = monotonic()
+            if deadline < now:
+                # Skip the ticks already passed.
+                missed = int((now - deadline) // self.period) + 1
+                self.overruns += missed
+                deadline += missed * self.period
+            self.__stop.wait(deadline - monotonic())
+
+    # Publish the frames of the source to shared memory with the name.
+    def publish(self, name, shm_name):
+        history = self.get_history(name)
+        publisher = MeterPublisher(shm_name, history.labels, self.depth)
+        history.subscribe(publisher.publish)
+        return publisher
+
+    # Record the frames of the source to the file in the path.
+    def record(self, name, path, typecode='I'):
+        history = self.get_history(name)
+        recorder = MeterRecorder(path, history.labels, typecode)
+        history.subscribe(recorder.record)
+        return recorder
+
+    # The command to listen meters in CLI tools. The frames are recorded to
+    # the file, published to shared memory, or printed by the printer in the
+    # same arguments as the callback of history. The frames published by the
+    # other process are printed without transactions, else the unit is polled.
+    @classmethod
+    def listen(cls, unit, args, rate, factory, printer, record_factory=None,
+               typecode='I'):
+        engine = cls(rate)
+        if len(args) > 1 and args[0] == 'record':
+            if record_factory is None:
+                record_factory = factory
+            engine.open_source('meter', record_factory)
+            with engine.record('meter', args[1], typecode):
+                engine.run()
+            return True
+
+        shm_name = MeterPublisher.get_name(unit)
+        if len(args) > 0 and args[0] == 'publish':
+            engine.open_source('meter', factory)
+            with engine.publish('meter', shm_name):
+                engine.run()
+            return True
+
+        subscriber = MeterSubscriber.attach(shm_name)
+        if subscriber is not None:
+            with subscriber:
+                if subscriber.run(rate, printer):
+                    return True
+
+        engine.open_source('meter', factory)
+        engine.subscribe('meter', printer)
+        engine.run()
+        return True
+
+    def start(self):
+        if self.__thread is not None:
+            raise RuntimeError('The engine is already running')
+        self.__stop.clear()
+        self.__thread = Thread(target=self.run)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+
+# The layout of shared memory for meter frames:
+#  - header
+#  - labels in JSON, padded to 8 bytes
+#  - the ring of timestamps in double
+#  - the ring of frames in double
+# The header includes the ID of publisher process and the sequence number of
+# seqlock. The sequence number is odd while the publisher updates the ring, and
+# it is increased again after the update.
+class _MeterRingLayout():
+    MAGIC = b'HNMR'
+    VERSION = 2
+    HEADER = Struct('<4sIIIII')
+    SEQ = Struct('<Q')
+    COUNT = Struct('<Q')
+    SEQ_OFFSET = HEADER.size
+    COUNT_OFFSET = SEQ_OFFSET + SEQ.size
+
+    def __init__(self, channels, depth, labels_length):
+        self.channels = channels
+        self.depth = depth
+        self.labels_length = labels_length
+        self.labels_offset = self.COUNT_OFFSET + self.COUNT.size
+        self.timestamps_offset = self.labels_offset + \
+            (labels_length + 7) // 8 * 8
+        self.frames_offset = self.timestamps_offset + 8 * depth
+        self.size = self.frames_offset + 8 * channels * depth
+
+    def get_views(self, buf):
+        view = memoryview(buf)
+        timestamps = view[self.timestamps_offset:self.frames_offset].cast('d')
+        frames = view[self.frames_offset:self.size].cast('d')
+        view.release()
+        return timestamps, frames
+
+
+# Write frames to shared memory, for processes to read meters without
+# transactions to the unit. The publish method is for the callback of history.
+class MeterPublisher():
+    def __init__(self, name, labels, depth):
+        if depth < 1:
+            raise ValueError('Invalid argument for depth of history')
+        self.name = name
+        self.labels = tuple(labels)
+        self.channels = len(self.labels)
+        self.depth = depth
+
+        # The module of shared memory costs at startup of CLI tools.
+        from multiprocessing.shared_memory import SharedMemory
+
+        literal = dumps(self.labels).encode('utf-8')
+        self.__layout = _MeterRingLayout(self.channels, depth, len(literal))
+        try:
+            self.__shm = SharedMemory(name, create=True,
+                                      size=self.__layout.size)
+        except FileExistsError:
+            # The memory left by the publisher killed before is taken over.
+            try:
+                subscriber = MeterSubscriber(name)
+            except ValueError:
+                raise FileExistsError(
+                    'Shared memory is used by the other: {0}'.format(name))
+            with subscriber:
+                if subscriber.is_alive():
+                    raise FileExistsError(
+                        'Meter publisher already runs: {0}'.format(
+                            subscriber.pid))
+            stale = SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.__shm = SharedMemory(name, create=True,
+                                      size=self.__layout.size)
+
+        buf = self.__shm.buf
+        self.__layout.HEADER.pack_into(buf, 0, self.__layout.MAGIC,
+                                       self.__layout.VERSION, self.channels,
+                                       depth, len(literal), getpid())
+        offset = self.__layout.labels_offset
+        buf[offset:offset + len(literal)] = literal
+        self.__timestamps, self.__frames = self.__layout.get_views(buf)
+        self.__seq = 0
+        self.__count = 0
+
+    @staticmethod
+    def get_name(unit):
+        return 'hinawa-meter-{0}'.format(unit.get_property('node-device'))
+
+    def publish(self, history, timestamp, frame):
+        layout = self.__layout
+        buf = self.__shm.buf
+        pos = self.__count % self.depth
+        begin = pos * self.channels
+
+        self.__seq += 1
+        layout.SEQ.pack_into(buf, layout.SEQ_OFFSET, self.__seq)
+        self.__timestamps[pos] = timestamp
+        self.__frames[begin:begin + self.channels] = array('d', frame)
+        self.__count += 1
+        layout.COUNT.pack_into(buf, layout.COUNT_OFFSET, self.__count)
+        self.__seq += 1
+        layout.SEQ.pack_into(buf, layout.SEQ_OFFSET, self.__seq)
+
+    def close(self):
+        if self.__shm is not None:
+            self.__timestamps.release()
+            self.__frames.release()
+            self.__shm.close()
+            self.__shm.unlink()
+            self.__shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.close()
+
+
+# Read frames from the shared memory written by MeterPublisher. The memory is
+# left when the publisher is killed, thus the liveness of publisher is checked
+# by the ID of process in the header.
+class MeterSubscriber():
+    # The sequence number stays odd when the publisher is killed during update.
+    __RETRIES = 100
+
+    def __init__(self, name):
+        from multiprocessing import resource_tracker
+        from multiprocessing.shared_memory import SharedMemory
+
+        try:
+            self.__shm = SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13, the memory is unlinked by resource tracker
+            # when the process exits, unless unregistered.
+            self.__shm = SharedMemory(name)
+            resource_tracker.unregister(self.__shm._name, 'shared_memory')
+
+        buf = self.__shm.buf
+        magic, version, channels, depth, length, pid = \
+            _MeterRingLayout.HEADER.unpack_from(buf, 0)
+        if magic != _MeterRingLayout.MAGIC or \
+                version != _MeterRingLayout.VERSION:
+            self.__shm.close()
+            raise ValueError('Invalid content of shared memory for meter')
+
+        self.__layout = _MeterRingLayout(channels, depth, length)
+        offset = self.__layout.labels_offset
+        literal = bytes(buf[offset:offset + length]).decode('utf-8')
+        self.labels = tuple(tuple(label) if isinstance(label, list) else label
+                            for label in loads(literal))
+        self.channels = channels
+        self.depth = depth
+        self.pid = pid
+        self.__timestamps, self.__frames = self.__layout.get_views(buf)
+
+    # Return None unless the publisher is alive, for the caller to poll the
+    # unit instead.
+    @classmethod
+    def attach(cls, name):
+        try:
+            subscriber = cls(name)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not subscriber.is_alive():
+            subscriber.close()
+            return None
+        return subscriber
+
+    def is_alive(self):
+        try:
+            kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # The process of the other user.
+            pass
+        return True
+
+    def _read_seq(self):
+        layout = self.__layout
+        return layout.SEQ.unpack_from(self.__shm.buf, layout.SEQ_OFFSET)[0]
+
+    def _read_count(self):
+        layout = self.__layout
+        return layout.COUNT.unpack_from(self.__shm.buf, layout.COUNT_OFFSET)[0]
+
+    # Return the list of (count, timestamp, frame) in the order of time. The
+    # count is the serial number of frame since the publisher starts. Raise
+    # ProcessLookupError when the publisher is gone during update, and
+    # TimeoutError when the update is not finished in the retries.
+    def read_frames(self, count=1):
+        for i in range(self.__RETRIES):
+            seq = self._read_seq()
+            if seq & 1:
+                if not self.is_alive():
+                    raise ProcessLookupError('Meter publisher is gone')
+                sleep(0.001)
+                continue
+            latest = self._read_count()
+            frames = []
+            for serial in range(max(latest - min(count, self.depth), 0),
+                                latest):
+                pos = serial % self.depth
+                begin = pos * self.channels
+                frame = array('d', self.__frames[begin:begin + self.channels])
+                frames.append((serial + 1, self.__timestamps[pos], frame))
+            if self._read_seq() == seq:
+                return frames
+        raise TimeoutError('Meter publisher does not finish update')
+
+    def read_latest(self):
+        frames = self.read_frames(1)
+        if len(frames) == 0:
+            return None
+        return frames[0]
+
+    # Call the callback with new frames at the rate, in the same arguments as
+    # the callback of history. Return False when the publisher is gone or
+    # stalls.
+    def run(self, rate, callback, stop=None):
+        if stop is None:
+            stop = Event()
+        period = 1.0 / rate
+        serial = self._read_count()
+        while not stop.wait(period):
+            latest = self._read_count()
+            if latest <= serial:
+                if not self.is_alive():
+                    return False
+                continue
+            try:
+                frames = self.read_frames(latest - serial)
+            except (ProcessLookupError, TimeoutError):
+                return False
+            for count, timestamp, frame in frames:
+                if count > serial:
+                    callback(self, timestamp, frame)
+                    serial = count
+        return True
+
+    def close(self):
+        if self.__shm is not None:
+            self.__timestamps.release()
+            self.__frames.release()
+            self.__shm.close()
+            self.__shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.close()
@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from queue import Queue, Empty
+from threading import Thread
+from time import monotonic
+
+__all__ = ['NotificationEvent', 'NotificationDispatcher']
+
+
+class NotificationEvent():
+    def __init__(self, kind, value, timestamp, count=1):
+        self.kind = kind
+        self.value = value
+        self.timestamp = timestamp
+        # The number of notifications coalesced to this event.
+        self.count = count
+
+    def __repr__(self):
+        return 'NotificationEvent({0}, {1}, {2:.6f}, {3})'.format(
+            self.kind, self.value, self.timestamp, self.count)
+
+
+# Convert signals of hwdep notification into typed events. The signal handler
+# just queues the message, since it runs in the dispatcher of the unit. The
+# worker thread decodes the messages, and coalesces the burst of them within
+# the period into one event per kind, then calls handlers registered to the
+# kind. The decoder is a callable to return the list of (kind, value) for the
+# given message.
+class NotificationDispatcher():
+    def __init__(self, decoder, period=0.02):
+        if period < 0:
+            raise ValueError('Invalid argument for period of coalescing')
+        self.decoder = decoder
+        self.period = period
+        self.coalesced = 0
+        self.errors = 0
+        self.last_error = None
+        self.__queue = Queue()
+        self.__handlers = {}
+        self.__signals = []
+        self.__thread = None
+
+    def attach(self, obj, signal='notified'):
+        handler = obj.connect(signal, self._queue_message)
+        self.__signals.append((obj, handler))
+
+    def detach(self):
+        for obj, handler in self.__signals:
+            obj.disconnect(handler)
+        self.__signals = []
+
+    def _queue_message(self, obj, *args):
+        message = args[0] if len(args) == 1 else args
+        self.__queue.put((monotonic(), message))
+
+    # The handler is called with the event of the kind. The handler for the
+    # kind of None is called once with the list of events in the period.
+    def register(self, kind, handler):
+        self.__handlers.setdefault(kind, []).append(handler)
+
+    def unregister(self, kind, handler):
+        self.__handlers[kind].remove(handler)
+
+    # Block till the first message arrives, then collect messages till the
+    # end of period.
+    def _collect(self):
+        msgs = [self.__queue.get()]
+        if msgs[0] is None:
+            return None
+        deadline = msgs[0][0] + self.period
+        while True:
+            timeout = deadline - monotonic()
+            try:
+                if timeout > 0:
+                    msg = self.__queue.get(timeout=timeout)
+                else:
+                    msg = self.__queue.get_nowait()
+            except Empty:
+                break
+            if msg is None:
+                # Deliver the collected messages before stopping.
+                self.__queue.put(None)
+                break
+            msgs.append(msg)
+        return msgs
+
+    # The value of the latest message is left for each kind.
+    def coalesce(self, msgs):
+        events = {}
+        for timestamp, message in msgs:
+            for kind, value in self.decoder(message):
+                if kind in events:
+                    event = events[kind]
+                    event.value = value
+                    event.timestamp = timestamp
+                    event.count += 1
+                    self.coalesced += 1
+                else:
+                    events[kind] = NotificationEvent(kind, value, timestamp)
+        return list(events.values())
+
+    def _call(self, handler, arg):
+        try:
+            handler(arg)
+        except Exception as e:
+            # A failure of handler should not stop the others.
+            self.errors += 1
+            self.last_error = e
+
+    def dispatch(self, events):
+        for event in events:
+            for handler in self.__handlers.get(event.kind, []):
+                self._call(handler, event)
+        if len(events) > 0:
+            for handler in self.__handlers.get(None, []):
+                self._call(handler, events)
+
+    def run(self):
+        while True:
+            msgs = self._collect()
+            if msgs is None:
+                break
+            self.dispatch(self.coalesce(msgs))
+
+    def start(self):
+        if self.__thread is not None:
+            raise RuntimeError('The dispatcher is already running')
+        self.__thread = Thread(target=self.run)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__thread = None
@@ -0,0 +1,222 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from bisect import bisect_right
+from random import Random
+from struct import pack
+from time import sleep
+
+from hinawa_utils.misc.transport import FwTransport
+
+__all__ = ['SimulatedConfigRom', 'SimulatedNode']
+
+
+# Build the image of configuration ROM in IEEE 1212. The entry of directory is
+# a pair of key ID and value. The value of int is immediate, the value of
+# bytes is leaf, and the value of list is directory.
+class SimulatedConfigRom():
+    @staticmethod
+    def _compute_crc(data):
+        crc = 0
+        for i in range(0, len(data), 4):
+            quadlet = int.from_bytes(data[i:i + 4], 'big')
+            for shift in range(28, -4, -4):
+                total = ((crc >> 12) ^ (quadlet >> shift)) & 0xf
+                crc = ((crc << 4) ^ (total << 12) ^ (total << 5) ^ total) & \
+                    0xffff
+        return crc
+
+    @classmethod
+    def _build_block(cls, data):
+        data = bytes(data) + b'\0' * (-len(data) % 4)
+        return pack('>HH', len(data) // 4, cls._compute_crc(data)) + data
+
+    @classmethod
+    def _build_directory(cls, entries):
+        quadlets = bytearray()
+        children = bytearray()
+        for i, (key_id, value) in enumerate(entries):
+            if isinstance(value, int):
+                type_id = 0x00
+            else:
+                # The offset in quadlet from the entry.
+                offset = len(entries) - i + len(children) // 4
+                if isinstance(value, (bytes, bytearray)):
+                    type_id = 0x02
+                    children.extend(cls._build_block(value))
+                else:
+                    type_id = 0x03
+                    children.extend(cls._build_directory(value))
+                value = offset
+            quadlets.extend(pack('>I',
+                                 (type_id << 30) | (key_id << 24) | value))
+        return cls._build_block(quadlets) + children
+
+    # The content of leaf for textual descriptor in US-ASCII.
+    @staticmethod
+    def text(literal):
+        return b'\0' * 8 + literal.encode('US-ASCII')
+
+    @classmethod
+    def build(cls, guid, entries, bus_caps=0xe0ff8112):
+        bus_info = pack('>4sIII', b'1394', bus_caps, guid >> 32,
+                        guid & 0xffffffff)
+        header = pack('>BBH', len(bus_info) // 4, len(bus_info) // 4,
+                      cls._compute_crc(bus_info))
+        return header + bus_info + cls._build_directory(entries)
+
+
+# The memory for the range without handler.
+class _MemoryRange():
+    def __init__(self, addr, data):
+        self.addr = addr
+        self.data = bytearray(data)
+
+    def read(self, addr, length):
+        pos = addr - self.addr
+        return self.data[pos:pos + length]
+
+    def write(self, addr, frames):
+        pos = addr - self.addr
+        self.data[pos:pos + len(frames)] = frames
+
+
+# A node in memory instead of the device on the bus. The address space
+# consists of ranges, each of which has handlers for read and write. The
+# handler for read is called with the address and the length, and returns
+# the content. The handler for write is called with the address and frames.
+# The handler for AV/C command is registered with opcode and optional address
+# of subunit, and returns the whole frame of response. The handler for EFW
+# command is called with the list of arguments, and returns the list of
+# parameters. Each transaction takes the latency with the jitter in uniform
+# distribution, generated by the seed for reproducibility.
+class SimulatedNode(FwTransport):
+    # ALSA firewire unit types.
+    UNIT_TYPES = {
+        'dice':         1,
+        'fireworks':    2,
+        'bebob':        3,
+        'oxfw':         4,
+        'digi00x':      5,
+        'tascam':       6,
+        'motu':         7,
+        'fireface':     8,
+    }
+
+    def __init__(self, unit_type, guid, config_rom, latency=0.0, jitter=0.0,
+                 seed=0, node_device='fw1'):
+        if unit_type not in self.UNIT_TYPES:
+            raise ValueError('Invalid argument for type of unit')
+        if latency < 0 or jitter < 0:
+            raise ValueError('Invalid argument for latency')
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.__random = Random(seed)
+        self.__props = {
+            'unit-type':    self.UNIT_TYPES[unit_type],
+            'guid':         guid,
+            'node-device':  node_device,
+            'is-locked':    False,
+        }
+        self.__config_rom = bytes(config_rom)
+        # Sorted by the start address. Each is (start, end, reader, writer).
+        self.__ranges = []
+        self.__starts = []
+        self.__avc_handlers = {}
+        self.__efw_handlers = {}
+
+    def get_property(self, name):
+        if name not in self.__props:
+            raise ValueError('Invalid argument for property: {0}'.format(name))
+        return self.__props[name]
+
+    def set_property(self, name, value):
+        self.__props[name] = value
+
+    def get_config_rom(self):
+        return self.__config_rom
+
+    def add_range(self, addr, length, reader=None, writer=None):
+        end = addr + length
+        pos = bisect_right(self.__starts, addr)
+        if pos > 0 and self.__ranges[pos - 1][1] > addr:
+            raise ValueError('Invalid argument for address of range')
+        if pos < len(self.__ranges) and self.__ranges[pos][0] < end:
+            raise ValueError('Invalid argument for address of range')
+        self.__ranges.insert(pos, (addr, end, reader, writer))
+        self.__starts.insert(pos, addr)
+
+    # Add the range backed by memory, and return the memory.
+    def add_memory(self, addr, length, data=None):
+        if data is None:
+            data = bytes(length)
+        elif len(data) != length:
+            raise ValueError('Invalid length of initial data')
+        memory = _MemoryRange(addr, data)
+        self.add_range(addr, length, memory.read, memory.write)
+        return memory.data
+
+    def remove_range(self, addr):
+        pos = self.__starts.index(addr)
+        del self.__ranges[pos]
+        del self.__starts[pos]
+
+    def add_avc_handler(self, opcode, handler, subunit=None):
+        self.__avc_handlers[(subunit, opcode)] = handler
+
+    def add_efw_handler(self, category, command, handler):
+        self.__efw_handlers[(category, command)] = handler
+
+    def _wait(self):
+        delay = self.latency
+        if self.jitter > 0:
+            delay += self.__random.uniform(0, self.jitter)
+        if delay > 0:
+            sleep(delay)
+
+    def __lookup_range(self, addr, length):
+        pos = bisect_right(self.__starts, addr) - 1
+        if pos >= 0:
+            start, end, reader, writer = self.__ranges[pos]
+            if addr + length <= end:
+                return reader, writer
+        raise OSError('Address error at 0x{0:012x}'.format(addr))
+
+    def _request(self, tcode, addr, length, frames):
+        self._wait()
+        reader, writer = self.__lookup_range(addr, length)
+        if tcode in self.READ_TCODES:
+            if reader is None:
+                raise OSError('Type error at 0x{0:012x}'.format(addr))
+            frames = reader(addr, length)
+            if len(frames) != length:
+                raise OSError('Data error at 0x{0:012x}'.format(addr))
+            return frames
+        elif tcode in self.WRITE_TCODES:
+            if writer is None:
+                raise OSError('Type error at 0x{0:012x}'.format(addr))
+            writer(addr, frames)
+            return frames
+        raise OSError('Unsupported transaction code: {0}'.format(tcode))
+
+    # The response of 'NOT IMPLEMENTED' is returned for the command without
+    # handler.
+    def _avc_request(self, cmd):
+        self._wait()
+        if len(cmd) < 3:
+            raise OSError('Invalid length of AV/C command')
+        handler = self.__avc_handlers.get((cmd[1], cmd[2]))
+        if handler is None:
+            handler = self.__avc_handlers.get((None, cmd[2]))
+        if handler is None:
+            return b'\x08' + cmd[1:]
+        return handler(cmd)
+
+    def _efw_request(self, category, command, args):
+        self._wait()
+        handler = self.__efw_handlers.get((category, command))
+        if handler is None:
+            raise OSError('Unsupported EFW command: {0}, {1}'.format(
+                category, command))
+        return handler(args)
@@ -0,0 +1,929 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from struct import pack, unpack
+
+from hinawa_utils.misc.sim_node import SimulatedConfigRom, SimulatedNode
+
+__all__ = ['SimulatedProfiles']
+
+
+# The registers of TASCAM FireWire series for clock and flags. The write to the
+# register of clock has the source in the last byte when the second byte is
+# zero, else the rate. The write to the register of flags has the bits to
+# clear and to set in the second and the third byte.
+class _TscmRegisters():
+    CLOCK = 0x0228
+    FLAGS = 0x022c
+
+    def __init__(self, base):
+        self.base = base
+        self.clock = bytearray((0x00, 0x01, 0x00, 0x01))
+        self.flags = bytearray(4)
+
+    def read(self, addr, length):
+        if addr - self.base == self.CLOCK:
+            return self.clock
+        return self.flags
+
+    def write(self, addr, frames):
+        if addr - self.base == self.CLOCK:
+            if frames[1] == 0:
+                self.clock[3] = frames[3]
+            else:
+                self.clock[1] = frames[3]
+        else:
+            self.flags[3] = (self.flags[3] & ~frames[1] | frames[2]) & 0xff
+
+
+# The registers of DICE with the extension of TCAT protocol. The write to the
+# register of clock select updates the status and notifies that the clock is
+# accepted. The command to load from router copies the entries in the section
+# of new router to the current configuration for the mode of rate. The peak
+# section is generated from the current entries of router. The extension is
+# not available without the size of mixer, for the models which use the space
+# for vendor-specific registers.
+class _DiceRegisters():
+    BASE = 0xffffe0000000
+    EXT_OFFSET = 0x00200000
+
+    CLOCK_SELECT = 0x4c
+    # The index of rate in clock select for each mode of rate.
+    RATE_MODES = ((0x00, 0x01, 0x02), (0x03, 0x04), (0x05, 0x06))
+
+    CLOCK_BITS = ('aes1', 'aes2', 'aes3', 'aes4', 'aes-any', 'adat', 'tdif',
+                  'word-clock', 'arx1', 'arx2', 'arx3', 'arx4', 'internal')
+    RATES = (32000, 44100, 48000, 88200, 96000, 176400, 192000)
+
+    STREAM_ENTRY = 280
+    EXT_STREAM_ENTRY = 268
+    MAXIMUM_ROUTES = 128
+    CURRENT_CONFIG = 0x6000
+
+    def __init__(self, clocks, rates, txs, rxs, mixer):
+        self.node = None
+        self.ext = None
+        self.__build_general(clocks, rates, txs, rxs)
+        if mixer is not None:
+            self.__build_ext(txs, rxs, mixer)
+
+    @staticmethod
+    def _build_string(labels, length):
+        letters = '\\'.join(labels).encode('US-ASCII') + b'\\\\'
+        letters += bytes(length - len(letters))
+        data = bytearray()
+        for i in range(0, length, 4):
+            data.extend(reversed(letters[i:i + 4]))
+        return data
+
+    # The pairs of offset and length of sections, following to the header.
+    @staticmethod
+    def _layout(header, lengths):
+        sections = []
+        offset = header
+        for length in lengths:
+            sections.append((offset, length))
+            offset += length
+        return sections, offset
+
+    def __build_general(self, clocks, rates, txs, rxs):
+        stream_sizes = [8 + self.STREAM_ENTRY * max(len(txs), len(rxs))] * 2
+        sections, length = self._layout(40, [0x180] + stream_sizes + [0x10])
+        self.general = bytearray(length)
+        for i, (offset, size) in enumerate(sections):
+            self.general[i * 8:i * 8 + 8] = pack('>II', offset // 4, size // 4)
+        self.global_offset = sections[0][0]
+
+        labels = ['Unused'] * len(self.CLOCK_BITS)
+        clock_flags = 0
+        for name, label in clocks:
+            index = self.CLOCK_BITS.index(name)
+            labels[index] = label
+            clock_flags |= 1 << index
+        rate_flags = 0
+        for rate in rates:
+            rate_flags |= 1 << self.RATES.index(rate)
+        rate = 48000 if 48000 in rates else rates[0]
+        internal = self.CLOCK_BITS.index('internal')
+
+        self.__write_global(self.CLOCK_SELECT,
+                            pack('>BBBB', 0, 0, self.RATES.index(rate),
+                                 internal))
+        self.__write_global(0x50, pack('>I', 0))
+        self.__write_global(0x54, pack('>BBBB', 0, 0, self.RATES.index(rate),
+                                       1))
+        self.__write_global(0x5c, pack('>I', rate))
+        self.__write_global(0x60, pack('>BBBB', 1, 0, 4, 0))
+        self.__write_global(0x64, pack('>HH', clock_flags, rate_flags))
+        self.__write_global(0x68, self._build_string(labels, 256))
+
+        for i, (streams, offset) in enumerate(((txs, sections[1][0]),
+                                               (rxs, sections[2][0]))):
+            self.general[offset:offset + 8] = \
+                pack('>II', len(streams), self.STREAM_ENTRY // 4)
+            for j, pcm in enumerate(streams):
+                names = ['Ch{0}'.format(ch + 1) for ch in range(pcm)]
+                if i == 0:
+                    params = pack('>IIII', j, pcm, 1, 2)
+                else:
+                    params = pack('>IIII', 2 + j, 0, pcm, 1)
+                pos = offset + 8 + self.STREAM_ENTRY * j
+                self.general[pos:pos + 16] = params
+                self.general[pos + 16:pos + 272] = \
+                    self._build_string(names, 256)
+
+    def __write_global(self, offset, data):
+        offset += self.global_offset
+        self.general[offset:offset + len(data)] = data
+
+    def __build_ext(self, txs, rxs, mixer):
+        outputs, inputs = mixer
+        streams = 8 + self.EXT_STREAM_ENTRY * (len(txs) + len(rxs))
+        lengths = (0x10, 0x08, 4 + outputs * inputs * 4,
+                   4 * self.MAXIMUM_ROUTES, 4 + 4 * self.MAXIMUM_ROUTES,
+                   streams, self.CURRENT_CONFIG, 0x20, 0x40)
+        sections, length = self._layout(len(lengths) * 8, lengths)
+        self.ext = bytearray(length)
+        for i, (offset, size) in enumerate(sections):
+            self.ext[i * 8:i * 8 + 8] = pack('>II', offset // 4, size // 4)
+        (self.caps, self.cmd, self.mixer, self.peak, self.new_router,
+         self.new_stream, self.current, self.standalone, _) = \
+            [offset for offset, size in sections]
+        self.peak_length = sections[3][1]
+
+        # Exposed and storable router and mixer, with storage and peak.
+        caps = pack('>HBB', self.MAXIMUM_ROUTES, 0, 0x05)
+        caps += pack('>BBBB', outputs, inputs, 0x00, 0x05)
+        caps += pack('>BBBB', 0, 0x01, 0x10 | len(rxs),
+                     0x06 | (len(txs) << 4))
+        self.ext[self.caps:self.caps + len(caps)] = caps
+
+        for i in range(len(self.RATE_MODES)):
+            offset = self.current + 0x2000 * i + 0x1000
+            for data in self.__build_stream_config(txs, rxs):
+                self.ext[offset:offset + len(data)] = data
+                offset += len(data)
+        self.ext[self.new_stream:self.new_stream + streams] = \
+            b''.join(self.__build_stream_config(txs, rxs))
+
+        internal = self.CLOCK_BITS.index('internal')
+        self.ext[self.standalone:self.standalone + 4] = pack('>I', internal)
+        self.ext[self.standalone + 0x10:self.standalone + 0x14] = \
+            pack('>I', self.general[self.global_offset + 0x4e])
+
+    def __build_stream_config(self, txs, rxs):
+        yield pack('>II', len(txs), len(rxs))
+        for pcm in txs + rxs:
+            names = ['Ch{0}'.format(ch + 1) for ch in range(pcm)]
+            yield pack('>II', pcm, 1) + self._build_string(names, 256) + \
+                bytes(4)
+
+    def __get_mode(self):
+        index = self.general[self.global_offset + self.CLOCK_SELECT + 2]
+        for mode, indexes in enumerate(self.RATE_MODES):
+            if index in indexes:
+                return mode
+        return 0
+
+    def __build_peak(self):
+        offset = self.current + 0x2000 * self.__get_mode()
+        count = unpack('>I', self.ext[offset:offset + 4])[0]
+        data = bytearray(self.peak_length)
+        for i in range(min(count, self.MAXIMUM_ROUTES)):
+            pos = offset + 4 + i * 4
+            data[i * 4:i * 4 + 4] = pack('>H', 0x0800) + \
+                self.ext[pos + 2:pos + 4]
+        return data
+
+    def read(self, addr, length):
+        offset = addr - self.BASE
+        if offset < self.EXT_OFFSET:
+            return self.general[offset:offset + length]
+        offset -= self.EXT_OFFSET
+        if offset == self.peak:
+            return self.__build_peak()[:length]
+        return self.ext[offset:offset + length]
+
+    def write(self, addr, frames):
+        offset = addr - self.BASE
+        if offset < self.EXT_OFFSET:
+            self.general[offset:offset + len(frames)] = frames
+            if offset == self.global_offset + self.CLOCK_SELECT:
+                self.__select_clock()
+            return
+        offset -= self.EXT_OFFSET
+        self.ext[offset:offset + len(frames)] = frames
+        if offset == self.cmd and frames[0] & 0x80:
+            self.__execute(frames[1], frames[3])
+
+    def __select_clock(self):
+        index = self.general[self.global_offset + self.CLOCK_SELECT + 2]
+        status = self.global_offset + 0x54
+        prev = self.__get_mode()
+        self.general[status + 2] = index
+        self.__write_global(0x5c, pack('>I', self.RATES[index]))
+        bits = 0x00000020
+        if self.__get_mode() != prev:
+            bits |= 0x00000003
+        if self.node is not None:
+            self.node.notify('notified', bits)
+
+    # The command is completed at once. The router is loaded for the mode in
+    # the command.
+    def __execute(self, mode, opcode):
+        if opcode == 0x01 and mode in (0x01, 0x02, 0x04):
+            offset = self.current + 0x2000 * (mode >> 1)
+            length = 4 + 4 * self.MAXIMUM_ROUTES
+            self.ext[offset:offset + length] = \
+                self.ext[self.new_router:self.new_router + length]
+        self.ext[self.cmd:self.cmd + 8] = bytes(8)
+
+
+# The state of Fireworks protocol. The parameters of mixer are kept for each
+# category and the arguments of channel, then the command to get returns the
+# arguments followed by the value. The layout of hardware information is the
+# same as the one parsed by EftInfo.
+class _EfwCommands():
+    # The number of arguments for channel in each category of mixer.
+    MIXER_CHANNELS = {4: 1, 5: 1, 6: 1, 8: 2}
+    # The pairs of commands to set and get in each category of mixer.
+    MIXER_COMMANDS = {
+        4: ((0, 1), (2, 3), (8, 9)),
+        5: ((8, 9), ),
+        6: ((0, 1), (2, 3), (4, 5)),
+        8: ((0, 1), (2, 3), (4, 5), (6, 7)),
+    }
+
+    def __init__(self, model_id, features, clocks, rates, outputs, inputs,
+                 mixer, rx_streams, tx_streams):
+        self.__spec = self.__build_spec(model_id, features, clocks, rates,
+                                        outputs, inputs, mixer, rx_streams,
+                                        tx_streams)
+        self.__outputs = sum(count for index, count in outputs)
+        self.__inputs = sum(count for index, count in inputs)
+        self.__clock = [0, 48000]
+        self.__box_states = 0
+        self.__mixer = {}
+        self.__ioconf = {0: [0], 2: [0], 4: [0]}
+
+        mapping = [0] * 256
+        mapping[2] = self.__outputs // 2
+        for i in range(mapping[2]):
+            mapping[4 + i] = i * 2
+        mapping[34] = self.__inputs // 2
+        for i in range(mapping[34]):
+            mapping[36 + i] = i * 2
+        self.__ioconf[6] = mapping
+
+    @staticmethod
+    def __build_spec(model_id, features, clocks, rates, outputs, inputs,
+                     mixer, rx_streams, tx_streams):
+        params = [0] * 64
+        params[0] = features
+        params[3] = model_id
+        params[21] = clocks
+        params[22], params[45], params[47] = rx_streams
+        params[23], params[46], params[48] = tx_streams
+        for pos, ports in ((26, outputs), (31, inputs)):
+            params[pos] = len(ports)
+            for i, (index, count) in enumerate(ports):
+                shift = 16 if i % 2 == 0 else 0
+                params[pos + 1 + i // 2] |= ((index << 8) | count) << shift
+        params[39], params[38] = rates
+        params[42], params[43] = mixer
+        # Version 5.8.0 for DSP, ARM and FPGA.
+        params[40] = params[41] = params[44] = 0x05080000
+        return params
+
+    def handlers(self):
+        yield 0, 0, lambda args: list(self.__spec)
+        yield 0, 1, self.__get_metering
+        yield 3, 0, self.__set_clock
+        yield 3, 1, lambda args: list(self.__clock)
+        yield 3, 3, self.__set_box_states
+        yield 3, 4, lambda args: [self.__box_states]
+        for category, pairs in self.MIXER_COMMANDS.items():
+            for set_cmd, get_cmd in pairs:
+                yield category, set_cmd, self.__build_mixer_setter(category,
+                                                                   set_cmd)
+                yield category, get_cmd, self.__build_mixer_getter(category,
+                                                                   set_cmd)
+        for cmd in self.__ioconf:
+            yield 9, cmd, self.__build_ioconf_setter(cmd)
+            yield 9, cmd + 1, self.__build_ioconf_getter(cmd)
+
+    # The flag of current clock source, followed by the levels.
+    def __get_metering(self, args):
+        params = [0] * (9 + self.__outputs + self.__inputs)
+        params[0] = 1 << self.__clock[0]
+        params[5] = self.__outputs
+        params[6] = self.__inputs
+        return params
+
+    def __set_clock(self, args):
+        self.__clock = [args[0], args[1]]
+        return []
+
+    def __set_box_states(self, args):
+        self.__box_states = (self.__box_states & ~args[1]) | args[0]
+        return []
+
+    def __build_mixer_setter(self, category, cmd):
+        channels = self.MIXER_CHANNELS[category]
+
+        def handle(args):
+            key = (category, cmd) + tuple(args[:channels])
+            self.__mixer[key] = args[channels]
+            return []
+        return handle
+
+    def __build_mixer_getter(self, category, cmd):
+        channels = self.MIXER_CHANNELS[category]
+
+        def handle(args):
+            key = (category, cmd) + tuple(args[:channels])
+            return list(args[:channels]) + [self.__mixer.get(key, 0)]
+        return handle
+
+    def __build_ioconf_setter(self, cmd):
+        def handle(args):
+            self.__ioconf[cmd] = list(args)
+            return []
+        return handle
+
+    def __build_ioconf_getter(self, cmd):
+        return lambda args: list(self.__ioconf[cmd])
+
+
+# The state of AV/C commands. The frame of control command is kept, then
+# returned for the status command of which the operands are the same except
+# for the placeholders of 0xff. The rate of sampling is shared by the signal
+# formats of all plugs and the formats of streams. The list of stream formats
+# is served for both of the extended stream format information command and
+# the BridgeCo extension.
+class _AvcCommands():
+    CONTROL = 0x00
+    STATUS = 0x01
+    INQUIRY = 0x02
+
+    NOT_IMPLEMENTED = 0x08
+    ACCEPTED = 0x09
+    REJECTED = 0x0a
+    STABLE = 0x0c
+
+    # The index of rate for the signal format of plug.
+    RATES = (32000, 44100, 48000, 88200, 96000, 176400, 192000)
+    # The code of rate in the format of stream.
+    STREAM_RATES = (22050, 24000, 32000, 44100, 48000, 96000, 176400, 192000,
+                    0, 0, 88200)
+
+    STORED_OPCODES = (0x00, 0xb8)
+
+    def __init__(self, company_id, subunits, plugs, rates, formations,
+                 sources, plug_types=None, fill=0x00, seeds=()):
+        self.company_id = company_id
+        self.subunits = subunits
+        self.plugs = plugs
+        self.rates = rates
+        self.formations = formations
+        self.plug_types = plug_types or {}
+        self.fill = fill
+        self.__rate = 48000 if 48000 in rates else rates[0]
+        # The source of signal keyed by the destination.
+        self.__sources = dict(sources)
+        self.__frames = {}
+        for frame in seeds:
+            self.__store(frame)
+
+    def handlers(self):
+        yield 0x30, self.__handle_unit_info
+        yield 0x31, self.__handle_subunit_info
+        yield 0x02, self.__handle_plug_info
+        yield 0x18, self.__handle_signal_format
+        yield 0x19, self.__handle_signal_format
+        yield 0x1a, self.__handle_signal_source
+        yield 0xbf, self.__handle_stream_format
+        yield 0x2f, self.__handle_stream_format
+        for opcode in self.STORED_OPCODES:
+            yield opcode, self.__handle_stored
+
+    @staticmethod
+    def __respond(code, frame):
+        return bytes([code]) + bytes(frame)
+
+    def __handle_unit_info(self, cmd):
+        # The unit type is 'unit' and the unit ID is 7.
+        return self.__respond(self.STABLE, cmd[1:4] + bytes([0xff]) +
+                              bytes(self.company_id))
+
+    def __handle_subunit_info(self, cmd):
+        if cmd[3] >> 4 > 0:
+            return self.__respond(self.REJECTED, cmd[1:])
+        codes = list(self.subunits) + [0xff] * (4 - len(self.subunits))
+        return self.__respond(self.STABLE, cmd[1:4] + bytes(codes))
+
+    # The plugs are keyed by the address of unit or subunit. The extension by
+    # BridgeCo is available just for the type of plug in subunit, keyed by
+    # the address of subunit and the direction.
+    def __handle_plug_info(self, cmd):
+        if cmd[3] == 0x00 and cmd[1] in self.plugs:
+            return self.__respond(self.STABLE,
+                                  cmd[1:4] + bytes(self.plugs[cmd[1]]))
+        if cmd[3] == 0xc0 and len(cmd) > 10 and cmd[5] == 0x01 and \
+                cmd[9] == 0x00:
+            types = self.plug_types.get((cmd[1], cmd[4]), ())
+            if cmd[6] < len(types):
+                return self.__respond(self.STABLE, cmd[1:10] +
+                                      bytes([types[cmd[6]], 0xff]))
+        return self.__respond(self.NOT_IMPLEMENTED, cmd[1:])
+
+    # The output plug is addressed by the opcode 0x18, and the input plug by
+    # 0x19.
+    def __handle_signal_format(self, cmd):
+        direction = ('output', 'input')[cmd[2] & 0x01]
+        if direction not in self.formations:
+            return self.__respond(self.REJECTED, cmd[1:])
+        if cmd[0] == self.STATUS:
+            index = self.RATES.index(self.__rate)
+            return self.__respond(self.STABLE, cmd[1:4] +
+                                  bytes([0x90, index, 0xff, 0xff]))
+        if cmd[5] >= len(self.RATES) or self.RATES[cmd[5]] not in self.rates:
+            return self.__respond(self.REJECTED, cmd[1:])
+        if cmd[0] == self.CONTROL:
+            self.__rate = self.RATES[cmd[5]]
+            return self.__respond(self.ACCEPTED, cmd[1:])
+        return self.__respond(self.STABLE, cmd[1:])
+
+    def __handle_signal_source(self, cmd):
+        dst = bytes(cmd[6:8])
+        if cmd[0] == self.CONTROL:
+            self.__sources[dst] = bytes(cmd[4:6])
+            return self.__respond(self.ACCEPTED, cmd[1:])
+        if cmd[0] == self.STATUS and dst in self.__sources:
+            return self.__respond(self.STABLE, cmd[1:4] +
+                                  self.__sources[dst] + dst)
+        return self.__respond(self.NOT_IMPLEMENTED, cmd[1:])
+
+    def __build_format(self, rate, formation):
+        data = bytearray((0x90, 0x40, self.STREAM_RATES.index(rate), 0x02,
+                          len(formation)))
+        for count, code in formation:
+            data.extend((count, code))
+        return data
+
+    # The direction and the number of plug are in the same position for both
+    # commands. The single subfunction is just for the extended stream format
+    # information command.
+    def __handle_stream_format(self, cmd):
+        direction = ('input', 'output')[cmd[4] & 0x01]
+        if direction not in self.formations or cmd[7] > 0:
+            return self.__respond(self.NOT_IMPLEMENTED, cmd[1:])
+        formation = self.formations[direction]
+        if cmd[3] == 0xc1 and len(cmd) > 10:
+            rates = [rate for rate in self.STREAM_RATES if rate in self.rates]
+            if cmd[10] >= len(rates):
+                return self.__respond(self.REJECTED, cmd[1:])
+            return self.__respond(self.STABLE, cmd[1:11] +
+                                  self.__build_format(rates[cmd[10]],
+                                                      formation))
+        if cmd[2] == 0xbf and cmd[3] == 0xc0:
+            if cmd[0] == self.STATUS:
+                return self.__respond(self.STABLE, cmd[1:10] +
+                                      self.__build_format(self.__rate,
+                                                          formation))
+            if cmd[0] == self.CONTROL and len(cmd) > 12:
+                rate = self.STREAM_RATES[cmd[12]]
+                if rate not in self.rates:
+                    return self.__respond(self.REJECTED, cmd[1:])
+                self.__rate = rate
+                return self.__respond(self.ACCEPTED, cmd[1:])
+        return self.__respond(self.NOT_IMPLEMENTED, cmd[1:])
+
+    # The frames of control are stored per opcode, then the status is
+    # answered by the newest frame of which the bytes match except for 0xff
+    # in the status. The seeds are for the command of which the response is
+    # longer than the request.
+    def __store(self, frame):
+        frames = self.__frames.setdefault(frame[1], [])
+        frame = bytes(frame)
+        if frame in frames:
+            frames.remove(frame)
+        frames.append(frame)
+
+    # The initial value of vendor-dependent command is model-specific, while
+    # zero for function block, except for the mute control of feature which
+    # expresses 'off' by 0x60.
+    def __build_default(self, frame):
+        fill = self.fill if frame[1] == 0x00 else 0x00
+        data = bytearray(frame[:2])
+        data.extend(fill if b == 0xff else b for b in frame[2:])
+        if frame[1] == 0xb8 and frame[2] == 0x81 and frame[7] == 0x01:
+            data[-1] = 0x60
+        return data
+
+    def __lookup(self, frame, wildcard):
+        for stored in reversed(self.__frames.get(frame[1], [])):
+            if len(stored) >= len(frame) and \
+                    all(a == b or (wildcard and b == 0xff)
+                        for a, b in zip(stored, frame)):
+                return stored
+        return None
+
+    def __handle_stored(self, cmd):
+        frame = cmd[1:]
+        if cmd[0] == self.CONTROL:
+            stored = self.__lookup(frame, False)
+            if stored is not None and len(stored) > len(frame):
+                return self.__respond(self.ACCEPTED, stored)
+            self.__store(frame)
+            return self.__respond(self.ACCEPTED, frame)
+        if cmd[0] != self.STATUS:
+            return self.__respond(self.NOT_IMPLEMENTED, frame)
+        stored = self.__lookup(frame, True)
+        if stored is not None:
+            return self.__respond(self.STABLE, stored)
+        return self.__respond(self.STABLE, self.__build_default(frame))
+
+
+# The simulated nodes for models whose registers can be served by memory, or
+# whose commands of AV/C and EFW can be served by the state of protocol, with
+# the layout of configuration ROM expected by each parser. The names are the
+# same as the files of command list in test directory.
+class SimulatedProfiles():
+    __TEXT = SimulatedConfigRom.text
+
+    __DG00X_BASE = 0xffffe0000000
+    __TSCM_BASE = 0xffff00000000
+
+    @classmethod
+    def __dg00x_entries(cls, model_id, model_name):
+        return [
+            (0x0c, 0x0083c0),
+            (0x04, 0x000001),
+            (0x03, 0x00a07e),
+            (0x01, cls.__TEXT('Digidesign')),
+            (0x11, [
+                (0x12, 0x00a07e),
+                (0x13, 0x000001),
+                (0x17, model_id),
+                (0x01, cls.__TEXT(model_name)),
+            ]),
+        ]
+
+    @classmethod
+    def __tscm_entries(cls, guid, version, model_name):
+        return [
+            (0x03, 0x00022e),
+            (0x0c, 0x0083c0),
+            (0x0d, guid.to_bytes(8, 'big')),
+            (0x11, [
+                (0x12, 0x00022e),
+                (0x13, version),
+                (0x14, [
+                    (0x01, cls.__TEXT('TASCAM')),
+                    (0x02, bytes(8) + model_name.encode('US-ASCII')),
+                ]),
+            ]),
+        ]
+
+    # The layout expected by EfwConfigRomParser. The vendor is Echo Digital
+    # Audio Corporation always, and the manufacturer is in vendor-dependent
+    # entry.
+    @classmethod
+    def __efw_entries(cls, guid, vendor_name, model_id, model_name,
+                      manufacturer):
+        return [
+            (0x03, 0x001486),
+            (0x01, cls.__TEXT(vendor_name)),
+            (0x17, model_id),
+            (0x01, cls.__TEXT(model_name)),
+            (0x0c, 0x0083c0),
+            (0x0d, guid.to_bytes(8, 'big')),
+            (0x11, [
+                (0x12, 0x00a02d),
+                (0x13, 0x010000),
+                (0x17, model_id),
+                (0x01, cls.__TEXT(model_name)),
+            ]),
+            (0x08, manufacturer),
+        ]
+
+    # The layout recommended by 1394TA, expected by Ta1394ConfigRomParser.
+    # The specifier is for AV/C devices unless given.
+    @classmethod
+    def __ta1394_entries(cls, guid, vendor_id, vendor_name, model_id,
+                         model_name, spec_id=0x00a02d, version=0x010001):
+        return [
+            (0x03, vendor_id),
+            (0x01, cls.__TEXT(vendor_name)),
+            (0x17, model_id),
+            (0x01, cls.__TEXT(model_name)),
+            (0x0c, 0x0083c0),
+            (0x11, [
+                (0x12, spec_id),
+                (0x13, version),
+                (0x17, model_id),
+                (0x01, cls.__TEXT(model_name)),
+            ]),
+            (0x0d, guid.to_bytes(8, 'big')),
+        ]
+
+    # The layout expected by FFConfigRomParser.
+    @classmethod
+    def __ff_entries(cls, guid, model_id):
+        return [
+            (0x03, 0x000a35),
+            (0x0c, 0x0083c0),
+            (0x0d, guid.to_bytes(8, 'big')),
+            (0x11, [
+                (0x12, 0x000a35),
+                (0x13, model_id),
+                (0x17, 0x101800),
+            ]),
+        ]
+
+    # The layout expected by BebobConfigRomParser, with the hardware version
+    # at first.
+    @classmethod
+    def __bebob_entries(cls, guid, vendor_id, vendor_name, model_id,
+                        model_name):
+        return [
+            (0x04, 0x000001),
+            (0x0c, 0x0083c0),
+            (0x03, vendor_id),
+            (0x01, cls.__TEXT(vendor_name)),
+            (0x17, model_id),
+            (0x01, cls.__TEXT(model_name)),
+            (0x0d, guid.to_bytes(8, 'big')),
+            (0x11, [
+                (0x12, 0x00a02d),
+                (0x13, 0x010001),
+                (0x17, model_id),
+                (0x01, cls.__TEXT(model_name)),
+            ]),
+        ]
+
+    # The registers of OXFW970/971 for the type of ASIC and the version of
+    # firmware, and for the identifier of ASIC.
+    __OXFW_RANGES = (
+        (0xfffff0050000, 4, bytes((0x97, 0x00, 0x01, 0x06))),
+        (0xfffff0090020, 4, b'FW97'),
+    )
+
+    # The register of BeBoB for the information of firmware.
+    __BEBOB_RANGES = (
+        (0xffffc8020000, 104, None),
+    )
+
+    # The source of clock is the plug of music subunit at first.
+    __MAUDIO_CLOCK = {b'\x60\x01': b'\x60\x01'}
+
+    # Name: (unit type, GUID, arguments for entries, ranges of memory). For
+    # Fireworks, the ranges are replaced with the arguments for the state of
+    # protocol; model ID, flags of features and clock sources, the range of
+    # rates, the groups of physical outputs and inputs, the number of
+    # playback and capture channels in mixer, and the number of PCM channels
+    # in rx/tx streams at each mode of rate. For AV/C devices, the arguments
+    # for the state of AV/C commands follow the ranges; the company ID, the
+    # codes of subunits, the numbers of plugs, the supported rates, the stream
+    # formations of input and output plugs, the connections of signal, the
+    # types of plugs in subunit, and the initial value for vendor-dependent
+    # commands. For DICE, the arguments for the registers follow the ranges;
+    # the clock sources, the rates, the number of PCM channels in tx/rx
+    # streams and the size of mixer. The arguments for entries include the
+    # specifier of TCAT.
+    __PROFILES = {
+        'griffin-firewave': (
+            'oxfw', 0x001292fe00fa01,
+            (0x001292, 'Griffin', 0x00f970, 'FireWave'),
+            (__OXFW_RANGES,
+             ((0x00, 0x12, 0x92), (0x08, ), {}, (32000, 44100, 48000, 96000),
+              {'input': ((6, 0x06), )}, {})),
+        ),
+        'tascam-fireone': (
+            'oxfw', 0x00022e00f1e001,
+            (0x00022e, 'TASCAM', 0x800007, 'FireOne'),
+            (__OXFW_RANGES,
+             ((0x00, 0x02, 0x2e), (0x08, 0x60), {},
+              (44100, 48000, 88200, 96000),
+              {'input': ((2, 0x06), ), 'output': ((2, 0x06), )}, {})),
+        ),
+        'apogee-duet-firewire': (
+            'oxfw', 0x0003db01dde701,
+            (0x0003db, 'Apogee Electronics', 0x01dddd, 'Duet'),
+            (__OXFW_RANGES + ((0xfffff0080004, 8, None),
+                              (0xfffff0080404, 16, None)),
+             ((0x00, 0x03, 0xdb), (0x08, 0x60), {},
+              (44100, 48000, 88200, 96000),
+              {'input': ((2, 0x06), ), 'output': ((2, 0x06), )}, {}, None,
+              0x60, (b'\xff\x00\x00\x03\xdbPCM\x07' + bytes(12), ))),
+        ),
+        'echo-audiofire2': (
+            'fireworks', 0x0014860af2a001,
+            ('Echo Digital Audio', 0x000af2, 'AudioFire2', 0x001486),
+            (0x000af2, 0x00a5, 0x0b, (32000, 96000),
+             ((0, 2), (5, 2), (1, 2)), ((0, 2), (1, 2)), (6, 4),
+             (6, 6, 0), (4, 4, 0)),
+        ),
+        'echo-audiofire4': (
+            'fireworks', 0x0014860af4a001,
+            ('Echo Digital Audio', 0x000af4, 'AudioFire4', 0x001486),
+            (0x000af4, 0x00a5, 0x0b, (32000, 96000),
+             ((0, 4), (1, 2)), ((0, 4), (1, 2)), (6, 6),
+             (6, 6, 0), (6, 6, 0)),
+        ),
+        'echo-audiofirepre8': (
+            'fireworks', 0x0014860af9a001,
+            ('Echo Digital Audio', 0x000af9, 'AudioFirePre8',
+             0x001486),
+            (0x000af9, 0x0435, 0x1f, (32000, 96000),
+             ((0, 8), (2, 8)), ((0, 8), (2, 8)), (16, 16),
+             (16, 16, 0), (16, 12, 0)),
+        ),
+        'mackie-onyx400f': (
+            'fireworks', 0x001486400fa001,
+            ('Mackie', 0x00400f, 'Onyx 400F', 0x000ff2),
+            (0x00400f, 0x0033, 0x0f, (32000, 192000),
+             ((0, 8), (1, 2)), ((0, 8), (1, 2)), (10, 10),
+             (10, 10, 4), (10, 10, 4)),
+        ),
+        'maudio-solo': (
+            'bebob', 0x000d6c01006201,
+            (0x000d6c, 'M-Audio', 0x010062, 'FireWire Solo'),
+            (__BEBOB_RANGES + ((0xffc700600000, 52, None), ),
+             ((0x00, 0x0d, 0x6c), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000),
+              {'input': ((4, 0x06), ), 'output': ((4, 0x06), )},
+              __MAUDIO_CLOCK)),
+        ),
+        'maudio-audiophile': (
+            'bebob', 0x000d6c01006001,
+            (0x000d6c, 'M-Audio', 0x010060, 'FireWire Audiophile'),
+            (__BEBOB_RANGES + ((0xffc700600000, 60, None), ),
+             ((0x00, 0x0d, 0x6c), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000),
+              {'input': ((6, 0x06), ), 'output': ((4, 0x06), )},
+              __MAUDIO_CLOCK)),
+        ),
+        'maudio-fw410': (
+            'bebob', 0x0007f501004601,
+            (0x0007f5, 'M-Audio', 0x010046, 'FireWire 410'),
+            (__BEBOB_RANGES + ((0xffc700600000, 76, None), ),
+             ((0x00, 0x0d, 0x6c), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000, 176400, 192000),
+              {'input': ((10, 0x06), ), 'output': ((4, 0x06), )},
+              __MAUDIO_CLOCK)),
+        ),
+        'maudio-fw1814': (
+            'bebob', 0x000d6c01007101,
+            (0x000d6c, 'M-Audio', 0x010071, 'FireWire 1814'),
+            (__BEBOB_RANGES + ((0xffc700600000, 84, None),
+                               (0xffc700700000, 160, None)),
+             ((0x00, 0x0d, 0x6c), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000),
+              {'input': ((4, 0x06), ), 'output': ((18, 0x06), )},
+              __MAUDIO_CLOCK)),
+        ),
+        'yamaha-go44_terratec-phase24': (
+            'bebob', 0x00a0de1000b001,
+            (0x00a0de, 'YAMAHA', 0x10000b, 'GO44'),
+            (__BEBOB_RANGES,
+             ((0x00, 0xa0, 0xde), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000, 192000),
+              {'input': ((4, 0x06), ), 'output': ((4, 0x06), )}, {})),
+        ),
+        'yamaha-go46_terratec-phasex24': (
+            'bebob', 0x00a0de1000c001,
+            (0x00a0de, 'YAMAHA', 0x10000c, 'GO46'),
+            (__BEBOB_RANGES,
+             ((0x00, 0xa0, 0xde), (0x08, 0x60), {},
+              (32000, 44100, 48000, 88200, 96000, 192000),
+              {'input': ((6, 0x06), ), 'output': ((4, 0x06), )}, {})),
+        ),
+        'apogee-ensemble': (
+            'bebob', 0x0003db01eeee01,
+            (0x0003db, 'Apogee Electronics', 0x01eeee, 'Ensemble'),
+            (__BEBOB_RANGES,
+             ((0x00, 0x03, 0xdb), (0x08, 0x60), {0x60: (6, 6, 0, 0)},
+              (44100, 48000, 88200, 96000, 176400, 192000),
+              {'input': ((18, 0x06), ), 'output': ((18, 0x06), )},
+              {b'\x60\x05': b'\x60\x05'},
+              {(0x60, 0): (0, 0, 0, 0, 0, 3), (0x60, 1): (0, 0, 0, 0, 0, 3)},
+              0x00, (b'\xff\x00\x00\x03\xdb\xff\x01' + bytes(15), ))),
+        ),
+        'focusrite-saffirepro-26': (
+            'dice', 0x00130e04000012,
+            (0x00130e, 'Focusrite', 0x000012, 'Saffire Pro 26',
+             0x00166e, 0x000001),
+            ((),
+             ((('aes1', 'S/PDIF-coax'), ('aes2', 'S/PDIF-opt'),
+               ('adat', 'ADAT'), ('internal', 'Internal')),
+              (44100, 48000, 88200, 96000), [10, 8], [8], (16, 18))),
+        ),
+        'maudio-profire-610': (
+            'dice', 0x000d6c00000011,
+            (0x000d6c, 'M-Audio', 0x000011, 'ProFire 610',
+             0x00166e, 0x000001),
+            ((),
+             ((('aes1', 'S/PDIF'), ('internal', 'Internal')),
+              (32000, 44100, 48000, 88200, 96000, 176400, 192000), [6], [10],
+              (16, 18))),
+        ),
+        'presonus-firestudio-mobile': (
+            'dice', 0x000a9200000011,
+            (0x000a92, 'PreSonus', 0x000011, 'FireStudio Mobile',
+             0x00166e, 0x000001),
+            ((),
+             ((('aes1', 'S/PDIF'), ('internal', 'Internal')),
+              (32000, 44100, 48000, 88200, 96000), [10], [6], (16, 18))),
+        ),
+        'alesis-io14': (
+            'dice', 0x00059500000001,
+            (0x000595, 'Alesis', 0x000001, 'iO|14', 0x00166e, 0x000001),
+            (((_DiceRegisters.BASE + _DiceRegisters.EXT_OFFSET, 0x580), ),
+             ((('aes1', 'S/PDIF'), ('adat', 'ADAT'),
+               ('internal', 'Internal')),
+              (32000, 44100, 48000, 88200, 96000), [6, 8], [6, 8], None)),
+        ),
+        'rme-fireface800': (
+            'fireface', 0x000a3501000001,
+            (0x000001, ),
+            ((0x0000fc88f014, 12), (0x000080080000, 0x1c00),
+             (0x000080081f80, 0x70), (0x0000801c0000, 8)),
+        ),
+        'digidesign-digi002-rack': (
+            'digi00x', 0x00a07e00000002,
+            (0x000002, 'Digi 002 Rack'),
+            ((__DG00X_BASE, 0x400), ),
+        ),
+        'digidesign-digi003-rack': (
+            'digi00x', 0x00a07e00000003,
+            (0x000003, 'Digi 003 Rack'),
+            ((__DG00X_BASE, 0x400), ),
+        ),
+        'tascam-fw1082': (
+            'tascam', 0x00022e00001082,
+            (0x800003, 'FW-1082'),
+            ((__TSCM_BASE, 0x228), (__TSCM_BASE + 0x230, 0x5d0)),
+        ),
+        'tascam-fw1804': (
+            'tascam', 0x00022e00001804,
+            (0x800004, 'FW-1804'),
+            ((__TSCM_BASE, 0x228), (__TSCM_BASE + 0x230, 0x5d0)),
+        ),
+        'tascam-fw1884': (
+            'tascam', 0x00022e00001884,
+            (0x800000, 'FW-1884'),
+            ((__TSCM_BASE, 0x228), (__TSCM_BASE + 0x230, 0x5d0)),
+        ),
+    }
+
+    @classmethod
+    def get_names(cls):
+        return tuple(cls.__PROFILES.keys())
+
+    @classmethod
+    def create(cls, name, latency=0.0, jitter=0.0, seed=0):
+        if name not in cls.__PROFILES:
+            raise ValueError('Invalid argument for name of profile')
+        unit_type, guid, args, ranges = cls.__PROFILES[name]
+        if unit_type == 'fireworks':
+            entries = cls.__efw_entries(guid, *args)
+        elif unit_type in ('oxfw', 'dice'):
+            entries = cls.__ta1394_entries(guid, *args)
+        elif unit_type == 'bebob':
+            entries = cls.__bebob_entries(guid, *args)
+        elif unit_type == 'digi00x':
+            entries = cls.__dg00x_entries(*args)
+        elif unit_type == 'fireface':
+            entries = cls.__ff_entries(guid, *args)
+        else:
+            entries = cls.__tscm_entries(guid, *args)
+        rom = SimulatedConfigRom.build(guid, entries)
+        node = SimulatedNode(unit_type, guid, rom, latency, jitter, seed)
+        if unit_type == 'fireworks':
+            commands = _EfwCommands(*ranges)
+            for category, command, handler in commands.handlers():
+                node.add_efw_handler(category, command, handler)
+            return node
+        if unit_type in ('dice', 'oxfw', 'bebob'):
+            ranges, args = ranges
+        if unit_type == 'dice':
+            regs = _DiceRegisters(*args)
+            regs.node = node
+            node.add_range(regs.BASE, len(regs.general), regs.read,
+                           regs.write)
+            if regs.ext is not None:
+                node.add_range(regs.BASE + regs.EXT_OFFSET, len(regs.ext),
+                               regs.read, regs.write)
+        if unit_type in ('oxfw', 'bebob'):
+            commands = _AvcCommands(*args)
+            for opcode, handler in commands.handlers():
+                node.add_avc_handler(opcode, handler)
+        for rng in ranges:
+            node.add_memory(*rng)
+        if unit_type == 'tascam':
+            regs = _TscmRegisters(cls.__TSCM_BASE)
+            node.add_range(cls.__TSCM_BASE + regs.CLOCK, 8, regs.read,
+                           regs.write)
+        return node
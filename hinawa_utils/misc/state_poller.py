@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from threading import Event, Thread
+
+__all__ = ['StatePoller']
+
+
+# Poll raw responses from the unit, and parse them only when they differ from
+# the previous ones. The period of polling is doubled after the given count of
+# polls without change, up to the maximum, and back to the minimum at change.
+class StatePoller():
+    def __init__(self, min_period=0.05, max_period=1.0, idle_polls=10):
+        if min_period <= 0 or max_period < min_period:
+            raise ValueError('Invalid argument for period of polling')
+        if idle_polls < 1:
+            raise ValueError('Invalid argument for count of idle polls')
+        self.min_period = min_period
+        self.max_period = max_period
+        self.idle_polls = idle_polls
+        self.period = min_period
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_error = None
+        self.__entries = {}
+        self.__callbacks = []
+        self.__idle = 0
+        self.__stop = Event()
+        self.__thread = None
+
+    # The reader returns bytes-like object, and the parser converts it to the
+    # state.
+    def add(self, name, reader, parser):
+        if name in self.__entries:
+            raise ValueError('Invalid argument for name of state')
+        # The list of reader, parser, raw bytes, and parsed state.
+        self.__entries[name] = [reader, parser, None, None]
+
+    def remove(self, name):
+        del self.__entries[name]
+
+    def get_state(self, name):
+        return self.__entries[name][3]
+
+    # The callback is called with the name, the current state and the previous
+    # state. The previous state is None at first.
+    def subscribe(self, callback):
+        self.__callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.__callbacks.remove(callback)
+
+    def poll(self):
+        changed = False
+        self.polls += 1
+        for name, entry in list(self.__entries.items()):
+            reader, parser, raw, state = entry
+            try:
+                data = bytes(reader())
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                continue
+            if data == raw:
+                continue
+            entry[2] = data
+            entry[3] = parser(data)
+            changed = True
+            self.changes += 1
+            for callback in self.__callbacks:
+                callback(name, entry[3], state)
+
+        if changed:
+            self.__idle = 0
+            self.period = self.min_period
+        else:
+            self.__idle += 1
+            if self.__idle >= self.idle_polls:
+                self.__idle = 0
+                self.period = min(self.period * 2, self.max_period)
+        return changed
+
+    # The stop is cleared by start() before the thread starts, thus stop()
+    # just after start() is not lost.
+    def run(self):
+        while True:
+            self.poll()
+            if self.__stop.wait(self.period):
+                break
+
+    def start(self):
+        if self.__thread is not None:
+            raise RuntimeError('The poller is already running')
+        self.__stop.clear()
+        self.__thread = Thread(target=self.run)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
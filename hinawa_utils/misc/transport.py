@@ -0,0 +1,502 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+import sys
+import signal
+from abc import ABCMeta, abstractmethod
+from threading import Event, Lock, Thread
+from time import monotonic
+from types import ModuleType
+from weakref import WeakMethod
+
+from hinawa_utils.misc.gi_repository import GiNamespace
+
+__all__ = ['FwTransport', 'HinawaTransport', 'TransportBackend']
+
+
+# The interface between units and a node on the bus, for the backends which
+# do not use the character devices of Linux FireWire subsystem and ALSA. The
+# subclass implements the methods with prefix of underscore. These methods
+# raise OSError at failure. The public methods count transactions, bytes in
+# both directions, and the time till the response.
+class FwTransport(metaclass=ABCMeta):
+    READ_TCODES = (4, 5)
+    WRITE_TCODES = (0, 1)
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.__listeners = []
+        self.__lock = Lock()
+
+    # The properties of unit are: 'unit-type', 'guid', 'node-device' and
+    # 'is-locked'.
+    @abstractmethod
+    def get_property(self, name):
+        pass
+
+    @abstractmethod
+    def get_config_rom(self):
+        pass
+
+    @abstractmethod
+    def _request(self, tcode, addr, length, frames):
+        pass
+
+    @abstractmethod
+    def _avc_request(self, cmd):
+        pass
+
+    @abstractmethod
+    def _efw_request(self, category, command, args):
+        pass
+
+    def __count(self, begin, size):
+        with self.__lock:
+            self.transactions += 1
+            self.bytes += size
+            self.elapsed += monotonic() - begin
+
+    # Return the content of response for read request, or the given frames
+    # for write request.
+    def request(self, tcode, addr, length, frames):
+        begin = monotonic()
+        if tcode in self.WRITE_TCODES:
+            frames = bytes(frames[:length])
+        resp = bytes(self._request(tcode, addr, length, frames))
+        self.__count(begin, length)
+        return resp
+
+    # Return the whole frame of AV/C response.
+    def avc_request(self, cmd):
+        begin = monotonic()
+        cmd = bytes(cmd)
+        resp = bytes(self._avc_request(cmd))
+        self.__count(begin, len(cmd) + len(resp))
+        return resp
+
+    # Return the list of parameters in response, as quadlet.
+    def efw_request(self, category, command, args):
+        begin = monotonic()
+        args = [] if args is None else list(args)
+        params = list(self._efw_request(category, command, args))
+        self.__count(begin, 4 * (len(args) + len(params)))
+        return params
+
+    # The listener is a bound method called with the name of signal and its
+    # arguments, for notification from the node to units. The reference to
+    # the listener is weak so that the unit can be released.
+    def add_listener(self, listener):
+        self.__listeners.append(WeakMethod(listener))
+
+    def remove_listener(self, listener):
+        self.__listeners.remove(WeakMethod(listener))
+
+    def notify(self, name, *args):
+        for ref in list(self.__listeners):
+            listener = ref()
+            if listener is None:
+                self.__listeners.remove(ref)
+            else:
+                listener(name, *args)
+
+
+# The transport over the character devices of Linux FireWire subsystem and
+# ALSA, to record the session with the actual unit. The namespace of gi is
+# imported at instantiation, thus the backend can be installed after it.
+class HinawaTransport(FwTransport):
+    # The class of Hitaki and the signal of notification for each unit type.
+    __UNIT_CLASSES = {
+        1:  ('SndDice',     'notified'),
+        2:  ('SndEfw',      None),
+        3:  ('SndUnit',     None),
+        4:  ('SndUnit',     None),
+        5:  ('SndDigi00x',  'message'),
+        6:  ('SndTascam',   'changed'),
+        7:  ('SndMotu',     'notified'),
+        8:  ('SndUnit',     None),
+    }
+
+    def __init__(self, path):
+        super().__init__()
+
+        import gi
+        gi.require_version('GLib', '2.0')
+        gi.require_version('Hinawa', '4.0')
+        gi.require_version('Hitaki', '0.0')
+        from gi.repository import GLib, Hinawa, Hitaki
+        self.__error = GLib.Error
+
+        probe = Hitaki.SndUnit()
+        probe.open(path, 0)
+        unit_type = probe.get_property('unit-type')
+        del probe
+        if unit_type not in self.__UNIT_CLASSES:
+            raise ValueError('The character device is not for known unit')
+        name, signal = self.__UNIT_CLASSES[unit_type]
+
+        self.__unit = getattr(Hitaki, name)()
+        self.__unit.open(path, 0)
+        fw_node_path = '/dev/{}'.format(self.__unit.get_property('node-device'))
+        self.__node = Hinawa.FwNode.new()
+        self.__node.open(fw_node_path, 0)
+
+        self.__dispatchers = []
+        self.__threads = []
+        for obj in (self.__unit, self.__node):
+            ctx = GLib.MainContext.new()
+            _, src = obj.create_source()
+            src.attach(ctx)
+            dispatcher = GLib.MainLoop.new(ctx, False)
+            th = Thread(target=lambda d: d.run(), args=(dispatcher, ))
+            th.start()
+            self.__dispatchers.append(dispatcher)
+            self.__threads.append(th)
+
+        self.__req = Hinawa.FwReq.new()
+        self.__fcp = Hinawa.FwFcp()
+        self.__fcp.bind(self.__node)
+
+        if signal is not None:
+            self.__unit.connect(signal, self.__forward, signal)
+        self.__node.connect('bus-update', self.__forward, 'bus-update')
+
+    def release(self):
+        self.__fcp.unbind()
+        for dispatcher in self.__dispatchers:
+            dispatcher.quit()
+        for th in self.__threads:
+            th.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.release()
+
+    def __forward(self, obj, *args):
+        self.notify(args[-1], *args[:-1])
+
+    def get_property(self, name):
+        return self.__unit.get_property(name)
+
+    def get_config_rom(self):
+        _, image = self.__node.get_config_rom()
+        return bytes(image)
+
+    def _request(self, tcode, addr, length, frames):
+        if tcode in self.READ_TCODES:
+            frames = bytearray(length)
+        try:
+            _, frames = self.__req.transaction(self.__node, tcode, addr,
+                                               length, frames, 100)
+        except self.__error as e:
+            raise OSError(e.message)
+        return frames
+
+    def _avc_request(self, cmd):
+        try:
+            _, resp = self.__fcp.avc_transaction(cmd, [0] * 256, 100)
+        except self.__error as e:
+            raise OSError(e.message)
+        return resp
+
+    def _efw_request(self, category, command, args):
+        try:
+            _, params = self.__unit.transaction(category, command, args,
+                                                [0] * 256, 100)
+        except self.__error as e:
+            raise OSError(e.message)
+        return params
+
+
+# The subset of GObject for the emulated classes.
+class _Object():
+    def __init__(self):
+        self.__handlers = {}
+        self.__handler_id = 0
+
+    def connect(self, name, callback, *data):
+        self.__handler_id += 1
+        self.__handlers[self.__handler_id] = (name, callback, data)
+        return self.__handler_id
+
+    def disconnect(self, handler_id):
+        del self.__handlers[handler_id]
+
+    def emit(self, name, *args):
+        for signal_name, callback, data in list(self.__handlers.values()):
+            if signal_name == name:
+                callback(self, *args, *data)
+
+
+class _Error(Exception):
+    pass
+
+
+class _MainContext():
+    @classmethod
+    def new(cls):
+        return cls()
+
+
+class _MainLoop():
+    def __init__(self, ctx=None, is_running=False):
+        self.__quit = Event()
+
+    @classmethod
+    def new(cls, ctx, is_running):
+        return cls(ctx, is_running)
+
+    def run(self):
+        self.__quit.wait()
+
+    def quit(self):
+        self.__quit.set()
+
+    def is_running(self):
+        return not self.__quit.is_set()
+
+
+class _Source():
+    def attach(self, ctx):
+        return 1
+
+
+def _unix_signal_add(priority, signum, handler, *data):
+    signal.signal(signum, lambda signum, frame: handler(*data))
+    return signum
+
+
+class _FwTcode():
+    WRITE_QUADLET_REQUEST = 0
+    WRITE_BLOCK_REQUEST = 1
+    READ_QUADLET_REQUEST = 4
+    READ_BLOCK_REQUEST = 5
+    LOCK_REQUEST = 9
+
+
+# The emulated classes which the backend instantiates, to resolve the path of
+# character device to transport.
+class _FwNode(_Object):
+    _backend = None
+
+    def __init__(self):
+        super().__init__()
+        self.transport = None
+
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def open(self, path, flags):
+        self.transport = self._backend.lookup(path)
+        self.transport.add_listener(self.emit)
+        return True
+
+    def get_config_rom(self):
+        return True, self.transport.get_config_rom()
+
+    def create_source(self):
+        return True, _Source()
+
+    def get_property(self, name):
+        if name == 'generation':
+            return 0
+        raise ValueError('Invalid argument for property: {0}'.format(name))
+
+
+class _FwReq(_Object):
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def transaction(self, node, tcode, addr, length, frames, timeout_ms):
+        try:
+            frames = node.transport.request(tcode, addr, length, frames)
+        except OSError as e:
+            raise _Error(str(e))
+        return True, frames
+
+
+class _FwFcp(_Object):
+    def __init__(self):
+        super().__init__()
+        self.__node = None
+
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def bind(self, node):
+        self.__node = node
+        return True
+
+    def unbind(self):
+        self.__node = None
+
+    def avc_transaction(self, cmd, resp, timeout_ms):
+        try:
+            resp = self.__node.transport.avc_request(cmd)
+        except OSError as e:
+            raise _Error(str(e))
+        return True, resp
+
+
+class _SndUnit(_Object):
+    _backend = None
+
+    def __init__(self):
+        super().__init__()
+        self.transport = None
+
+    def open(self, path, flags):
+        self.transport = self._backend.lookup(path)
+        self.transport.add_listener(self.emit)
+        return True
+
+    def create_source(self):
+        return True, _Source()
+
+    def get_property(self, name):
+        return self.transport.get_property(name)
+
+    def lock(self):
+        return True
+
+    def unlock(self):
+        return True
+
+
+class _SndEfw(_SndUnit):
+    def transaction(self, category, command, args, params, timeout_ms):
+        try:
+            params = self.transport.efw_request(category, command, args)
+        except OSError as e:
+            raise _Error(str(e))
+        return True, params
+
+
+class _SndDice(_SndUnit):
+    # The quadlets are written to the address, then the node is expected to
+    # notify the bit flag.
+    def transaction(self, addr, frames, bit_flag, timeout_ms=100):
+        data = bytearray()
+        for frame in frames:
+            data.extend(frame.to_bytes(4, 'big'))
+        if len(data) == 4:
+            tcode = _FwTcode.WRITE_QUADLET_REQUEST
+        else:
+            tcode = _FwTcode.WRITE_BLOCK_REQUEST
+        try:
+            self.transport.request(tcode, addr, len(data), data)
+        except OSError as e:
+            raise _Error(str(e))
+        return True
+
+
+class _SndMotu(_SndUnit):
+    pass
+
+
+class _SndDigi00x(_SndUnit):
+    pass
+
+
+class _SndTascam(_SndUnit):
+    pass
+
+
+# Provide the namespace of gi.repository for GLib, Hinawa and Hitaki, which
+# the unit classes are constructed against. The transport is registered with
+# the number of sound card, and resolved by the path of ALSA hwdep device or
+# FireWire character device. Install it before importing the modules of unit,
+# since they refer to the namespace at import.
+class TransportBackend():
+    def __init__(self):
+        self.__transports = {}
+
+    # The transport is resolved by the path of ALSA hwdep device for the card
+    # and by the path of FireWire character device for its node.
+    def add(self, card_id, transport):
+        paths = ('/dev/snd/hwC{0}D0'.format(card_id),
+                 '/dev/{0}'.format(transport.get_property('node-device')))
+        for path in paths:
+            if path in self.__transports:
+                raise ValueError('Invalid argument for card number')
+        for path in paths:
+            self.__transports[path] = transport
+        return paths[0]
+
+    def remove(self, transport):
+        for path, entry in list(self.__transports.items()):
+            if entry is transport:
+                del self.__transports[path]
+
+    def lookup(self, path):
+        if path not in self.__transports:
+            raise _Error('No such device: {0}'.format(path))
+        return self.__transports[path]
+
+    @staticmethod
+    def __build_namespace():
+        glib = ModuleType('gi.repository.GLib')
+        glib.Error = _Error
+        glib.MainContext = _MainContext
+        glib.MainLoop = _MainLoop
+        glib.PRIORITY_HIGH = -100
+        glib.unix_signal_add = _unix_signal_add
+
+        hinawa = ModuleType('gi.repository.Hinawa')
+        hinawa.FwTcode = _FwTcode
+        hinawa.FwNode = _FwNode
+        hinawa.FwReq = _FwReq
+        hinawa.FwFcp = _FwFcp
+
+        hitaki = ModuleType('gi.repository.Hitaki')
+        hitaki.SndUnit = _SndUnit
+        hitaki.SndEfw = _SndEfw
+        hitaki.SndDice = _SndDice
+        hitaki.SndMotu = _SndMotu
+        hitaki.SndDigi00x = _SndDigi00x
+        hitaki.SndTascam = _SndTascam
+
+        repository = ModuleType('gi.repository')
+        for module in (glib, hinawa, hitaki):
+            module._transport_backend = True
+            setattr(repository, module.__name__.split('.')[-1], module)
+        repository._transport_backend = True
+
+        gi = ModuleType('gi')
+        gi.require_version = lambda namespace, version: None
+        gi.repository = repository
+
+        return gi, repository, glib, hinawa, hitaki
+
+    # The namespace is built once in the process. The installation at second
+    # time just switches the backend to which the emulated classes refer.
+    def install(self):
+        # The modules which already refer to the namespace of gi can not use
+        # the emulated classes. The namespace not resolved yet can.
+        for name, module in list(sys.modules.items()):
+            if not name.startswith('hinawa_utils.'):
+                continue
+            for attr in ('GLib', 'Hinawa', 'Hitaki'):
+                namespace = getattr(module, attr, None)
+                if isinstance(namespace, GiNamespace):
+                    namespace = namespace.get_loaded()
+                if namespace is not None and \
+                        not getattr(namespace, '_transport_backend', False):
+                    raise RuntimeError(
+                        'The namespace of gi is already imported by {0}'.format(
+                            name))
+
+        _FwNode._backend = self
+        _SndUnit._backend = self
+
+        repository = sys.modules.get('gi.repository')
+        if repository is None or \
+                not getattr(repository, '_transport_backend', False):
+            for module in self.__build_namespace():
+                sys.modules[module.__name__] = module
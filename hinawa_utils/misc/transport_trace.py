@@ -0,0 +1,250 @@
+# SPDX-License-Identifier: LGPL-3.0-or-later
+# Copyright (C) 2018 Takashi Sakamoto
+
+from collections import deque
+from json import dumps, loads
+from struct import Struct
+from threading import Event, Lock
+from time import monotonic, sleep
+
+from hinawa_utils.misc.transport import FwTransport
+
+__all__ = ['RecordingTransport', 'ReplayTransport']
+
+
+# The layout of trace file:
+#  - file header, then properties of unit in JSON and image of config ROM
+#  - records, each of which has header, then payloads of request and response
+# The record has the kind, the transaction code, the flag of failure, the
+# address, the length of request, the time since the beginning, and the
+# latency. For EFW, the address is the category and the command. The payload
+# of EFW is quadlets in big endian, and the response of failed transaction is
+# the message of error. The request of notification is the name and the
+# arguments of signal in JSON. The values in header are in little endian.
+class _TraceLayout():
+    MAGIC = b'HNTR'
+    VERSION = 1
+    HEADER = Struct('<4sHxxII')
+    RECORD = Struct('<BBBxQIIIdd')
+    KINDS = ('request', 'avc', 'efw', 'notification')
+    PROPERTIES = ('unit-type', 'guid', 'node-device')
+
+    @staticmethod
+    def encode_quadlets(quadlets):
+        return Struct('>{0}I'.format(len(quadlets))).pack(*quadlets)
+
+    @staticmethod
+    def decode_quadlets(data):
+        return list(Struct('>{0}I'.format(len(data) // 4)).unpack(data))
+
+    @classmethod
+    def get_kind(cls, name):
+        return cls.KINDS.index(name)
+
+
+# Pass transactions to the given transport, and log each of them with the
+# response and the latency. Notifications from the transport are logged, then
+# forwarded to units.
+class RecordingTransport(FwTransport):
+    def __init__(self, transport, path):
+        super().__init__()
+        self.transport = transport
+        self.records = 0
+        self.__lock = Lock()
+        self.__begin = monotonic()
+
+        props = {name: transport.get_property(name)
+                 for name in _TraceLayout.PROPERTIES}
+        literal = dumps(props).encode('utf-8')
+        image = bytes(transport.get_config_rom())
+        self.__file = open(path, 'wb')
+        self.__file.write(_TraceLayout.HEADER.pack(
+            _TraceLayout.MAGIC, _TraceLayout.VERSION, len(literal),
+            len(image)))
+        self.__file.write(literal)
+        self.__file.write(image)
+
+        transport.add_listener(self._record_notification)
+
+    def close(self):
+        if self.__file is not None:
+            self.transport.remove_listener(self._record_notification)
+            with self.__lock:
+                self.__file.close()
+                self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ex_type, ex_value, trace):
+        self.close()
+
+    def get_property(self, name):
+        return self.transport.get_property(name)
+
+    def get_config_rom(self):
+        return self.transport.get_config_rom()
+
+    def __write(self, kind, tcode, failed, addr, length, req, resp, begin):
+        now = monotonic()
+        header = _TraceLayout.RECORD.pack(
+            _TraceLayout.get_kind(kind), tcode, failed, addr, length,
+            len(req), len(resp), begin - self.__begin, now - begin)
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__file.write(header)
+            self.__file.write(req)
+            self.__file.write(resp)
+            self.records += 1
+
+    # Call the transaction, then log the response, or the message of error.
+    def __call(self, kind, tcode, addr, length, req, transaction, encode):
+        begin = monotonic()
+        try:
+            resp = transaction()
+        except OSError as e:
+            self.__write(kind, tcode, True, addr, length, req,
+                         str(e).encode('utf-8'), begin)
+            raise
+        self.__write(kind, tcode, False, addr, length, req, encode(resp),
+                     begin)
+        return resp
+
+    def _request(self, tcode, addr, length, frames):
+        req = bytes(frames) if tcode in self.WRITE_TCODES else b''
+        return self.__call('request', tcode, addr, length, req,
+                           lambda: self.transport.request(tcode, addr, length,
+                                                          frames),
+                           bytes)
+
+    def _avc_request(self, cmd):
+        return self.__call('avc', 0, 0, len(cmd), cmd,
+                           lambda: self.transport.avc_request(cmd), bytes)
+
+    def _efw_request(self, category, command, args):
+        return self.__call('efw', 0, (category << 32) | command, len(args),
+                           _TraceLayout.encode_quadlets(args),
+                           lambda: self.transport.efw_request(category,
+                                                              command, args),
+                           _TraceLayout.encode_quadlets)
+
+    def _record_notification(self, name, *args):
+        literal = dumps([name, list(args)]).encode('utf-8')
+        self.__write('notification', 0, False, 0, 0, literal, b'',
+                     monotonic())
+        self.notify(name, *args)
+
+
+# Serve responses from the trace written by RecordingTransport. The request is
+# matched with the kind, the transaction code, the address, the length, and
+# the payload of request. The responses for the same request are served in
+# the recorded order, then the last one is served repeatedly. When timed, each
+# response is delayed by its recorded latency.
+class ReplayTransport(FwTransport):
+    def __init__(self, path, timed=False):
+        super().__init__()
+        self.timed = timed
+        self.misses = 0
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        layout = _TraceLayout
+        magic, version, props_length, rom_length = \
+            layout.HEADER.unpack_from(data, 0)
+        if magic != layout.MAGIC or version != layout.VERSION:
+            raise ValueError('Invalid content of file for trace')
+        offset = layout.HEADER.size
+        self.__props = loads(data[offset:offset + props_length].decode('utf-8'))
+        self.__props['is-locked'] = False
+        offset += props_length
+        self.__config_rom = data[offset:offset + rom_length]
+        offset += rom_length
+
+        # The list of (key, failed, response, latency) in recorded order.
+        self.__records = []
+        # The list of (timestamp, name, arguments).
+        self.__notifications = []
+        while offset + layout.RECORD.size <= len(data):
+            kind, tcode, failed, addr, length, req_length, resp_length, \
+                timestamp, latency = layout.RECORD.unpack_from(data, offset)
+            offset += layout.RECORD.size
+            # The last record can be truncated by abort of recorder.
+            if offset + req_length + resp_length > len(data):
+                break
+            req = data[offset:offset + req_length]
+            offset += req_length
+            resp = data[offset:offset + resp_length]
+            offset += resp_length
+
+            if layout.KINDS[kind] == 'notification':
+                name, args = loads(req.decode('utf-8'))
+                self.__notifications.append((timestamp, name, args))
+            else:
+                key = (kind, tcode, addr, length, req)
+                self.__records.append((key, bool(failed), resp, latency))
+        self.rewind()
+
+    def __len__(self):
+        return len(self.__records)
+
+    # Serve the responses from the beginning again.
+    def rewind(self):
+        self.__responses = {}
+        for key, failed, resp, latency in self.__records:
+            self.__responses.setdefault(key, deque()).append(
+                                                    (failed, resp, latency))
+
+    def get_property(self, name):
+        if name not in self.__props:
+            raise ValueError('Invalid argument for property: {0}'.format(name))
+        return self.__props[name]
+
+    def get_config_rom(self):
+        return self.__config_rom
+
+    def __serve(self, kind, tcode, addr, length, req):
+        key = (_TraceLayout.get_kind(kind), tcode, addr, length, bytes(req))
+        responses = self.__responses.get(key)
+        if responses is None:
+            self.misses += 1
+            raise OSError('No response in trace for {0} at 0x{1:012x}'.format(
+                kind, addr))
+        if len(responses) > 1:
+            failed, resp, latency = responses.popleft()
+        else:
+            failed, resp, latency = responses[0]
+        if self.timed:
+            sleep(latency)
+        if failed:
+            raise OSError(resp.decode('utf-8'))
+        return resp
+
+    def _request(self, tcode, addr, length, frames):
+        req = bytes(frames) if tcode in self.WRITE_TCODES else b''
+        return self.__serve('request', tcode, addr, length, req)
+
+    def _avc_request(self, cmd):
+        return self.__serve('avc', 0, 0, len(cmd), cmd)
+
+    def _efw_request(self, category, command, args):
+        resp = self.__serve('efw', 0, (category << 32) | command, len(args),
+                            _TraceLayout.encode_quadlets(args))
+        return _TraceLayout.decode_quadlets(resp)
+
+    # Emit the recorded notifications to units. When timed, they are emitted
+    # at the recorded intervals till the stop event is set.
+    def play_notifications(self, stop=None):
+        if stop is None:
+            stop = Event()
+        count = 0
+        prev = None
+        for timestamp, name, args in self.__notifications:
+            if self.timed and prev is not None:
+                if stop.wait(timestamp - prev):
+                    break
+            prev = timestamp
+            self.notify(name, *args)
+            count += 1
+        return count
@@ -3,9 +3,7 @@
 
 from abc import ABCMeta, abstractmethod
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 __all__ = ['MotuProtocolAbstract']
 
@@ -3,11 +3,9 @@
 
 from threading import Thread
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
+
+from hinawa_utils.misc.notification import NotificationDispatcher
 
 from hinawa_utils.motu.motu_protocol_v1 import MotuProtocolV1
 from hinawa_utils.motu.motu_protocol_v2 import MotuProtocolV2
@@ -28,6 +26,13 @@ class MotuUnit(Hitaki.SndMotu):
         0x000033: ('AudioExpress', MotuProtocolV3),
     }
 
+    # The bits in the message of notification. The others are delivered as
+    # the kind of 'message'.
+    NOTIFICATION_BITS = {
+        0x40000000: 'port-change',
+        0x01000000: 'footswitch',
+    }
+
     def __init__(self, path):
         super().__init__()
         self.open(path, 0)
@@ -62,7 +67,14 @@ class MotuUnit(Hitaki.SndMotu):
         else:
             raise OSError('Unsupported model')
 
+        self.__notification_dispatcher = NotificationDispatcher(
+                                                    self.parse_notification)
+        self.__notification_dispatcher.attach(self)
+        self.__notification_dispatcher.start()
+
     def release(self):
+        self.__notification_dispatcher.detach()
+        self.__notification_dispatcher.stop()
         self.__unit_dispatcher.quit()
         self.__node_dispatcher.quit()
         self.__unit_th.join()
@@ -77,6 +89,26 @@ class MotuUnit(Hitaki.SndMotu):
     def get_node(self):
         return self.__node
 
+    @classmethod
+    def parse_notification(cls, message):
+        kinds = []
+        for bit, kind in cls.NOTIFICATION_BITS.items():
+            if message & bit:
+                kinds.append((kind, True))
+                message &= ~bit
+        if message:
+            kinds.append(('message', message))
+        return kinds
+
+    # The handler is called with NotificationEvent in the thread of dispatcher,
+    # once for a burst of notifications. The handler for the kind of None is
+    # called with the list of events.
+    def register_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.register(kind, handler)
+
+    def unregister_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.unregister(kind, handler)
+
     def get_sampling_rates(self):
         return self._protocol.get_supported_sampling_rates()
 
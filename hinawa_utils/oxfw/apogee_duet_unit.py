@@ -1,6 +1,8 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2019 Takashi Sakamoto
 
+from hinawa_utils.misc.state_poller import StatePoller
+
 from hinawa_utils.oxfw.oxfw_unit import OxfwUnit
 
 from hinawa_utils.oxfw.apogee_protocol import (
@@ -171,3 +173,16 @@ class ApogeeDuetUnit(OxfwUnit):
     #
     def get_knob_states(self):
         return KnobCmd.get_states(self.fcp)
+
+    #
+    # Poller of states, which parses responses only when they change.
+    #
+    def create_state_poller(self, min_period=0.05, max_period=1.0):
+        poller = StatePoller(min_period, max_period)
+        poller.add('knob', lambda: KnobCmd.read_states(self.fcp),
+                   KnobCmd.parse_states)
+        poller.add('input-meters', lambda: InputCmd.read_meters(self),
+                   InputCmd.parse_meters)
+        poller.add('mixer-meters', lambda: MixerCmd.read_meters(self),
+                   MixerCmd.parse_meters)
+        return poller
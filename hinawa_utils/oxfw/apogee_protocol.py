@@ -1,12 +1,12 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2019 Takashi Sakamoto
 
+from __future__ import annotations
+
 from enum import Enum
 from struct import pack, unpack
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from hinawa_utils.misc.gi_repository import Hinawa
 
 from hinawa_utils.ta1394.general import AvcGeneral
 
@@ -254,6 +254,10 @@ class InputCmd():
 
     @classmethod
     def set_gain(cls, fcp: Hinawa.FwFcp, target: str, db: float):
+        if target not in cls.__TARGETS:
+            raise ValueError('Invalid argument for input.')
+        if db < 0 or db > 75:
+            raise ValueError('Invalid argument for gain of input.')
         args = bytearray(3)
         args[0] = 0x80
         args[1] = cls.__TARGETS[target]
@@ -271,12 +275,20 @@ class InputCmd():
         return float(resp[2] * 75 / 0x4f)
 
     @classmethod
-    def get_meters(cls, unit: Hinawa.FwNode):
+    def read_meters(cls, unit: Hinawa.FwNode):
         req = Hinawa.FwReq.new()
         frames = bytearray(8)
         _, frames = req.transaction(unit.get_node(),
                                     Hinawa.FwTcode.READ_BLOCK_REQUEST,
                                     cls.__ADDR_IN_METERS, 8, frames, 100)
+        return frames
+
+    @classmethod
+    def get_meters(cls, unit: Hinawa.FwNode):
+        return cls.parse_meters(cls.read_meters(unit))
+
+    @classmethod
+    def parse_meters(cls, frames):
         vals = unpack('>2I', frames)
         meters = {
             'analog-1': vals[0],
@@ -419,12 +431,20 @@ class MixerCmd():
         return float(48 * val / 0x3fff - 48)
 
     @classmethod
-    def get_meters(cls, unit: Hinawa.FwNode):
+    def read_meters(cls, unit: Hinawa.FwNode):
         req = Hinawa.FwReq.new()
         frames = bytearray(16)
         _, frames = req.transaction(unit.get_node(),
                                     Hinawa.FwTcode.READ_BLOCK_REQUEST,
                                     cls.__ADDR_SRC_LEVELS, 16, frames, 100)
+        return frames
+
+    @classmethod
+    def get_meters(cls, unit: Hinawa.FwNode):
+        return cls.parse_meters(cls.read_meters(unit))
+
+    @classmethod
+    def parse_meters(cls, frames):
         vals = unpack('>4I', frames)
         meters = {
             'stream-1': vals[0],
@@ -520,11 +540,16 @@ class KnobCmd():
         'IN-2': (0x02, 7),
     }
 
+    @classmethod
+    def read_states(cls, fcp: Hinawa.FwFcp):
+        return ApogeeProtocol.command_get(fcp, VendorCmd.HW_STATUS, None)
+
     @classmethod
     def get_states(cls, fcp: Hinawa.FwFcp):
-        args = bytearray()
-        args.append(VendorCmd.HW_STATUS.value)
-        resp = ApogeeProtocol.command_get(fcp, VendorCmd.HW_STATUS, None)
+        return cls.parse_states(cls.read_states(fcp))
+
+    @classmethod
+    def parse_states(cls, resp):
         states = {}
         for label, params in cls.__KNOBS.items():
             selected, val_pos = params
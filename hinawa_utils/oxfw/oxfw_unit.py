@@ -1,24 +1,25 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
+from copy import deepcopy
 from threading import Thread
 from struct import unpack
 from time import sleep
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
 
 from hinawa_utils.ta1394.config_rom_parser import Ta1394ConfigRomParser
-from hinawa_utils.ta1394.general import AvcConnection
+from hinawa_utils.ta1394.general import AvcConnection, AvcResponseCache
 from hinawa_utils.ta1394.streamformat import AvcStreamFormatInfo
 
 __all__ = ['OxfwUnit']
 
 
 class OxfwUnit(Hitaki.SndUnit):
+    # Capabilities of stream are static for the combination of vendor, model
+    # and firmware, thus probed just once in the process.
+    __probed_capabilities = {}
+
     def __init__(self, path):
         super().__init__()
         self.open(path, 0)
@@ -50,12 +51,15 @@ class OxfwUnit(Hitaki.SndUnit):
 
         self.fcp = Hinawa.FwFcp()
         _ = self.fcp.bind(self.get_node())
+        self.__bus_handler = AvcResponseCache.watch_bus_reset(self.get_node(),
+                                                              self.fcp)
 
         self.hw_info = self._parse_hardware_info()
-        self.supported_sampling_rates = self._parse_supported_sampling_rates()
-        self.supported_stream_formats = self._parse_supported_stream_formats()
+        self._probe_capabilities()
 
     def release(self):
+        self.get_node().disconnect(self.__bus_handler)
+        AvcResponseCache.invalidate(self.fcp)
         self.fcp.unbind()
         self.__unit_dispatcher.quit()
         self.__node_dispatcher.quit()
@@ -92,47 +96,80 @@ class OxfwUnit(Hitaki.SndUnit):
 
         return hw_info
 
-    def _parse_supported_sampling_rates(self):
-        sampling_rates = {}
-        playback = []
-        capture = []
-        # Assume that PCM playback is available for all of models.
-        for rate in AvcConnection.SAMPLING_RATES:
-            if AvcConnection.ask_plug_signal_format(self.fcp, 'input', 0, rate):
-                playback.append(rate)
-        sleep(0.02)
-        # PCM capture is not always available depending on models.
+    def _probe_capabilities(self):
+        key = (self.vendor_name, self.model_name,
+               self.hw_info['firmware-version'])
+        if key not in OxfwUnit.__probed_capabilities:
+            playback = AvcStreamFormatInfo.get_formats(self.fcp, 'input', 0)
+            capture = AvcStreamFormatInfo.get_formats(self.fcp, 'output', 0)
+            rates = self._parse_supported_sampling_rates(playback, capture)
+            caps = {
+                'sampling-rates':   rates,
+                'playback-only':    self._playback_only,
+            }
+            caps['stream-formats'] = \
+                self._parse_supported_stream_formats(playback, capture, rates)
+            caps['assumed'] = self._assumed
+            OxfwUnit.__probed_capabilities[key] = caps
+
+        # The cached containers are not shared with instances.
+        caps = OxfwUnit.__probed_capabilities[key]
+        self.supported_sampling_rates = dict(caps['sampling-rates'])
+        self.supported_stream_formats = deepcopy(caps['stream-formats'])
+        self._playback_only = caps['playback-only']
+        self._assumed = caps['assumed']
+
+    def _ask_supported_sampling_rates(self, direction):
+        rates = []
         for rate in AvcConnection.SAMPLING_RATES:
-            if AvcConnection.ask_plug_signal_format(self.fcp, 'output', 0, rate):
-                capture.append(rate)
+            if AvcConnection.ask_plug_signal_format(self.fcp, direction, 0,
+                                                    rate):
+                rates.append(rate)
+        return rates
+
+    # The rates in the list of stream formats are available as is. Inquiries
+    # are just for the direction of which the unit doesn't support the list.
+    def _parse_supported_sampling_rates(self, playback_fmts, capture_fmts):
+        sampling_rates = {}
+        if len(playback_fmts) > 0:
+            playback = [fmt['sampling-rate'] for fmt in playback_fmts]
+        else:
+            # Assume that PCM playback is available for all of models.
+            playback = self._ask_supported_sampling_rates('input')
+        if len(capture_fmts) > 0:
+            capture = [fmt['sampling-rate'] for fmt in capture_fmts]
+        else:
+            if len(playback_fmts) == 0:
+                sleep(0.02)
+            # PCM capture is not always available depending on models.
+            capture = self._ask_supported_sampling_rates('output')
         self._playback_only = (len(capture) == 0)
         for rate in AvcConnection.SAMPLING_RATES:
             if rate in playback or rate in capture:
                 sampling_rates[rate] = True
         return sampling_rates
 
-    def _parse_supported_stream_formats(self):
+    def _parse_supported_stream_formats(self, playback_fmts, capture_fmts,
+                                        rates):
         supported_stream_formats = {}
-        supported_stream_formats['playback'] = \
-            AvcStreamFormatInfo.get_formats(self.fcp, 'input', 0)
+        supported_stream_formats['playback'] = playback_fmts
         if len(supported_stream_formats['playback']) == 0:
             supported_stream_formats['playback'] = \
-                self._assume_supported_stram_formats('input', 0)
+                self._assume_supported_stram_formats('input', 0, rates)
             self._assumed = True
         else:
             self._assumed = False
         if not self._playback_only:
-            supported_stream_formats['capture'] = \
-                AvcStreamFormatInfo.get_formats(self.fcp, 'output', 0)
+            supported_stream_formats['capture'] = capture_fmts
             if len(supported_stream_formats['capture']) == 0:
                 supported_stream_formats['capture'] = \
-                    self._assume_supported_stram_formats('output', 0)
+                    self._assume_supported_stram_formats('output', 0, rates)
         return supported_stream_formats
 
-    def _assume_supported_stram_formats(self, direction, plug):
+    def _assume_supported_stram_formats(self, direction, plug, rates):
         assumed_stream_formats = []
         fmt = AvcStreamFormatInfo.get_format(self.fcp, 'input', 0)
-        for rate, state in self.supported_sampling_rates.items():
+        for rate, state in rates.items():
             if state:
                 assumed = {
                     'sampling-rate':    rate,
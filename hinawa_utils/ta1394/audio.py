@@ -1,7 +1,7 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-from struct import unpack, pack
+from hinawa_utils.misc.gain import AvcGain
 
 from hinawa_utils.ta1394.general import AvcGeneral
 
@@ -23,6 +23,13 @@ class AvcAudio():
         'delta':        0x19,
     }
 
+    FEATURE_CONTROLS = {
+        # name:         (control selector, the length of control data)
+        'mute':         (0x01, 1),
+        'volume':       (0x02, 2),
+        'lr-balance':   (0x03, 2),
+    }
+
     @classmethod
     def set_selector_state(cls, fcp, subunit_id, attr, fb_id, value):
         if subunit_id > 0x07:
@@ -231,6 +238,67 @@ class AvcAudio():
         data = params[10:12]
         return data
 
+    # The targets are a series of (function block ID, channel number, control
+    # name). The returned dictionary has the same tuple as key and the same
+    # value as the getter for each control. The controls which the unit
+    # doesn't implement are omitted and added to the given set of unsupported
+    # ones, then skipped in later calls with the set.
+    @classmethod
+    def get_feature_states(cls, fcp, subunit_id, attr, targets,
+                           unsupported=None):
+        if subunit_id > 0x07:
+            raise ValueError('Invalid argument for subunit ID')
+        if attr not in cls.ATTRIBUTES:
+            raise ValueError('Invalid argument for attribute')
+        args = bytearray(12)
+        args[0] = 0x01
+        args[1] = 0x08 | (subunit_id & 0x07)
+        args[2] = 0xb8
+        args[3] = 0x81  # Feature function block
+        args[5] = cls.ATTRIBUTE_VALUES[attr]
+        args[6] = 0x02  # Selector length is 2
+        states = {}
+        for target in targets:
+            fb_id, ch, ctl = target
+            if target in states:
+                continue
+            if unsupported is not None and target in unsupported:
+                continue
+            if fb_id > 255:
+                raise ValueError('Invalid argument for function block ID')
+            if ch > 255:
+                raise ValueError('Invalid argument for channel number')
+            if ctl not in cls.FEATURE_CONTROLS:
+                raise ValueError('Invalid argument for control')
+            selector, length = cls.FEATURE_CONTROLS[ctl]
+            # Mute control has no attribute except for 'current'.
+            if ctl == 'mute' and attr != 'current':
+                raise ValueError('Invalid argument for attribute')
+            del args[10:]
+            args[4] = fb_id
+            args[7] = ch
+            args[8] = selector
+            args[9] = length
+            args.extend([0xff] * length)
+            try:
+                params = AvcGeneral.command_status(fcp, args)
+            except OSError as e:
+                if str(e) != 'Not implemented':
+                    raise
+                if unsupported is not None:
+                    unsupported.add(target)
+                continue
+            if ctl == 'mute':
+                if params[10] == 0x70:
+                    states[target] = True
+                elif params[10] == 0x60:
+                    states[target] = False
+                else:
+                    raise OSError('Unexpected value in response')
+            else:
+                states[target] = params[10:10 + length]
+        return states
+
     @classmethod
     def set_processing_mixer_state(cls, fcp, subunit_id, attr, fb_id, in_fb,
                                    in_ch, out_ch, data):
@@ -369,18 +437,8 @@ class AvcAudio():
     # in this method, they're used to represent minimum/maximum value.
     @classmethod
     def parse_data_to_db(cls, data):
-        if data[0] == 0x80 and data[1] == 0x00:
-            return -128.0
-        elif data[0] == 0x7f and data[1] == 0xff:
-            return 128.0
-        else:
-            return unpack('>h', data)[0] * 128 / 0x7fff
+        return AvcGain.parse_data_to_db(data)
 
     @classmethod
     def build_data_from_db(cls, db):
-        if db == 128.0:
-            return (0x7f, 0xff)
-        elif db == -128.0:
-            return (0x80, 0x00)
-        else:
-            return pack('>h', int(0x7fff * db / 128))
+        return AvcGain.build_data_from_db(db)
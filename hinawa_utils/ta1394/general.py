@@ -1,11 +1,84 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
-import gi
-gi.require_version('Hinawa', '4.0')
-from gi.repository import Hinawa
+from time import monotonic
 
-__all__ = ['AvcGeneral', 'AvcConnection']
+from hinawa_utils.misc.gi_repository import Hinawa
+
+__all__ = ['AvcResponseCache', 'AvcGeneral', 'AvcConnection']
+
+
+# Cache of responses to STATUS commands which return static data. The entry
+# is keyed by the bytes of command frame, and invalidated by bus reset.
+class AvcResponseCache():
+    # (opcode, the first operand or None): lifetime in seconds, or None for
+    # the data which is immutable till bus reset.
+    LIFETIMES = {
+        (0x30, None):   None,   # UNIT INFO
+        (0x31, None):   None,   # SUBUNIT INFO
+        (0x02, None):   None,   # PLUG INFO
+        (0xbf, 0xc1):   None,   # Extended stream format information, LIST
+        (0x2f, 0xc1):   None,   # BridgeCo stream format support, LIST
+    }
+
+    # Responses with these codes are cacheable.
+    __STABLE_CODES = (0x08, 0x0a, 0x0c)
+
+    # The information types of BridgeCo extended plug info which depend on
+    # current signal connection.
+    __BCO_DYNAMIC_INFO_TYPES = (0x05, 0x06)
+
+    __entries = {}
+
+    @classmethod
+    def _get_lifetime(cls, cmd):
+        if len(cmd) < 4 or cmd[0] != 0x01:
+            return False
+        opcode = cmd[2]
+        if opcode == 0x02 and cmd[3] == 0xc0:
+            if len(cmd) < 10 or cmd[9] in cls.__BCO_DYNAMIC_INFO_TYPES:
+                return False
+        if (opcode, cmd[3]) in cls.LIFETIMES:
+            return cls.LIFETIMES[(opcode, cmd[3])]
+        if (opcode, None) in cls.LIFETIMES:
+            return cls.LIFETIMES[(opcode, None)]
+        return False
+
+    @classmethod
+    def lookup(cls, fcp, cmd):
+        entries = cls.__entries.get(fcp)
+        if entries is None:
+            return None
+        entry = entries.get(bytes(cmd))
+        if entry is None:
+            return None
+        expiration, frame = entry
+        if expiration is not None and expiration < monotonic():
+            return None
+        return frame
+
+    @classmethod
+    def store(cls, fcp, cmd, frame):
+        lifetime = cls._get_lifetime(cmd)
+        if lifetime is False or frame[0] not in cls.__STABLE_CODES:
+            return frame
+        if lifetime is None:
+            expiration = None
+        else:
+            expiration = monotonic() + lifetime
+        frame = bytes(frame)
+        cls.__entries.setdefault(fcp, {})[bytes(cmd)] = (expiration, frame)
+        return frame
+
+    @classmethod
+    def invalidate(cls, fcp):
+        cls.__entries.pop(fcp, None)
+
+    # Units should call it to handle 'bus-update' signal of FwNode.
+    @classmethod
+    def watch_bus_reset(cls, node, fcp):
+        return node.connect('bus-update',
+                            lambda node, fcp: cls.invalidate(fcp), fcp)
 
 
 class AvcGeneral():
@@ -37,8 +110,11 @@ class AvcGeneral():
             raise ValueError('Invalid argument for FwFcp')
         if cmd[0] != 0x01:
             raise ValueError('Invalid command code for status')
-        params = [0] * 256
-        _, params = fcp.avc_transaction(cmd, params, 100)
+        params = AvcResponseCache.lookup(fcp, cmd)
+        if params is None:
+            params = [0] * 256
+            _, params = fcp.avc_transaction(cmd, params, 100)
+            params = AvcResponseCache.store(fcp, cmd, params)
         if params[0] == 0x08:
             raise OSError('Not implemented')
         elif params[0] == 0x0a:
@@ -37,6 +37,37 @@ class AvcStreamFormatInfo():
              'do-not-care',     # 0xff
              'reserved')        # the others
 
+    @classmethod
+    def _parse_type(cls, code):
+        if code <= 0x0f:
+            return cls.TYPES[code]
+        elif code == 0x10:
+            return 'ancillary-data'
+        elif code == 0x40:
+            return 'sync-stream'
+        elif code == 0xff:
+            return 'do-not-care'
+        else:
+            return 'reserved'
+
+    @classmethod
+    def _build_type(cls, type):
+        if type not in cls.TYPES:
+            raise ValueError('Invalid argument for stream formation type')
+        if type == 'ancillary-data':
+            return 0x10
+        elif type == 'sync-stream':
+            return 0x40
+        elif type == 'do-not-care':
+            return 0xff
+        elif type == 'reserved':
+            # Use this value.
+            return 0xfe
+        else:
+            return cls.TYPES.index(type)
+
+    # The formation is a list of (the number of channels, type) for each
+    # field, as it's expressed in the frame.
     @classmethod
     def _parse_format(cls, params):
         if params[0] != 0x90 or params[1] != 0x40:
@@ -46,18 +77,9 @@ class AvcStreamFormatInfo():
         fmt['rate-control'] = cls.RATE_CONTROLS[params[3] & 0x03]
         formation = []
         for i in range(params[4]):
-            for c in range(params[5 + i * 2]):
-                type = params[5 + i * 2 + 1]
-                if type <= 0x0f:
-                    formation.append(cls.TYPES[type])
-                elif type == 0x10:
-                    formation.append('ancillary-data')
-                elif type == 0x40:
-                    formation.append('sync-stream')
-                elif type == 0xff:
-                    formation.append('do-not-care')
-                else:
-                    formation.append('reserved')
+            count = params[5 + i * 2]
+            type = cls._parse_type(params[5 + i * 2 + 1])
+            formation.append((count, type))
         fmt['formation'] = formation
         return fmt
 
@@ -67,39 +89,25 @@ class AvcStreamFormatInfo():
             raise ValueError('Invalid argument for sampling rate')
         if fmt['rate-control'] not in cls.RATE_CONTROLS:
             raise ValueError('Invalid argument for rate control mode')
+        if len(fmt['formation']) > 255:
+            raise ValueError('Invalid argument for stream formation')
         args = bytearray()
         args.append(0x90)
         args.append(0x40)
         args.append(cls.SAMPLING_RATES.index(fmt['sampling-rate']))
         args.append(cls.RATE_CONTROLS.index(fmt['rate-control']))
-        args.append(0x00)     # Set it later.
-        prev = ''
-        num = -1
-        for i, formation in enumerate(fmt['formation']):
-            if formation not in cls.TYPES:
-                raise ValueError('Invalid argument for stream formation type')
-            if formation == 'ancillary-data':
-                type = 0x10
-            elif formation == 'sync-stream':
-                type = 0x40
-            elif formation == 'do-not-care':
-                type = 0xff
-            elif formation == 'reserved':
-                # Use this value.
-                type = 0xfe
-            else:
-                type = cls.TYPES.index(formation)
-            if type != prev or i == len(fmt['formation']) - 1:
-                if num > 0:
-                    args.append(num + 1)
-                    args.append(type)
-                    args[4] += 1
-                num = 1
-            else:
-                num += 1
-            prev = type
+        args.append(len(fmt['formation']))
+        for count, type in fmt['formation']:
+            if count > 255:
+                raise ValueError('Invalid argument for stream formation')
+            args.append(count)
+            args.append(cls._build_type(type))
         return args
 
+    @classmethod
+    def count_channels(cls, formation):
+        return sum(count for count, type in formation)
+
     @classmethod
     def set_format(cls, fcp, direction, plug, fmt):
         args = bytearray()
@@ -140,12 +148,11 @@ class AvcStreamFormatInfo():
         return cls._parse_format(params[10:len(params)])
 
     @classmethod
-    def get_formats(cls, fcp, direction, plug):
+    def iterate_formats(cls, fcp, direction, plug):
         if direction not in cls.PLUG_DIRECTION:
             raise ValueError('Invalid argument for plug direction')
         if plug > 255:
             raise ValueError('Invalid argument for plug number')
-        fmts = []
         args = bytearray()
         args.append(0x01)
         args.append(0xff)
@@ -164,7 +171,19 @@ class AvcStreamFormatInfo():
             try:
                 params = AvcGeneral.command_status(fcp, args)
                 fmt = cls._parse_format(params[11:])
-                fmts.append(fmt)
             except Exception as e:
-                break
-        return fmts
+                return
+            yield fmt
+
+    @classmethod
+    def get_formats(cls, fcp, direction, plug):
+        return list(cls.iterate_formats(fcp, direction, plug))
+
+    @classmethod
+    def seek_format(cls, fcp, direction, plug, rate):
+        if rate not in cls.SAMPLING_RATES:
+            raise ValueError('Invalid argument for sampling rate')
+        for fmt in cls.iterate_formats(fcp, direction, plug):
+            if fmt['sampling-rate'] == rate:
+                return fmt
+        return None
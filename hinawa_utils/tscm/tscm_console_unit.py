@@ -1,18 +1,72 @@
 # SPDX-License-Identifier: LGPL-3.0-or-later
 # Copyright (C) 2018 Takashi Sakamoto
 
+from hinawa_utils.misc.message_stream import ControlMessageDecoder
+from hinawa_utils.misc.message_stream import ControlMessageStream
+
 from hinawa_utils.tscm.tscm_unit import TscmUnit
 
 __all__ = ['TscmConsoleUnit']
 
 
 class TscmConsoleUnit(TscmUnit):
+    # The quadlets of state image for control surface, according to ALSA
+    # firewire-tascam driver. Some bits in them change without operation.
+    __SURFACE_INDEXES = range(5, 16)
+    __SURFACE_IGNORED = {5: 0x0000ffff, 6: 0x0000ffff, 8: 0x000f0f00}
+    # The quadlets for rotary encoders. Each half of the quadlet is the
+    # counter of one encoder.
+    __ENCODER_INDEXES = range(10, 16)
+    __ENCODER_MASKS = (0x0000ffff, 0xffff0000)
+
     def __init__(self, path):
+        # The decoder is used by the dispatcher of notification, which starts
+        # in the constructor of parent.
+        self.surface_fields = self.__build_surface_fields()
+        self.__surface_decoder = ControlMessageDecoder(self.surface_fields,
+                                                       self.__SURFACE_IGNORED)
+
         super().__init__(path)
 
         if self.model_name not in ('FW-1082', 'FW-1884'):
             raise ValueError('Unsupported model: {0}'.format(self.model_name))
 
+    # MEMO: the assignment of buttons in the quadlets is not documented, thus
+    # each bit is named by its position.
+    @classmethod
+    def __build_surface_fields(cls):
+        fields = []
+        for index in cls.__SURFACE_INDEXES:
+            if index in cls.__ENCODER_INDEXES:
+                for i, mask in enumerate(cls.__ENCODER_MASKS):
+                    pos = (index - cls.__ENCODER_INDEXES[0]) * 2 + i
+                    name = 'encoder-{0}'.format(pos)
+                    fields.append(('knob', name, index, mask))
+                continue
+            mask = ~cls.__SURFACE_IGNORED.get(index, 0) & 0xffffffff
+            for bit in range(32):
+                if mask & (1 << bit):
+                    name = 'button-{0}-{1}'.format(index, bit)
+                    fields.append(('button', name, index, 1 << bit))
+        return tuple(fields)
+
+    # The fields of control surface are decoded to the kind of their names,
+    # thus a burst of changes in one encoder results in one event.
+    def _parse_notification(self, message):
+        changes = self.__surface_decoder.decode_change(*message)
+        return [(name, value) for kind, name, value in changes]
+
+    # The stream is attached to the signal for the change of state image. The
+    # caller should start and stop it.
+    def create_surface_stream(self, fields=None, period=0.02):
+        if fields is None:
+            decoder = self.__surface_decoder
+        else:
+            decoder = ControlMessageDecoder(fields, self.__SURFACE_IGNORED)
+        stream = ControlMessageStream(decoder.decode_change, period)
+        stream.attach(self, 'changed')
+        return stream
+
     def bright_led(self, position, state):
         if state not in self.supported_led_status:
             raise ValueError('Invalid argument for LED state.')
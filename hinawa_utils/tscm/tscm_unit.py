@@ -3,13 +3,11 @@
 
 from threading import Thread
 from struct import pack, unpack
-from math import log10, pow
 
-import gi
-gi.require_version('GLib', '2.0')
-gi.require_version('Hinawa', '4.0')
-gi.require_version('Hitaki', '0.0')
-from gi.repository import GLib, Hinawa, Hitaki
+from hinawa_utils.misc.gi_repository import GLib, Hinawa, Hitaki
+
+from hinawa_utils.misc.gain import LogCoeffGain
+from hinawa_utils.misc.notification import NotificationDispatcher
 
 from hinawa_utils.tscm.config_rom_parser import TscmConfigRomParser
 
@@ -40,6 +38,7 @@ class TscmUnit(Hitaki.SndTascam):
     }
 
     __MAX_THRESHOLD = 0x7fff
+    __THRESHOLD_GAIN = LogCoeffGain(__MAX_THRESHOLD, bits=16)
 
     def __init__(self, path):
         super().__init__()
@@ -70,7 +69,14 @@ class TscmUnit(Hitaki.SndTascam):
         self.model_name = info['model-name']
         self.__specs = self.__SPECS[self.model_name]
 
+        self.__notification_dispatcher = NotificationDispatcher(
+                                                    self._parse_notification)
+        self.__notification_dispatcher.attach(self, 'changed')
+        self.__notification_dispatcher.start()
+
     def release(self):
+        self.__notification_dispatcher.detach()
+        self.__notification_dispatcher.stop()
         self.__unit_dispatcher.quit()
         self.__node_dispatcher.quit()
         self.__unit_th.join()
@@ -85,6 +91,21 @@ class TscmUnit(Hitaki.SndTascam):
     def get_node(self):
         return self.__node
 
+    # The change of quadlet in the state image is decoded to the kind of its
+    # index with the new value.
+    def _parse_notification(self, message):
+        index, before, after = message
+        return [(index, after)]
+
+    # The handler is called with NotificationEvent in the thread of dispatcher,
+    # once for a burst of notifications. The handler for the kind of None is
+    # called with the list of events.
+    def register_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.register(kind, handler)
+
+    def unregister_notification_handler(self, kind, handler):
+        self.__notification_dispatcher.unregister(kind, handler)
+
     def read_quadlet(self, offset):
         req = Hinawa.FwReq.new()
         frames = bytearray(4)
@@ -245,10 +266,7 @@ class TscmUnit(Hitaki.SndTascam):
     def set_input_threshold(self, level):
         data = self.read_quadlet(0x0230)
         data = bytearray(data)
-        if level == float('-inf'):
-            val = 0x0000
-        else:
-            val = int(self.__MAX_THRESHOLD * pow(10, level / 20))
+        val = self.__THRESHOLD_GAIN.build_val_from_db(level)
         chunks = pack('>H', val)
         data[0] = chunks[0]
         data[1] = chunks[1]
@@ -257,6 +275,4 @@ class TscmUnit(Hitaki.SndTascam):
     def get_input_threshold(self):
         data = self.read_quadlet(0x0230)
         val = unpack('>H', data[0:2])[0]
-        if val == 0x0000:
-            return float('-inf')
-        return 20 * log10(val / self.__MAX_THRESHOLD)
+        return self.__THRESHOLD_GAIN.parse_val_to_db(val)
@@ -44,8 +44,10 @@ setuptools.setup(
         'hinawa-apogee-ensemble-cli',
         'hinawa-apogee-duet-cli',
         'hinawa-bebob-plug-parser',
+        'hinawa-benchmark',
         'hinawa-bebob-connection-cli',
         'hinawa-config-rom-printer',
+        'hinawa-control-daemon',
         'hinawa-dg003-cli',
         'hinawa-dg00x-common-cli',
         'hinawa-dice-common-cli',
@@ -62,6 +64,7 @@ setuptools.setup(
         'hinawa-tascam-fireone-cli',
         'hinawa-tascam-fw-console-cli',
         'hinawa-tascam-fw-rack-cli',
+        'hinawa-transport-trace',
         'hinawa-yamaha-terratec-cli',
     ),
 )